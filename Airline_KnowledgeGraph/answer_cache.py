@@ -0,0 +1,167 @@
+import re
+import copy
+import threading
+from collections import OrderedDict
+import numpy as np
+from embeddings.embedding_retreival import encode_query
+
+# ------------------------------------------------------------------
+# Semantic answer cache
+# ------------------------------------------------------------------
+# Paraphrased repeats ("which airport has the worst delays" /
+# "worst delayed airports?") are answered from a previous response when
+# the MiniLM embeddings of the two questions are close enough, the
+# retrieval mode matches and the KG version has not changed since.
+
+# Literals (codes, ids, numbers, entities) two questions must share
+# exactly; embeddings alone barely separate "LAX to IAX" from "lax to dex".
+LITERAL_TOKEN_PATTERN = re.compile(r"\b(?:[A-Z][A-Z0-9_\-]+|\d+(?:\.\d+)?|\w*\d[\w\-]*)\b")
+
+# Direction, comparison and negation words: embeddings put "best" and
+# "worst" delays next to each other, so these must match exactly too
+COMPARISON_WORDS = {
+    "best", "worst", "most", "least", "highest", "lowest", "longest", "shortest", "biggest", "largest",
+    "smallest", "fewest", "more", "less", "fewer", "greater", "max", "maximum", "min", "minimum",
+    "top", "bottom", "first", "last", "above", "below", "over", "under", "earliest", "latest",
+    "fastest", "slowest", "ascending", "descending", "not", "without", "except",
+}
+
+# Spelled-out limits ("top five") sign the same as digits ("top 5")
+NUMBER_WORDS = {
+    word: str(value) for value, word in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen "
+        "sixteen seventeen eighteen nineteen twenty".split()
+    )
+}
+NUMBER_WORDS.update({"thirty": "30", "forty": "40", "fifty": "50", "hundred": "100"})
+
+
+def literal_signature(question, entities=None, vocabulary=None):
+    """
+    Case-insensitive literals of a question: code-like tokens and numbers,
+    comparison words, words found in `vocabulary` (lowercased graph
+    values) and the resolved `entities`; a route keeps its direction.
+    """
+    literals = {token.lower() for token in LITERAL_TOKEN_PATTERN.findall(question)}
+    words = re.findall(r"[\w\-]+", question.lower())
+    literals.update(word for word in words if word in COMPARISON_WORDS)
+    literals.update(NUMBER_WORDS[word] for word in words if word in NUMBER_WORDS)
+    if vocabulary:
+        literals.update(word for word in words if word in vocabulary)
+
+    for key, values in (entities or {}).items():
+        if key == "routes":
+            values = values or {}
+            if values.get("origin") or values.get("destination"):
+                literals.add(("route", str(values.get("origin") or "").lower(),
+                              str(values.get("destination") or "").lower()))
+        else:
+            literals.update(str(value).lower() for value in values or [] if value)
+
+    return frozenset(literals)
+
+
+class SemanticAnswerCache:
+
+    def __init__(self, max_entries=256, threshold=0.92, model_key="minilm", signature=literal_signature):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.model_key = model_key
+        # question -> literals a cached question must match exactly
+        self.signature = signature
+
+        # id -> entry dict; insertion order doubles as LRU order
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.latency_saved = 0.0
+
+    def _embed(self, question):
+        return np.asarray(encode_query(question, self.model_key), dtype=np.float32)
+
+    # ------------------------------------------------
+    #              LOOKUP / STORE
+    # ------------------------------------------------
+    def lookup(self, question, mode, graph_version):
+        """
+        Returns (response, similarity) for the closest cached question with
+        the same mode and graph version, or None.
+        """
+        if graph_version is None:
+            return None
+
+        vector = self._embed(question)
+        signature = self.signature(question)
+
+        with self._lock:
+            candidates = [
+                (entry_id, entry) for entry_id, entry in self._entries.items()
+                if entry["mode"] == mode
+                and entry["graph_version"] == graph_version
+                and entry["signature"] == signature
+            ]
+
+            if candidates:
+                matrix = np.vstack([entry["vector"] for _, entry in candidates])
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                similarity = float(similarities[best])
+
+                if similarity >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    self.latency_saved += entry["latency_seconds"]
+                    return copy.deepcopy(entry["response"]), round(similarity, 4)
+
+            self.misses += 1
+            return None
+
+    def store(self, question, mode, graph_version, response, latency_seconds):
+        if graph_version is None:
+            return
+
+        entry = {
+            "question": question,
+            "mode": mode,
+            "graph_version": graph_version,
+            "signature": self.signature(question),
+            "vector": self._embed(question),
+            "response": copy.deepcopy(response),
+            "latency_seconds": latency_seconds,
+        }
+
+        with self._lock:
+            # Entries from older graph versions can never hit again
+            for entry_id in [k for k, e in self._entries.items() if e["graph_version"] != graph_version]:
+                del self._entries[entry_id]
+                self.evictions += 1
+
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "latency_saved_seconds": round(self.latency_saved, 3),
+            }
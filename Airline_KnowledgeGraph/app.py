@@ -1,7 +1,8 @@
 import streamlit as st
 
 # Backend imports
-from router import answer_question
+from router import answer_question, warmup, next_page
+from conversation import Conversation
 
 # -------------------------------
 # Streamlit Page Settings
@@ -12,6 +13,10 @@ st.set_page_config(
     page_icon="✈️"
 )
 
+# Open drivers / clients and load models once per server process,
+# not on the first question
+st.cache_resource(show_spinner="Warming up...")(warmup)()
+
 # -------------------------------
 # Session State Initialization
 # -------------------------------
@@ -21,6 +26,10 @@ if "page" not in st.session_state:
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+# rows behind the previous answer, for follow-up questions
+if "conversation" not in st.session_state:
+    st.session_state.conversation = Conversation()
+
 if "user_input_key" not in st.session_state:
     st.session_state.user_input_key = 0
 
@@ -243,16 +252,16 @@ st.sidebar.header("⚙️ Settings")
 
 model_choice = st.sidebar.selectbox(
     "Choose LLM Model",
-    ["deepseek", "gemma", "llama"]
+    ["auto", "deepseek", "gemma", "llama"]
 )
 
+compare_models = st.sidebar.checkbox("Compare all models (parallel)")
+
 embedding_model = st.sidebar.selectbox(
     "Embedding Model",
     ["all-MiniLM-L6-v2 (fast)", "all-mpnet-base-v2 (accurate)"]
 )
 
-print("embedding_model " + embedding_model)
-
 
 # ======================================================
 # PAGE 1 — LANDING PAGE
@@ -329,6 +338,7 @@ if st.session_state.page == "chat":
     with top_col2:
         if st.button("🧹 Clear Chat"):
             st.session_state.chat_history = []
+            st.session_state.conversation.clear()
             st.session_state.user_input_key += 1
             st.session_state.last_debug = None
             st.rerun()
@@ -410,9 +420,40 @@ if st.session_state.page == "chat":
             )
 
             # Call backend
+            arrivals = st.empty()
+            arrived = []
+
+            # Live bot bubble, filled as the answer streams in
+            live_bubble = st.empty()
+            streamed = []
+
+            def show_token(token):
+                streamed.append(token)
+                live_bubble.markdown(
+                    f"""
+                    <div style='display:flex; justify-content:flex-start; margin:12px 0;'>
+                        <div class='chat-bot' style='padding:12px 18px; border-radius:18px; max-width:70%;'>
+                            🤖 {"".join(streamed)}▌
+                        </div>
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+
+            def show_arrival(entry):
+                arrived.append(f"{entry['model']}: {entry.get('error') or 'answered'} ({entry['latency_seconds']}s)")
+                arrivals.info(" · ".join(arrived))
+
             try:
                 with st.spinner("✈️ Thinking..."):
-                    response = answer_question(user_msg, retrieval_mode, embedding_model)
+                    response = answer_question(
+                        user_msg, retrieval_mode, embedding_model,
+                        model=None if model_choice == "auto" else model_choice,
+                        compare_models=["deepseek", "gemma", "llama"] if compare_models else None,
+                        on_model_answer=show_arrival,
+                        on_token=show_token,
+                        conversation=st.session_state.conversation
+                    )
             except Exception as e:
                 st.error(f"Backend Error: {str(e)}")
                 st.stop()
@@ -458,6 +499,18 @@ if st.session_state.page == "chat":
             st.markdown("### 📘 Baseline Cypher Results")
             st.json(response["context"].get("baseline", []))
 
+            # More rows are streamed from Neo4j a page at a time
+            page = response["context"].get("page")
+            if page and page.get("next_after") is not None:
+                if st.button("⬇ Load more rows"):
+                    rows = list(response["context"].get("baseline", []))
+                    progress = st.empty()
+                    for row in next_page(page):
+                        rows.append(row)
+                        progress.caption(f"Loaded {len(rows)} rows...")
+                    response["context"]["baseline"] = rows
+                    st.rerun()
+
         with colB:
             st.markdown("### 🔍 Embedding Results")
             st.json(response["context"].get("embeddings", []))
@@ -504,7 +557,33 @@ if st.session_state.page == "chat":
         # --- Model Summary ---
         st.subheader("🤖 Model Summary")
 
+        st.caption(f"🧠 Model: {response.get('model')}")
         st.caption(f"⏱ LLM latency: {response.get('latency_seconds')} seconds")
+        if response.get("ttft_seconds") is not None:
+            st.caption(
+                f"⚡ First token: {response.get('ttft_seconds')} s · "
+                f"{response.get('tokens_per_second')} tokens/s"
+            )
         st.caption(f"📏 Answer Length: {response.get('answer_length')} words")
         st.caption(f"✅ KG Accuracy: {response.get('accuracy')}%")
+        if response.get("degraded"):
+            st.caption(f"⚠ Degraded stages (deadline/timeouts): {', '.join(response['degraded'])}")
+
+        # --- Side-by-side model comparison ---
+        if response.get("model_answers"):
+            st.subheader("⚖️ Model Comparison")
+            st.dataframe([
+                {
+                    "Model": entry["model"],
+                    "Latency (s)": entry["latency_seconds"],
+                    "Length": entry.get("answer_length"),
+                    "KG Accuracy (%)": entry.get("accuracy"),
+                    "Error": entry.get("error", ""),
+                }
+                for entry in response["model_answers"]
+            ])
+            for entry in response["model_answers"]:
+                if entry["answer"] is not None:
+                    with st.expander(f"{entry['model']} answer"):
+                        st.write(entry["answer"])
 
@@ -0,0 +1,229 @@
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from prompt_builder import build_structured_prompt
+from retrieval import query_cache_key
+from nlu_cache import normalize_question
+from inference import RateLimiter
+from deadline import Deadline, RETRIEVAL_TIMEOUT, EMBEDDING_TIMEOUT
+from router import (
+    retriever, understand_question, decide_embeddings, build_response,
+    lookup_cached_answer, store_cached_answer, templated_result, answer_with_models
+)
+
+# ------------------------------------------------------------------
+# Batch question answering
+# ------------------------------------------------------------------
+# Report jobs ask hundreds of questions; most of them repeat or land on
+# the same Cypher query. answer_questions:
+#   1. answers each distinct (normalized) question once
+#   2. runs NLU with bounded concurrency
+#   3. runs the retrieval for each (intent, query_key, params) group once
+#   4. fans the answer calls out under a rate limit
+# and yields results in input order as soon as each one is ready.
+
+NLU_CONCURRENCY = 8
+LLM_CONCURRENCY = 4
+LLM_RATE = 2.0  # answer calls per second
+
+
+class BatchRun:
+
+    def __init__(self, retrieval_mode, embedding_model, model, nlu_concurrency, llm_concurrency, llm_rate, deadline):
+        self.retrieval_mode = retrieval_mode
+        self.embedding_model = embedding_model
+        self.model = model
+        self.deadline = deadline
+
+        self.nlu_slots = threading.BoundedSemaphore(nlu_concurrency)
+        self.llm_slots = threading.BoundedSemaphore(llm_concurrency)
+        self.llm_limiter = RateLimiter(llm_rate, burst=llm_concurrency) if llm_rate else None
+
+        # retrieval group key -> Future of the retrieval result
+        self._groups = {}
+        self._lock = threading.Lock()
+
+        self.stats = {"questions": 0, "distinct": 0, "retrieval_groups": 0, "llm_calls": 0, "errors": 0}
+
+    def retrieval_for(self, intent, entities):
+        """
+        Runs each (intent, query_key, params) retrieval once per batch; later
+        questions in the same group wait for / reuse the first one's rows.
+        """
+        use_embeddings, model_key = decide_embeddings(intent, self.retrieval_mode, self.embedding_model)
+        query_key, params = retriever.route(intent, entities)
+        group = (intent, query_cache_key(query_key, params), use_embeddings, model_key)
+
+        with self._lock:
+            future = self._groups.get(group)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._groups[group] = future
+                self.stats["retrieval_groups"] += 1
+
+        if owner:
+            try:
+                future.set_result(retriever.retrieve(
+                    intent=intent,
+                    entities=entities,
+                    embedding_model=model_key,
+                    use_embeddings=use_embeddings,
+                    retrieval_mode=self.retrieval_mode,
+                    timeout=self.deadline.timeout(RETRIEVAL_TIMEOUT),
+                    embedding_timeout=self.deadline.timeout(EMBEDDING_TIMEOUT)
+                ))
+            except Exception as e:
+                future.set_exception(e)
+
+        return future.result()
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def answer(self, question):
+        cached, graph_version = lookup_cached_answer(question, self.retrieval_mode, self.embedding_model, self.model)
+        if cached is not None:
+            return cached
+
+        start = time.time()
+
+        with self.nlu_slots:
+            raw_intent, intent, entities, nlu_cache_hit, degraded = understand_question(question, self.deadline)
+
+        retrieval_result = self.retrieval_for(intent, entities)
+        degraded = degraded + retrieval_result.get("incomplete", [])
+
+        merged_list = retrieval_result.get("merged", [])
+        baseline_list = retrieval_result.get("baseline", [])
+        prompt = build_structured_prompt(question, merged_list if merged_list else baseline_list)
+
+        llm_result = templated_result(question, intent, self.retrieval_mode, retrieval_result)
+        if llm_result is None:
+            with self.llm_slots:
+                if self.llm_limiter:
+                    self.llm_limiter.acquire()
+                llm_result = answer_with_models(
+                    intent, prompt, retrieval_result, self.model, self.deadline, False, degraded
+                )
+            if not llm_result.get("memo_hit") and not llm_result.get("degraded"):
+                self.count("llm_calls")
+
+        response = build_response(intent, entities, retrieval_result, prompt, llm_result, nlu_cache_hit, degraded)
+        if not response["degraded"]:
+            store_cached_answer(
+                question, self.retrieval_mode, self.embedding_model, graph_version, response, time.time() - start,
+                self.model
+            )
+        return response
+
+    def safe_answer(self, question):
+        try:
+            return self.answer(question)
+        except Exception as e:
+            self.count("errors")
+            return {"error": str(e)}
+
+
+def answer_questions(
+    questions,
+    retrieval_mode="hybrid",
+    embedding_model="minilm",
+    model=None,
+    nlu_concurrency=NLU_CONCURRENCY,
+    llm_concurrency=LLM_CONCURRENCY,
+    llm_rate=LLM_RATE,
+    deadline=None,
+    stats=None
+):
+    """
+    Yields one result dict per input question, in input order:
+        {"index": i, "question": q, **response}   (or "error" on failure)
+
+    Duplicates (after normalize_question) share one computation.
+    model: answer model for every question (None = model router's pick).
+    llm_rate: answer calls per second (None / 0 = unlimited).
+    deadline: seconds for the whole batch.
+    stats: optional dict filled with batch counters when the generator ends.
+    """
+    questions = list(questions)
+    run = BatchRun(
+        retrieval_mode, embedding_model, model, nlu_concurrency, llm_concurrency, llm_rate,
+        Deadline.coerce(deadline)
+    )
+
+    workers = nlu_concurrency + llm_concurrency
+    futures = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for question in questions:
+            key = normalize_question(question)
+            if key not in futures:
+                futures[key] = pool.submit(run.safe_answer, question)
+
+        run.stats["questions"] = len(questions)
+        run.stats["distinct"] = len(futures)
+
+        for index, question in enumerate(questions):
+            response = futures[normalize_question(question)].result()
+            yield {"index": index, "question": question, **response}
+
+    if stats is not None:
+        stats.update(run.stats)
+
+
+def write_jsonl(results, out):
+    """
+    Writes results one JSON object per line, flushing after each so the
+    output can be tailed while the batch runs.
+    """
+    for result in results:
+        out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        out.flush()
+
+
+def read_questions(path):
+    """
+    One question per line; blank lines and lines starting with # are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Answer a file of questions, one per line, as JSONL")
+    parser.add_argument("questions")
+    parser.add_argument("--out", help="output JSONL file (default: stdout)")
+    parser.add_argument("--mode", default="hybrid", help="baseline only / embeddings only / hybrid")
+    parser.add_argument("--embedding-model", default="minilm")
+    parser.add_argument("--model", help="answer model (default: adaptive routing)")
+    parser.add_argument("--nlu-concurrency", type=int, default=NLU_CONCURRENCY)
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_CONCURRENCY)
+    parser.add_argument("--llm-rate", type=float, default=LLM_RATE)
+    args = parser.parse_args()
+
+    stats = {}
+    start = time.time()
+    results = answer_questions(
+        read_questions(args.questions),
+        retrieval_mode=args.mode,
+        embedding_model=args.embedding_model,
+        model=args.model,
+        nlu_concurrency=args.nlu_concurrency,
+        llm_concurrency=args.llm_concurrency,
+        llm_rate=args.llm_rate,
+        stats=stats
+    )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out:
+            write_jsonl(results, out)
+    else:
+        write_jsonl(results, sys.stdout)
+
+    stats["elapsed_seconds"] = round(time.time() - start, 3)
+    print(json.dumps(stats), file=sys.stderr)
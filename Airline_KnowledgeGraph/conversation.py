@@ -0,0 +1,319 @@
+import re
+import time
+
+# ------------------------------------------------------------------
+# Conversation state for follow-up questions
+# ------------------------------------------------------------------
+# A Conversation keeps the rows behind the previous answer. Follow-ups
+# that only refine that result set ("and which of those had the worst
+# food?", "how many of them were economy?") are answered by filtering /
+# sorting / aggregating those rows in memory, without Cypher or an LLM
+# call. A follow-up must refer back explicitly ("those", "these", ...)
+# and may only use entities, columns and metrics the rows already hold;
+# anything else returns None from refine() and goes through the normal
+# pipeline.
+
+# Explicit references to the previous result set
+REFERENCE_PATTERN = re.compile(
+    r"\b(those|these|them|they|that list|the same ones|of which|the above|previous results?)\b",
+    re.IGNORECASE
+)
+
+# Scope words asking beyond the previous rows
+SCOPE_PATTERN = re.compile(
+    r"\b(overall|all|every|everything|entire|whole|in general|globally|any other)\b",
+    re.IGNORECASE
+)
+
+# Dimension words -> columns that answer them (any one suffices)
+DIMENSION_COLUMNS = {
+    r"fleets?|aircraft|planes?": ["fleet"],
+    r"airports?|stations?": ["airport", "origin", "destination"],
+    r"routes?": ["origin", "destination"],
+    r"class(?:es)?|cabins?": ["passenger_class"],
+    r"generations?": ["generation"],
+    r"loyalty|levels?|tiers?|status": ["loyalty_level", "level"],
+    r"passengers?|customers?": ["passenger"],
+    r"flight numbers?": ["flight"],
+}
+
+# Metric -> candidate columns, in preference order
+METRIC_COLUMNS = {
+    "delay": ["delay", "avg_delay"],
+    "food": ["food_score", "avg_food", "food"],
+    "miles": ["miles", "total_miles"],
+    "journeys": ["journey_count"],
+    "similarity": ["score"],
+}
+
+METRIC_WORDS = {
+    "delay": r"delay|delayed|late|on[- ]time|punctual",
+    "food": r"food|meal|satisfaction|satisfied",
+    "miles": r"miles|distance",
+    "journeys": r"journeys|trips|flights taken|frequent",
+    "similarity": r"similar",
+}
+
+# Metrics a follow-up can only ask about if the rows hold them
+MEASURED_METRICS = ("delay", "food", "miles")
+
+# Direction words; "high" sorts descending
+HIGH_WORDS = r"worst|most|highest|longest|biggest|largest|max(?:imum)?|top"
+LOW_WORDS = r"best|least|lowest|shortest|smallest|fewest|min(?:imum)?|bottom"
+
+# "worst food" is the LOWEST score; "best delay" is the LOWEST delay
+LOWER_IS_BETTER = {"delay"}
+
+CATEGORICAL_COLUMNS = [
+    "passenger_class", "generation", "loyalty_level", "level", "fleet",
+    "origin", "destination", "airport", "flight",
+]
+
+TABLE_ROWS = 10
+
+
+def find_column(rows, metric):
+    for column in METRIC_COLUMNS[metric]:
+        if any(column in row for row in rows):
+            return column
+    return None
+
+
+def sort_direction(q, metric):
+    """
+    True (descending) / False (ascending) when the lowercased question asks
+    for one end of `metric` ("worst food", "most delayed"), else None.
+    """
+    words = METRIC_WORDS[metric]
+    high = re.search(rf"\b(?:{HIGH_WORDS})\b[\w\s]{{0,20}}?\b(?:{words})", q)
+    low = re.search(rf"\b(?:{LOW_WORDS})\b[\w\s]{{0,20}}?\b(?:{words})", q)
+    if not (high or low):
+        return None
+    # worst/best flip for metrics where lower is better
+    direction_word = (high or low).group(0).split()[0]
+    if direction_word in ("worst", "best"):
+        return (direction_word == "worst") == (metric in LOWER_IS_BETTER)
+    return bool(high)
+
+
+def numeric(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Conversation:
+
+    def __init__(self):
+        self.turns = []
+        self.rows = []
+        self.intent = None
+        self.entities = None
+
+    def update(self, question, response):
+        """
+        Remembers the rows behind an answer for the next turn.
+        """
+        context = response.get("context") or {}
+        rows = context.get("merged") or context.get("baseline") or []
+        self.turns.append({"question": question, "intent": response.get("intent"), "rows": len(rows)})
+        if rows:
+            self.rows = [dict(row) for row in rows]
+            self.intent = response.get("intent")
+            self.entities = response.get("entities")
+
+    def clear(self):
+        self.__init__()
+
+    # ------------------------------------------------
+    #            REFINEMENT DETECTION
+    # ------------------------------------------------
+    def row_values(self):
+        values = set()
+        for row in self.rows:
+            for value in row.values():
+                if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+                    values.add(str(value).lower())
+        return values
+
+    def covers(self, q, entities):
+        """
+        True when every entity, dimension and metric the question names is
+        present in the previous rows.
+        """
+        columns = {column for row in self.rows for column in row}
+
+        values = self.row_values()
+        for key, found in (entities or {}).items():
+            if key == "routes":
+                found = [v for v in (found or {}).values() if v]
+            for value in found or []:
+                if str(value).lower() not in values:
+                    return False
+
+        for words, candidates in DIMENSION_COLUMNS.items():
+            if re.search(rf"\b(?:{words})\b", q) and not columns.intersection(candidates):
+                return False
+
+        for metric in MEASURED_METRICS:
+            if re.search(rf"\b(?:{METRIC_WORDS[metric]})", q) and not find_column(self.rows, metric):
+                return False
+
+        return True
+
+    def parse_refinement(self, question, entities=None):
+        """
+        Returns a plan {"filters", "sort", "aggregate", "limit"} when the
+        question can be answered from the previous rows, else None.
+        entities: the question's resolved entities (gazetteer / NLU); any
+        value not among the previous rows means new data is needed.
+        """
+        if not self.rows or not REFERENCE_PATTERN.search(question) or SCOPE_PATTERN.search(question):
+            return None
+
+        q = question.lower()
+        if not self.covers(q, entities):
+            return None
+        plan = {"filters": [], "sort": None, "aggregate": None, "limit": None}
+
+        # Categorical filters: values that actually occur in the cached rows
+        for column in CATEGORICAL_COLUMNS:
+            values = {row[column] for row in self.rows if isinstance(row.get(column), str)}
+            for value in values:
+                # Numeric-looking ids ("30") would collide with thresholds
+                if value.isdigit():
+                    continue
+                if re.search(rf"\b{re.escape(value.lower())}\b", q):
+                    plan["filters"].append((column, "==", value))
+
+        # Numeric thresholds: "delay over 30", "food below 3"
+        for metric, words in METRIC_WORDS.items():
+            match = re.search(
+                rf"(?:{words})\D{{0,20}}?(over|above|more than|greater than|at least|under|below|less than|at most)"
+                rf"\s+(\d+(?:\.\d+)?)",
+                q
+            )
+            column = find_column(self.rows, metric) if match else None
+            if column:
+                op = ">" if match.group(1) in ("over", "above", "more than", "greater than") else \
+                     ">=" if match.group(1) == "at least" else \
+                     "<=" if match.group(1) == "at most" else "<"
+                plan["filters"].append((column, op, float(match.group(2))))
+
+        # Aggregates
+        if re.search(r"\bhow many\b|\bcount\b|\bnumber of\b", q):
+            plan["aggregate"] = ("count", None)
+        else:
+            match = re.search(r"\b(average|avg|mean|total|sum)\b", q)
+            if match:
+                for metric, words in METRIC_WORDS.items():
+                    column = find_column(self.rows, metric)
+                    if column and re.search(rf"\b(?:{words})\b", q):
+                        kind = "sum" if match.group(1) in ("total", "sum") else "mean"
+                        plan["aggregate"] = (kind, column)
+                        break
+                if plan["aggregate"] is None:
+                    return None
+
+        # Sorting: "worst food", "most delayed", "highest miles"
+        for metric in METRIC_WORDS:
+            column = find_column(self.rows, metric)
+            if not column:
+                continue
+            descending = sort_direction(q, metric)
+            if descending is None:
+                continue
+            plan["sort"] = (column, descending)
+            break
+
+        match = re.search(r"\btop\s+(\d+)\b|\b(\d+)\s+(?:worst|best|most|least)\b", q)
+        if match:
+            plan["limit"] = int(match.group(1) or match.group(2))
+
+        if not (plan["filters"] or plan["sort"] or plan["aggregate"] or plan["limit"]):
+            return None
+        return plan
+
+    # ------------------------------------------------
+    #            IN-MEMORY ANSWER
+    # ------------------------------------------------
+    def apply(self, plan):
+        rows = self.rows
+
+        for column, op, value in plan["filters"]:
+            if op == "==":
+                rows = [row for row in rows if row.get(column) == value]
+            else:
+                compare = {
+                    ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+                    "<": lambda a, b: a < b, "<=": lambda a, b: a <= b,
+                }[op]
+                rows = [row for row in rows if numeric(row.get(column)) and compare(row[column], value)]
+
+        if plan["sort"]:
+            column, descending = plan["sort"]
+            rows = sorted(
+                (row for row in rows if numeric(row.get(column))),
+                key=lambda row: row[column],
+                reverse=descending
+            )
+
+        if plan["limit"]:
+            rows = rows[:plan["limit"]]
+
+        return rows
+
+    def describe(self, plan, rows):
+        parts = []
+        for column, op, value in plan["filters"]:
+            parts.append(f"{column} {op} {value}")
+        scope = f"Of the {len(self.rows)} previous results"
+        if parts:
+            scope += f", filtered by {', '.join(parts)}"
+
+        if plan["aggregate"]:
+            kind, column = plan["aggregate"]
+            if kind == "count":
+                return f"{scope}: {len(rows)} match."
+            values = [row[column] for row in rows if numeric(row.get(column))]
+            if not values:
+                return f"{scope}: no {column} values to aggregate."
+            result = sum(values) if kind == "sum" else sum(values) / len(values)
+            label = "total" if kind == "sum" else "average"
+            return f"{scope}: {label} {column} is {round(result, 2)} over {len(values)} rows."
+
+        if not rows:
+            return f"{scope}: none match."
+
+        if plan["sort"]:
+            column, descending = plan["sort"]
+            top = rows[0]
+            label = ", ".join(f"{k}: {v}" for k, v in top.items() if k != column and v is not None)
+            return (
+                f"{scope}, the {'highest' if descending else 'lowest'} {column} is {top[column]} ({label})."
+            )
+        return f"{scope}: {len(rows)} match."
+
+    def refine(self, question, entities=None):
+        """
+        Answers a follow-up from the previous rows. Returns
+        (answer_text, rows, plan, seconds) or None when new data is needed.
+        """
+        plan = self.parse_refinement(question, entities)
+        if plan is None:
+            return None
+
+        start = time.time()
+        rows = self.apply(plan)
+        text = self.describe(plan, rows)
+
+        if rows and not plan["aggregate"]:
+            shown = rows[:TABLE_ROWS]
+            columns = list(shown[0].keys())
+            lines = [
+                "| " + " | ".join(columns) + " |",
+                "|" + "|".join("---" for _ in columns) + "|",
+            ]
+            for row in shown:
+                lines.append("| " + " | ".join("" if row.get(c) is None else str(row.get(c)) for c in columns) + " |")
+            text += "\n\n" + "\n".join(lines)
+
+        return text, rows, plan, time.time() - start
@@ -1,16 +1,14 @@
-from neo4j import GraphDatabase
 import pandas as pd
-import os
-
+from graph_db import get_driver
+from graph_version import bump_graph_version
+from materialized import (
+    ensure_aggregate_schema, affected_groups, update_aggregates, aggregates_current, rebuild_aggregates,
+    set_aggregates_ready
+)
+from query_builder import ensure_filter_indexes
 
-URI = os.environ.get("NEO4J_URI")
-USER = os.environ.get("USER_NAME")
-PASSWORD = os.environ.get("PASSWORD")
 
-driver = GraphDatabase.driver(
-    os.environ["NEO4J_URI"],
-    auth=(os.environ["USER_NAME"], os.environ["PASSWORD"])
-)
+driver = get_driver()
 
 
 df = pd.read_csv("Airline_surveys_sample.csv")
@@ -89,12 +87,43 @@ def create_graph(tx, row):
     origin=row["origin_station_code"],
     destination=row["destination_station_code"]
     )
-    
+
+
+# Rows per write transaction; each batch also recomputes the materialized
+# aggregates (materialized.py) of the groups its rows touch
+BATCH_SIZE = 200
+
+
+def create_batch(tx, rows, materialize):
+    ids = [row["feedback_ID"] for row in rows]
+    if materialize:
+        # Groups the rows' journeys and passengers are in before the write
+        stale = affected_groups(tx, ids, [row["record_locator"] for row in rows])
+    for row in rows:
+        create_graph(tx, row)
+    if materialize:
+        update_aggregates(tx, ids, stale)
+
+
 with driver.session() as session:
-    for i, row in df.iterrows():
-        session.execute_write(create_graph, row)
-        if i % 200 == 0:
-            print(f"Inserted {i} rows...")
+    ensure_aggregate_schema(session)
+    ensure_filter_indexes(session)
+
+    # Batches can only be added incrementally if the aggregates already
+    # cover what is in the graph; otherwise rebuild them after loading
+    incremental = aggregates_current(session)
+
+    rows = [row for _, row in df.iterrows()]
+    for start in range(0, len(rows), BATCH_SIZE):
+        session.execute_write(create_batch, rows[start:start + BATCH_SIZE], incremental)
+        print(f"Inserted {start + len(rows[start:start + BATCH_SIZE])} rows...")
+
+    if incremental:
+        set_aggregates_ready(session)
+    else:
+        rebuild_aggregates(session)
+
+    bump_graph_version(session)
 
 print("NEW RAW KG CREATED ")
 driver.close()
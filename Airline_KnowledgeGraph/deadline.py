@@ -0,0 +1,78 @@
+import math
+import os
+import time
+
+# ------------------------------------------------------------------
+# End-to-end deadline budgets
+# ------------------------------------------------------------------
+# answer_question accepts a deadline (seconds) and every stage asks it
+# for its timeout: min(stage cap, time left). When too little time is
+# left for a stage, the router degrades instead of starting it.
+
+# Per-stage caps (seconds), applied even without an overall deadline
+NLU_TIMEOUT = float(os.environ.get("NLU_TIMEOUT", "10"))
+RETRIEVAL_TIMEOUT = float(os.environ.get("RETRIEVAL_TIMEOUT", "15"))
+EMBEDDING_TIMEOUT = float(os.environ.get("EMBEDDING_TIMEOUT", "10"))
+ANSWER_TIMEOUT = float(os.environ.get("ANSWER_TIMEOUT", "60"))
+
+# Minimum time left to still attempt a stage
+MIN_NLU_BUDGET = float(os.environ.get("MIN_NLU_BUDGET", "2"))
+MIN_EMBEDDING_BUDGET = float(os.environ.get("MIN_EMBEDDING_BUDGET", "2"))
+MIN_ANSWER_BUDGET = float(os.environ.get("MIN_ANSWER_BUDGET", "1"))
+
+# Default overall deadline for answer_question (unset = none)
+DEFAULT_DEADLINE = os.environ.get("ANSWER_DEADLINE_SECONDS")
+
+# Width (seconds) of the deadline buckets used in coalescing keys
+DEADLINE_BUCKET = float(os.environ.get("DEADLINE_BUCKET", "5"))
+
+
+class Deadline:
+
+    def __init__(self, seconds=None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    @classmethod
+    def coerce(cls, deadline):
+        """
+        Accepts a Deadline, a number of seconds, or None (default deadline).
+        """
+        if isinstance(deadline, Deadline):
+            return deadline
+        if deadline is None and DEFAULT_DEADLINE:
+            deadline = float(DEFAULT_DEADLINE)
+        return cls(deadline)
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def bucket(self):
+        """
+        Coarse time left, for keys of work shared between callers: only
+        callers with about the same budget share one computation. None
+        without a deadline.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        return math.ceil(remaining / DEADLINE_BUCKET)
+
+    def allows(self, budget):
+        """
+        True when at least `budget` seconds are left.
+        """
+        remaining = self.remaining()
+        return remaining is None or remaining >= budget
+
+    def timeout(self, cap=None):
+        """
+        Timeout for the next stage: min(cap, time left).
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        if cap is None:
+            return remaining
+        return min(cap, remaining)
@@ -1,20 +1,20 @@
-from neo4j import GraphDatabase
 from sentence_transformers import SentenceTransformer
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from graph_version import bump_graph_version
+from graph_db import get_driver
 
 # ----------------------------------
 # CONFIG
 # ----------------------------------
-URI = os.environ.get("NEO4J_URI")
-USER = os.environ.get("USER_NAME")
-PASSWORD = os.environ.get("PASSWORD")
-
 MODELS = {
     "minilm": "sentence-transformers/all-MiniLM-L6-v2",
     "mpnet": "sentence-transformers/all-mpnet-base-v2"
 }
 
-driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD))
+driver = get_driver()
 
 
 def build_journey_text(record):
@@ -62,6 +62,7 @@ def generate_embeddings():
                     embedding=emb
                 )
 
+        bump_graph_version(session)
         print("✅ Embeddings generated for both models")
 
 
@@ -1,11 +1,10 @@
-from neo4j import GraphDatabase
 import os
+import sys
 
-URI = os.environ.get("NEO4J_URI")
-USER = os.environ.get("USER_NAME")
-PASSWORD = os.environ.get("PASSWORD")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from graph_db import get_driver
 
-driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD))
+driver = get_driver()
 
 INDEXES = {
     "journey_minilm_index": "embedding_minilm",
@@ -1,12 +1,7 @@
-from sentence_transformers import SentenceTransformer
-from neo4j import GraphDatabase
-import os
-
-print("🔥 LOADED NEW embedding_retreival.py")
-
-URI = os.environ.get("NEO4J_URI")
-USER = os.environ.get("USER_NAME")
-PASSWORD = os.environ.get("PASSWORD")
+from neo4j import Query
+import asyncio
+import threading
+from graph_db import get_driver, get_async_driver
 
 MODELS = {
     "minilm": ("sentence-transformers/all-MiniLM-L6-v2", "journey_minilm_index"),
@@ -14,49 +9,74 @@ MODELS = {
 }
 
 
-def get_driver():
-    missing = []
+# SentenceTransformer models are loaded on first use, so importing this
+# module needs no torch; Neo4j drivers are the shared ones from graph_db
+_lock = threading.Lock()
 
-    if URI is None:
-        missing.append("NEO4J_URI")
-    if USER is None:
-        missing.append("USER_NAME")
-    if PASSWORD is None:
-        missing.append("PASSWORD")
 
-    if missing:
-        raise ValueError(f"❌ Missing environment variable(s): {', '.join(missing)}")
+SIMILARITY_QUERY = """
+CALL db.index.vector.queryNodes($index, $k, $embedding)
+YIELD node, score
+RETURN
+    node.feedback_ID AS journey,
+    node.arrival_delay_minutes AS delay,
+    node.food_satisfaction_score AS food,
+    score
+ORDER BY score DESC
+"""
 
-    return GraphDatabase.driver(URI, auth=(USER, PASSWORD))
+# Loaded SentenceTransformer models, one per model key
+_models = {}
 
 
-driver = get_driver()
+def get_model(model_key):
+    if model_key not in _models:
+        # Imported here: sentence_transformers pulls in torch (seconds)
+        from sentence_transformers import SentenceTransformer
 
+        with _lock:
+            if model_key not in _models:
+                model_name, _ = MODELS[model_key]
+                _models[model_key] = SentenceTransformer(model_name)
+    return _models[model_key]
 
-def get_similar_journeys(query_text, model_key="minilm", top_k=5):
-    model_name, index_name = MODELS[model_key]
-    model = SentenceTransformer(model_name)
 
-    query_embedding = model.encode(
+def encode_query(query_text, model_key="minilm"):
+    return get_model(model_key).encode(
         query_text,
         normalize_embeddings=True
     ).tolist()
 
-    with driver.session() as session:
+
+def get_similar_journeys(query_text, model_key="minilm", top_k=5, timeout=None):
+    _, index_name = MODELS[model_key]
+    query_embedding = encode_query(query_text, model_key)
+
+    with get_driver().session() as session:
         result = session.run(
-            """
-            CALL db.index.vector.queryNodes($index, $k, $embedding)
-            YIELD node, score
-            RETURN
-                node.feedback_ID AS journey,
-                node.arrival_delay_minutes AS delay,
-                node.food_satisfaction_score AS food,
-                score
-            ORDER BY score DESC
-            """,
+            Query(SIMILARITY_QUERY, timeout=timeout),
             index=index_name,
             k=top_k,
             embedding=query_embedding
         )
 
         return result.data()
+
+
+async def get_similar_journeys_async(query_text, model_key="minilm", top_k=5, timeout=None):
+    """
+    Async variant: encoding runs in a worker thread, the vector search on
+    the async Neo4j driver.
+    """
+    _, index_name = MODELS[model_key]
+    query_embedding = await asyncio.to_thread(encode_query, query_text, model_key)
+
+    async with get_async_driver().session() as session:
+        result = await session.run(
+            Query(SIMILARITY_QUERY, timeout=timeout),
+            index=index_name,
+            k=top_k,
+            embedding=query_embedding
+        )
+
+        return await result.data()
@@ -1,13 +1,13 @@
-import os, json, re
-from huggingface_hub import InferenceClient
+import json, re
+import asyncio
+from gazetteer import extract_entities_gazetteer, empty_entities
+from inference import chat_completion, chat_completion_async
+from logs import get_logger
 
-HF_TOKEN = os.environ.get("HF_TOKEN")
-if HF_TOKEN is None:
-    raise ValueError("❌ HF_TOKEN is not set.")
+log = get_logger("entities")
 
 MODEL_NAME = "deepseek-ai/DeepSeek-V3.2"  
 
-client = InferenceClient(api_key=HF_TOKEN)
 
 ENTITY_SYSTEM_PROMPT = """
 You are an Airline Entity Extraction Model for a Knowledge Graph System.
@@ -102,22 +102,59 @@ def clean_json(text):
     text = re.sub(r"^```json|```$", "", text).strip()
     return text
 
-def extract_entities_llm(question):
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": ENTITY_SYSTEM_PROMPT},
-            {"role": "user", "content": question}
-        ]
-    )
+def entity_messages(question):
+    return [
+        {"role": "system", "content": ENTITY_SYSTEM_PROMPT},
+        {"role": "user", "content": question}
+    ]
+
+def extract_entities_offline(question):
+    """
+    Entities without any LLM call: the gazetteer's (possibly partial)
+    result, else the regex hardening layer on an empty extraction.
+    """
+    entities, _ = extract_entities_gazetteer(question)
+    if entities is not None:
+        return entities
+    return parse_entities(question, json.dumps(empty_entities()))
+
+def extract_entities_llm(question, timeout=None):
+    # Deterministic extraction from the graph vocabulary first;
+    # the LLM is only needed when some entity-looking token is unknown.
+    entities, fully_resolved = extract_entities_gazetteer(question)
+    if fully_resolved:
+        return entities
+
+    raw, _ = chat_completion(MODEL_NAME, entity_messages(question), timeout=timeout)
+    raw = raw.strip()
+    return parse_entities(question, raw)
+
 
-    raw = response.choices[0].message["content"].strip()
+async def extract_entities_llm_async(question, timeout=None):
+    """
+    Async variant of extract_entities_llm (gazetteer first, then the
+    async inference client).
+    """
+    entities, fully_resolved = await asyncio.to_thread(extract_entities_gazetteer, question)
+    if fully_resolved:
+        return entities
+
+    raw, _ = await chat_completion_async(MODEL_NAME, entity_messages(question), timeout=timeout)
+    raw = raw.strip()
+    return parse_entities(question, raw)
+
+
+def parse_entities(question, raw):
+    """
+    Parses the LLM's JSON reply and applies the regex hardening /
+    normalization layer.
+    """
     cleaned = clean_json(raw)
 
     try:
         parsed = json.loads(cleaned)
     except:
-        print("⚠ JSON parse failed. Fallback used.")
+        log.warning("json_parse_failed", reply=raw[:200])
         parsed = {
             "flights": [],
             "airports": [],
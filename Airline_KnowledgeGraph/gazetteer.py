@@ -0,0 +1,275 @@
+import re
+import threading
+import graph_db
+from graph_version import get_graph_version
+from logs import get_logger
+
+log = get_logger("gazetteer")
+
+# ------------------------------------------------------------------
+# Graph-vocabulary gazetteer
+# ------------------------------------------------------------------
+# Deterministic entity extraction from the values actually present in the
+# KG. Exact codes are looked up in hash sets; multi-word / case-insensitive
+# phrases (loyalty levels, generations, classes, fleet types) go through a
+# prefix trie. When every entity-looking token of a question is resolved,
+# extract_entities_llm can skip the LLM entirely.
+
+VOCAB_QUERIES = {
+    "airports": "MATCH (a:Airport) RETURN DISTINCT a.station_code AS value",
+    "flights": "MATCH (f:Flight) RETURN DISTINCT toString(f.flight_number) AS value",
+    "fleets": "MATCH (f:Flight) RETURN DISTINCT f.fleet_type_description AS value",
+    "record_locators": "MATCH (p:Passenger) RETURN DISTINCT p.record_locator AS value",
+    "loyalty_levels": "MATCH (p:Passenger) RETURN DISTINCT p.loyalty_program_level AS value",
+    "generations": "MATCH (p:Passenger) RETURN DISTINCT p.generation AS value",
+    "classes": "MATCH (j:Journey) RETURN DISTINCT j.passenger_class AS value",
+}
+
+# Categories matched as phrases through the trie
+PHRASE_CATEGORIES = ("loyalty_levels", "generations", "classes", "fleets")
+
+# Common spellings that differ from the stored value
+PHRASE_ALIASES = {
+    "generations": {
+        "boomer": "Boomer", "baby boomer": "Boomer",
+        "gen x": "Gen X", "generation x": "Gen X",
+        "gen z": "Gen Z", "generation z": "Gen Z",
+        "millennial": "Millennial", "silent generation": "Silent",
+    },
+}
+
+AIRPORT_CONTEXT_WORDS = {"from", "to", "at", "via", "airport", "station", "and"}
+
+JOURNEY_ID_PATTERN = re.compile(r"\bF_\d+\b")
+FLIGHT_NUMBER_PATTERN = re.compile(r"\bflights?\s*(?:number|no\.?|#)?\s*#?(\d{1,5})\b", re.IGNORECASE)
+ROUTE_PATTERN = re.compile(r"\bfrom\s+([A-Za-z]{3})\s+(?:to|into|towards)\s+([A-Za-z]{3})\b", re.IGNORECASE)
+# Uppercase codes with at least one letter; locators may start with a digit (0BXX7K)
+CODE_TOKEN_PATTERN = re.compile(r"\b(?=[0-9]*[A-Z])[A-Z0-9]{3,8}\b")
+
+
+def empty_entities():
+    return {
+        "flights": [],
+        "airports": [],
+        "passengers": [],
+        "journeys": [],
+        "routes": {"origin": "", "destination": ""}
+    }
+
+
+# ------------------------------------------------------------------
+# Prefix trie (case-insensitive phrase matching)
+# ------------------------------------------------------------------
+class PrefixTrie:
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, phrase, value):
+        node = self.root
+        for ch in phrase.lower():
+            node = node.setdefault(ch, {})
+        node[None] = value
+
+    def match_at(self, text, start):
+        """
+        Longest phrase starting at text[start] that ends on a word boundary.
+        A trailing plural ("millennials", "boomers") still counts as a match.
+        Returns (end, value) or None.
+        """
+        def boundary(k):
+            return k >= len(text) or not text[k].isalnum()
+
+        node = self.root
+        best = None
+        i = start
+
+        while True:
+            if None in node:
+                if boundary(i):
+                    best = (i, node[None])
+                elif text.startswith("s", i) and boundary(i + 1):
+                    best = (i + 1, node[None])
+                elif text.startswith("es", i) and boundary(i + 2):
+                    best = (i + 2, node[None])
+            if i >= len(text) or text[i] not in node:
+                break
+            node = node[text[i]]
+            i += 1
+
+        return best
+
+
+# ------------------------------------------------------------------
+# Gazetteer
+# ------------------------------------------------------------------
+class Gazetteer:
+
+    def __init__(self, vocab=None):
+        self.vocab = {}
+        self.literals = set()
+        self.trie = PrefixTrie()
+        self.version = None
+        if vocab is not None:
+            self.build(vocab)
+
+    def build(self, vocab):
+        self.vocab = {k: {str(v) for v in values if v is not None} for k, values in vocab.items()}
+        self.airports_lower = {a.lower(): a for a in self.vocab.get("airports", ())}
+        # Every graph value, lowercased (answer cache signatures)
+        self.literals = {v.lower() for values in self.vocab.values() for v in values}
+
+        self.trie = PrefixTrie()
+        for category in PHRASE_CATEGORIES:
+            for value in self.vocab.get(category, ()):
+                self.trie.insert(value, (category, value))
+            for alias, value in PHRASE_ALIASES.get(category, {}).items():
+                if value in self.vocab.get(category, ()):
+                    self.trie.insert(alias, (category, value))
+
+    def load(self, driver):
+        vocab = {}
+        with driver.session() as session:
+            for category, query in VOCAB_QUERIES.items():
+                vocab[category] = [r["value"] for r in session.run(query)]
+        self.build(vocab)
+        return self
+
+    # ------------------------------------------------
+    #              EXTRACTION
+    # ------------------------------------------------
+    def extract(self, question):
+        """
+        Returns (entities, fully_resolved). Entities use the same shape as
+        extract_entities_llm. fully_resolved is False when the question holds
+        an entity-looking token the graph vocabulary does not know.
+        """
+        entities = empty_entities()
+        unresolved = []
+        claimed = []  # character spans already explained
+
+        def add(key, value):
+            if value not in entities[key]:
+                entities[key].append(value)
+
+        # ---------- JOURNEY IDS ----------
+        for m in JOURNEY_ID_PATTERN.finditer(question):
+            add("journeys", m.group(0))
+            claimed.append(m.span())
+
+        # ---------- FLIGHT NUMBERS ----------
+        for m in FLIGHT_NUMBER_PATTERN.finditer(question):
+            number = m.group(1)
+            if number in self.vocab.get("flights", ()):
+                add("flights", number)
+            else:
+                unresolved.append(number)
+            claimed.append(m.span(1))
+
+        # ---------- PHRASES (trie) ----------
+        lowered = question.lower()
+        i = 0
+        while i < len(lowered):
+            if i == 0 or not lowered[i - 1].isalnum():
+                hit = self.trie.match_at(lowered, i)
+                if hit:
+                    end, (category, value) = hit
+                    entities.setdefault(category, [])
+                    if value not in entities[category]:
+                        entities[category].append(value)
+                    if category == "loyalty_levels":
+                        add("passengers", value.lower())
+                    claimed.append((i, end))
+                    i = end
+                    continue
+            i += 1
+
+        # ---------- ROUTE ----------
+        route = ROUTE_PATTERN.search(question)
+        if route:
+            origin, dest = (self.airports_lower.get(c.lower()) for c in route.groups())
+            if origin and dest:
+                entities["routes"] = {"origin": origin, "destination": dest}
+
+        # ---------- CODES (airports / record locators) ----------
+        words = re.findall(r"[A-Za-z0-9_\-]+", question)
+        for idx, word in enumerate(words):
+            prev = words[idx - 1].lower() if idx > 0 else ""
+            if word.upper() in self.vocab.get("airports", ()) and (
+                word.isupper() or prev in AIRPORT_CONTEXT_WORDS
+            ):
+                add("airports", word.upper())
+
+        for m in CODE_TOKEN_PATTERN.finditer(question):
+            token = m.group(0)
+            if any(s <= m.start() and m.end() <= e for s, e in claimed):
+                continue
+            if token in self.vocab.get("airports", ()):
+                continue
+            if token in self.vocab.get("record_locators", ()):
+                add("passengers", token.lower())
+                continue
+            unresolved.append(token)
+
+        if not entities["routes"]["origin"] and len(entities["airports"]) >= 2 and " to " in lowered:
+            entities["routes"] = {
+                "origin": entities["airports"][0],
+                "destination": entities["airports"][1]
+            }
+
+        return entities, not unresolved
+
+
+# ------------------------------------------------------------------
+# Shared instance, reloaded when the graph version changes
+# ------------------------------------------------------------------
+_gazetteer = None
+_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """
+    Returns the loaded gazetteer, or None if the graph is unreachable.
+    """
+    global _gazetteer
+
+    if not graph_db.has_credentials():
+        return None
+
+    # The version read is cached in graph_version; only a reload locks
+    try:
+        driver = graph_db.get_driver()
+        version = get_graph_version(driver)
+    except Exception as e:
+        log.error("load_error", error=str(e))
+        return _gazetteer
+
+    if not needs_reload(_gazetteer, version):
+        return _gazetteer
+
+    with _lock:
+        # Another caller may have reloaded while this one waited
+        if needs_reload(_gazetteer, version):
+            try:
+                gazetteer = Gazetteer().load(driver)
+                gazetteer.version = version
+                _gazetteer = gazetteer
+                log.info("loaded", graph_version=version)
+            except Exception as e:
+                log.error("load_error", error=str(e))
+
+        return _gazetteer
+
+
+def needs_reload(gazetteer, version):
+    return gazetteer is None or (version is not None and version != gazetteer.version)
+
+
+def extract_entities_gazetteer(question):
+    """
+    Returns (entities, fully_resolved); (None, False) when unavailable.
+    """
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return None, False
+    return gazetteer.extract(question)
@@ -0,0 +1,309 @@
+import os
+import time
+import asyncio
+import threading
+import configparser
+from neo4j import GraphDatabase, AsyncGraphDatabase
+
+# ------------------------------------------------------------------
+# Shared Neo4j drivers
+# ------------------------------------------------------------------
+# One sync and one async driver per process, so every component (router,
+# retriever, gazetteer, embedding search, ingestion scripts) draws from
+# the same connection pool. Settings come from the environment, falling
+# back to config.txt ([DEFAULT] section), then to the defaults below.
+# NEO4J_CONFIG_FILE names another file; set it empty to use the
+# environment only (the checked-in config.txt is a local-dev example):
+#
+#   env                            config.txt                 default
+#   NEO4J_URI                      URI
+#   USER_NAME                      USERNAME
+#   PASSWORD                       PASSWORD
+#   NEO4J_MAX_POOL_SIZE            MAX_POOL_SIZE              50
+#   NEO4J_ACQUISITION_TIMEOUT      ACQUISITION_TIMEOUT        10   seconds
+#   NEO4J_CONNECTION_TIMEOUT       CONNECTION_TIMEOUT         5    seconds
+#   NEO4J_MAX_CONNECTION_LIFETIME  MAX_CONNECTION_LIFETIME    3600 seconds
+#   NEO4J_LIVENESS_CHECK_TIMEOUT   LIVENESS_CHECK_TIMEOUT     60   seconds idle
+#   NEO4J_FETCH_SIZE               FETCH_SIZE                 1000 records
+#
+# Connections idle for longer than the liveness timeout are checked
+# before reuse. pool_stats() reports the session slots in use / peak and
+# the time spent waiting for one.
+
+CONFIG_PATH = os.environ.get(
+    "NEO4J_CONFIG_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt")
+)
+
+SETTINGS = {
+    # name: (env var, config key, default, type)
+    "uri": ("NEO4J_URI", "URI", None, str),
+    "user": ("USER_NAME", "USERNAME", None, str),
+    "password": ("PASSWORD", "PASSWORD", None, str),
+    "max_pool_size": ("NEO4J_MAX_POOL_SIZE", "MAX_POOL_SIZE", 50, int),
+    "acquisition_timeout": ("NEO4J_ACQUISITION_TIMEOUT", "ACQUISITION_TIMEOUT", 10.0, float),
+    "connection_timeout": ("NEO4J_CONNECTION_TIMEOUT", "CONNECTION_TIMEOUT", 5.0, float),
+    "max_connection_lifetime": ("NEO4J_MAX_CONNECTION_LIFETIME", "MAX_CONNECTION_LIFETIME", 3600.0, float),
+    "liveness_check_timeout": ("NEO4J_LIVENESS_CHECK_TIMEOUT", "LIVENESS_CHECK_TIMEOUT", 60.0, float),
+    "fetch_size": ("NEO4J_FETCH_SIZE", "FETCH_SIZE", 1000, int),
+}
+
+
+def load_settings(path=CONFIG_PATH):
+    """
+    path: config file to fall back to; None or "" for env-only settings.
+    """
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    if path:
+        config.read(path)
+    file_settings = config.defaults()
+
+    settings = {}
+    for name, (env_var, config_key, default, cast) in SETTINGS.items():
+        value = os.environ.get(env_var) or file_settings.get(config_key)
+        settings[name] = cast(value) if value else default
+    return settings
+
+
+settings = load_settings()
+
+
+def has_credentials():
+    return bool(settings["uri"] and settings["user"] and settings["password"])
+
+
+def check_credentials():
+    missing = [
+        SETTINGS[name][0] for name in ("uri", "user", "password") if not settings[name]
+    ]
+    if missing:
+        raise ValueError(f"Missing Neo4j settings: {', '.join(missing)} (env or config.txt)")
+
+
+def driver_config():
+    return {
+        "auth": (settings["user"], settings["password"]),
+        "max_connection_pool_size": settings["max_pool_size"],
+        "connection_acquisition_timeout": settings["acquisition_timeout"],
+        "connection_timeout": settings["connection_timeout"],
+        "max_connection_lifetime": settings["max_connection_lifetime"],
+        "liveness_check_timeout": settings["liveness_check_timeout"],
+        "fetch_size": settings["fetch_size"],
+    }
+
+
+# ------------------------------------------------
+#              POOL STATISTICS
+# ------------------------------------------------
+# The driver's pool has no public metrics, so sessions are admitted here
+# through a semaphore of max_pool_size session slots (each session holds
+# at most one connection). The stats count those slots and the wait for
+# one; they bound, but do not measure, the driver's own connections. A
+# session that gets no slot within acquisition_timeout raises, as the
+# driver would.
+class PoolStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sessions_admitted = 0
+        self.slots_in_use = 0
+        self.slots_peak = 0
+        self.slot_wait = 0.0
+        self.max_slot_wait = 0.0
+        self.slot_timeouts = 0
+
+    def session_opened(self, waited):
+        with self._lock:
+            self.sessions_admitted += 1
+            self.slots_in_use += 1
+            self.slots_peak = max(self.slots_peak, self.slots_in_use)
+            self.slot_wait += waited
+            self.max_slot_wait = max(self.max_slot_wait, waited)
+
+    def session_closed(self):
+        with self._lock:
+            self.slots_in_use -= 1
+
+    def session_timed_out(self):
+        with self._lock:
+            self.slot_timeouts += 1
+
+    def report(self):
+        with self._lock:
+            admitted = self.sessions_admitted
+            return {
+                "sessions_admitted": admitted,
+                "session_slots_in_use": self.slots_in_use,
+                "session_slots_peak": self.slots_peak,
+                "session_slot_timeouts": self.slot_timeouts,
+                "avg_slot_wait_seconds": round(self.slot_wait / admitted, 4) if admitted else 0.0,
+                "max_slot_wait_seconds": round(self.max_slot_wait, 4),
+            }
+
+
+def acquisition_error(timeout):
+    return TimeoutError(
+        f"no Neo4j connection within {timeout}s (pool size {settings['max_pool_size']})"
+    )
+
+
+class TrackedDriver:
+    """
+    Wraps a neo4j driver: sessions are admitted up to the pool size,
+    counted, and their wait for a slot is timed.
+    """
+
+    def __init__(self, driver, stats, is_async=False, max_sessions=None, timeout=None):
+        self._driver = driver
+        self.stats = stats
+        self._is_async = is_async
+        self.max_sessions = max_sessions or settings["max_pool_size"]
+        self.timeout = timeout if timeout is not None else settings["acquisition_timeout"]
+        self._slots = None if is_async else threading.BoundedSemaphore(self.max_sessions)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def slots(self):
+        # The async semaphore belongs to the event loop using the driver
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_sessions)
+        return self._slots
+
+    def session(self, **config):
+        return (AsyncTrackedSession if self._is_async else TrackedSession)(
+            self._driver.session(**config), self
+        )
+
+
+class TrackedSession:
+
+    def __init__(self, session, driver):
+        self._session = session
+        self._driver = driver
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def __enter__(self):
+        start = time.monotonic()
+        if not self._driver.slots().acquire(timeout=self._driver.timeout):
+            self._driver.stats.session_timed_out()
+            raise acquisition_error(self._driver.timeout)
+        self._driver.stats.session_opened(time.monotonic() - start)
+        try:
+            self._session.__enter__()
+        except BaseException:
+            self._release()
+            raise
+        return self._session
+
+    def __exit__(self, *exc):
+        try:
+            return self._session.__exit__(*exc)
+        finally:
+            self._release()
+
+    def _release(self):
+        self._driver.stats.session_closed()
+        self._driver.slots().release()
+
+
+class AsyncTrackedSession:
+
+    def __init__(self, session, driver):
+        self._session = session
+        self._driver = driver
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    async def __aenter__(self):
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._driver.slots().acquire(), self._driver.timeout)
+        except asyncio.TimeoutError:
+            self._driver.stats.session_timed_out()
+            raise acquisition_error(self._driver.timeout)
+        self._driver.stats.session_opened(time.monotonic() - start)
+        try:
+            await self._session.__aenter__()
+        except BaseException:
+            self._release()
+            raise
+        return self._session
+
+    async def __aexit__(self, *exc):
+        try:
+            return await self._session.__aexit__(*exc)
+        finally:
+            self._release()
+
+    def _release(self):
+        self._driver.stats.session_closed()
+        self._driver.slots().release()
+
+
+# ------------------------------------------------
+#              SHARED DRIVERS
+# ------------------------------------------------
+_driver = None
+_async_driver = None
+_lock = threading.Lock()
+
+
+def get_driver():
+    """
+    The process-wide sync driver, created on first use.
+    """
+    global _driver
+    if _driver is None:
+        with _lock:
+            if _driver is None:
+                check_credentials()
+                _driver = TrackedDriver(GraphDatabase.driver(settings["uri"], **driver_config()), PoolStats())
+    return _driver
+
+
+def get_async_driver():
+    """
+    The process-wide async driver, created on first use. Use it from a
+    single event loop.
+    """
+    global _async_driver
+    if _async_driver is None:
+        with _lock:
+            if _async_driver is None:
+                check_credentials()
+                _async_driver = TrackedDriver(
+                    AsyncGraphDatabase.driver(settings["uri"], **driver_config()), PoolStats(), is_async=True
+                )
+    return _async_driver
+
+
+def pool_stats():
+    """
+    Session-slot stats per driver (see PoolStats), not connection counts.
+    """
+    report = {"session_slots": settings["max_pool_size"]}
+    for name, driver in (("sync", _driver), ("async", _async_driver)):
+        if driver is None:
+            continue
+        report[name] = driver.stats.report()
+    return report
+
+
+def close():
+    global _driver
+    with _lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+
+async def close_async():
+    global _async_driver
+    with _lock:
+        driver, _async_driver = _async_driver, None
+    if driver is not None:
+        await driver.close()
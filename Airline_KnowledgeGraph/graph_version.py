@@ -0,0 +1,67 @@
+import time
+from logs import get_logger
+
+log = get_logger("graph_version")
+
+# ------------------------------------------------------------------
+# Graph version counter
+# ------------------------------------------------------------------
+# A single (:GraphMeta) node holds a version number that the ingestion
+# (create_kg.py) and embedding jobs bump whenever they change the graph.
+# Readers compare versions to know when vocabularies / caches built from
+# the graph are stale.
+
+GRAPH_META_KEY = "airline_kg"
+
+# Seconds a version read is trusted before hitting the database again
+VERSION_MAX_AGE = 5.0
+
+_cache = {}
+
+
+def bump_graph_version(session):
+    """
+    Increments the graph version. Accepts a session or a transaction.
+    """
+    record = session.run(
+        """
+        MERGE (m:GraphMeta {key: $key})
+        SET m.version = coalesce(m.version, 0) + 1,
+            m.updated_at = timestamp()
+        RETURN m.version AS version
+        """,
+        key=GRAPH_META_KEY
+    ).single()
+
+    _cache.clear()
+    return record["version"]
+
+
+def read_graph_version(driver):
+    with driver.session() as session:
+        record = session.run(
+            "MATCH (m:GraphMeta {key: $key}) RETURN m.version AS version",
+            key=GRAPH_META_KEY
+        ).single()
+
+    return record["version"] if record and record["version"] is not None else 0
+
+
+def get_graph_version(driver, max_age=VERSION_MAX_AGE):
+    """
+    Cached read of the graph version (at most one query per max_age seconds
+    per driver). Returns None if the database cannot be reached.
+    """
+    now = time.monotonic()
+    cached = _cache.get(id(driver))
+    if cached and now - cached[1] < max_age:
+        return cached[0]
+
+    try:
+        version = read_graph_version(driver)
+    except Exception as e:
+        log.error("read_error", error=str(e))
+        return cached[0] if cached else None
+
+    _cache[id(driver)] = (version, now)
+    return version
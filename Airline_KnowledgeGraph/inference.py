@@ -0,0 +1,372 @@
+import os
+import math
+import time
+import random
+import asyncio
+import threading
+from llm_memo import memo, memo_key
+from logs import get_logger
+
+log = get_logger("inference")
+
+# ------------------------------------------------------------------
+# Shared inference entry point
+# ------------------------------------------------------------------
+# Every chat completion (intent, entities, answers) goes through
+# chat_completion / chat_completion_async / chat_completion_stream so the
+# persistent memo, the per-model limits and the retry policy sit in
+# front of all of them:
+#
+#   - clients are reused (one per timeout bucket) so HTTP connections
+#     stay alive between calls
+#   - each model has a token bucket (requests/second) and a cap on
+#     concurrent requests; time spent waiting for them is reported as
+#     queue wait in inference_stats()
+#   - 429 and 5xx responses are retried with jittered exponential
+#     backoff (honouring Retry-After) while the caller's timeout allows
+#   - clients (and the HF_TOKEN check) are created on first use, so
+#     importing this module needs no credentials
+
+# Per-model defaults; override per model with configure_model()
+MODEL_RATE = float(os.environ.get("INFERENCE_RATE", "5"))  # requests / second
+MODEL_BURST = int(os.environ.get("INFERENCE_BURST", "5"))
+MODEL_CONCURRENCY = int(os.environ.get("INFERENCE_CONCURRENCY", "4"))
+
+MAX_RETRIES = int(os.environ.get("INFERENCE_MAX_RETRIES", "3"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+
+class RateLimiter:
+    """
+    Token bucket: `rate` acquisitions per second, bursts up to `burst`.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token and returns how long (seconds) to wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        time.sleep(self.reserve())
+
+    async def acquire_async(self):
+        await asyncio.sleep(self.reserve())
+
+
+class ModelLimits:
+
+    def __init__(self, rate=MODEL_RATE, burst=MODEL_BURST, concurrency=MODEL_CONCURRENCY):
+        self.limiter = RateLimiter(rate, burst)
+        self.concurrency = concurrency
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.async_slots = None
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    def get_async_slots(self):
+        if self.async_slots is None:
+            self.async_slots = asyncio.Semaphore(self.concurrency)
+        return self.async_slots
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.queue_wait += seconds
+            self.max_queue_wait = max(self.max_queue_wait, seconds)
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "errors": self.errors,
+                "avg_queue_wait_seconds": round(self.queue_wait / self.requests, 3) if self.requests else 0.0,
+                "max_queue_wait_seconds": round(self.max_queue_wait, 3),
+            }
+
+
+_limits = {}
+_clients = {}
+_lock = threading.Lock()
+
+
+def configure_model(model_id, rate=MODEL_RATE, burst=MODEL_BURST, concurrency=MODEL_CONCURRENCY):
+    """
+    Sets the provider quota for one model (call before traffic starts).
+    """
+    with _lock:
+        _limits[model_id] = ModelLimits(rate, burst, concurrency)
+
+
+def limits_for(model_id):
+    with _lock:
+        if model_id not in _limits:
+            _limits[model_id] = ModelLimits()
+        return _limits[model_id]
+
+
+def inference_stats():
+    with _lock:
+        limits = dict(_limits)
+    return {model_id: model_limits.stats() for model_id, model_limits in limits.items()}
+
+
+# ------------------------------------------------
+#              CLIENTS / RETRIES
+# ------------------------------------------------
+def hf_token():
+    token = os.environ.get("HF_TOKEN")
+    if token is None:
+        raise ValueError("❌ HF_TOKEN is not set.")
+    return token
+
+
+def client_for(timeout):
+    """
+    Shared client for a timeout, rounded up to whole seconds so a handful
+    of long-lived clients (and their connections) serve every deadline.
+    """
+    bucket = None if timeout is None else max(1, math.ceil(timeout))
+    with _lock:
+        if bucket not in _clients:
+            # Imported here: huggingface_hub is slow to import
+            from huggingface_hub import InferenceClient
+
+            _clients[bucket] = InferenceClient(api_key=hf_token(), timeout=bucket)
+        return _clients[bucket]
+
+
+def get_async_client():
+    with _lock:
+        if "async" not in _clients:
+            from huggingface_hub import AsyncInferenceClient
+
+            _clients["async"] = AsyncInferenceClient(api_key=hf_token())
+        return _clients["async"]
+
+
+def warmup():
+    """
+    Creates the default sync and async clients ahead of the first request.
+    """
+    client_for(None)
+    get_async_client()
+
+
+def retry_delay(error, attempt):
+    """
+    Seconds to wait before retrying `error`, or None if it is not
+    retryable (only 429 and 5xx are).
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None or not (status == 429 or 500 <= status < 600):
+        return None
+
+    retry_after = (getattr(response, "headers", None) or {}).get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def give_up(limits, error, attempt, start, timeout):
+    """
+    Returns the backoff delay before the next attempt, or None when the
+    error should be raised (not retryable, out of retries or out of time).
+    """
+    delay = retry_delay(error, attempt)
+    left = remaining_time(start, timeout)
+    if delay is None or attempt == MAX_RETRIES or (left is not None and left <= delay):
+        limits.count("errors")
+        return None
+
+    limits.count("retries")
+    log.warning("retry", attempt=attempt + 1, delay=round(delay, 3), error=str(error))
+    return delay
+
+
+def remaining_time(start, timeout):
+    if timeout is None:
+        return None
+    return timeout - (time.monotonic() - start)
+
+
+def _request_kwargs(model_id, messages, temperature, max_tokens):
+    kwargs = {"model": model_id, "messages": messages}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    return kwargs
+
+
+def call_with_limits(model_id, request, timeout):
+    """
+    Runs request(timeout_left) under the model's rate / concurrency limits,
+    retrying 429/5xx with backoff while time is left.
+    """
+    limits = limits_for(model_id)
+    start = time.monotonic()
+
+    for attempt in range(MAX_RETRIES + 1):
+        queued = time.monotonic()
+        limits.limiter.acquire()
+        with limits.slots:
+            limits.record_wait(time.monotonic() - queued)
+            try:
+                return request(remaining_time(start, timeout))
+            except Exception as e:
+                error = e
+
+        delay = give_up(limits, error, attempt, start, timeout)
+        if delay is None:
+            raise error
+        time.sleep(delay)
+
+
+async def call_with_limits_async(model_id, request, timeout):
+    """
+    Async variant of call_with_limits; request(timeout_left) is awaitable.
+    """
+    limits = limits_for(model_id)
+    start = time.monotonic()
+
+    for attempt in range(MAX_RETRIES + 1):
+        queued = time.monotonic()
+        await limits.limiter.acquire_async()
+        async with limits.get_async_slots():
+            limits.record_wait(time.monotonic() - queued)
+            try:
+                return await request(remaining_time(start, timeout))
+            except Exception as e:
+                error = e
+
+        delay = give_up(limits, error, attempt, start, timeout)
+        if delay is None:
+            raise error
+        await asyncio.sleep(delay)
+
+
+# ------------------------------------------------
+#              CHAT COMPLETIONS
+# ------------------------------------------------
+def chat_completion(model_id, messages, temperature=None, max_tokens=None, timeout=None):
+    """
+    Returns (content, memo_hit). timeout (seconds) bounds the whole call,
+    queueing and retries included.
+    """
+    key = memo_key(model_id, messages, temperature, max_tokens)
+    cached = memo.get(key)
+    if cached is not None:
+        return cached, True
+
+    def request(timeout_left):
+        if timeout_left is not None and timeout_left <= 0:
+            raise TimeoutError(f"{model_id}: no time left for the request")
+        return client_for(timeout_left).chat.completions.create(
+            **_request_kwargs(model_id, messages, temperature, max_tokens)
+        )
+
+    response = call_with_limits(model_id, request, timeout)
+    content = response.choices[0].message["content"]
+
+    memo.put(key, model_id, content)
+    return content, False
+
+
+async def chat_completion_async(model_id, messages, temperature=None, max_tokens=None, timeout=None):
+    """
+    Async variant of chat_completion. Returns (content, memo_hit).
+    """
+    key = memo_key(model_id, messages, temperature, max_tokens)
+    # The memo is SQLite on disk: keep its reads and writes off the loop
+    cached = await asyncio.to_thread(memo.get, key)
+    if cached is not None:
+        return cached, True
+
+    async def request(timeout_left):
+        return await asyncio.wait_for(
+            get_async_client().chat.completions.create(
+                **_request_kwargs(model_id, messages, temperature, max_tokens)
+            ),
+            None if timeout_left is None else max(0.0, timeout_left)
+        )
+
+    response = await call_with_limits_async(model_id, request, timeout)
+    content = response.choices[0].message["content"]
+
+    await asyncio.to_thread(memo.put, key, model_id, content)
+    return content, False
+
+
+def chat_completion_stream(model_id, messages, temperature=None, max_tokens=None, timeout=None):
+    """
+    Generator over content chunks as the model produces them. Its return
+    value (StopIteration.value) is memo_hit; a memoized completion is
+    yielded as a single chunk. Only opening the stream is retried; the
+    model's concurrency slot is held until the stream ends.
+    """
+    key = memo_key(model_id, messages, temperature, max_tokens)
+    cached = memo.get(key)
+    if cached is not None:
+        yield cached
+        return True
+
+    limits = limits_for(model_id)
+    start = time.monotonic()
+
+    for attempt in range(MAX_RETRIES + 1):
+        queued = time.monotonic()
+        limits.limiter.acquire()
+        with limits.slots:
+            limits.record_wait(time.monotonic() - queued)
+            try:
+                stream = client_for(remaining_time(start, timeout)).chat.completions.create(
+                    stream=True,
+                    **_request_kwargs(model_id, messages, temperature, max_tokens)
+                )
+            except Exception as e:
+                error = e
+            else:
+                parts = []
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        parts.append(content)
+                        yield content
+
+                memo.put(key, model_id, "".join(parts))
+                return False
+
+        delay = give_up(limits, error, attempt, start, timeout)
+        if delay is None:
+            raise error
+        time.sleep(delay)
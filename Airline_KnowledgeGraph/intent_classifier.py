@@ -1,17 +1,13 @@
-import os
 import re
-from huggingface_hub import InferenceClient
+import asyncio
+from local_intent import classify_intent_local, get_local_classifier
+from inference import chat_completion, chat_completion_async
 
 # ------------------------------------------------------------------
 # Environment & Model Setup
 # ------------------------------------------------------------------
 
-HF_TOKEN = os.environ.get("HF_TOKEN")
-if HF_TOKEN is None:
-    raise ValueError("❌ HF_TOKEN not set.")
-
 MODEL_NAME = "deepseek-ai/DeepSeek-V3.2"
-client = InferenceClient(api_key=HF_TOKEN)
 
 # ------------------------------------------------------------------
 # System Prompt for Intent Classification
@@ -115,11 +111,18 @@ Return ONLY the intent label. Do NOT explain.
 # Intent Classification Function
 # ------------------------------------------------------------------
 
-def classify_intent_llm(text: str) -> str:
+def intent_messages(text: str):
+    return [
+        {"role": "system", "content": INTENT_SYSTEM_PROMPT},
+        {"role": "user", "content": text}
+    ]
+
+
+def classify_intent_rules(text: str):
     """
-    Classifies user query into exactly one intent label using:
-    1. Rule-based shortcuts (for accuracy and control)
-    2. LLM classification (fallback for all other cases)
+    Rule-based shortcuts only. Returns an intent label, or None when no
+    rule fires. Deterministic, so the router can act on it before the
+    LLM answers.
     """
     txt = text.lower()
 
@@ -145,25 +148,59 @@ def classify_intent_llm(text: str) -> str:
     
     if "worst delay" in txt or "class has the worst" in txt:
       return "class_delay"
-    
 
+    return None
+
+
+def classify_intent_offline(text: str) -> str:
+    """
+    Best guess without any network call: rules, then the local
+    classifier's top label regardless of confidence. Used when the
+    deadline leaves no time for the LLM or the LLM call fails.
+    """
+    rule_intent = classify_intent_rules(text)
+    if rule_intent is not None:
+        return rule_intent
 
+    label, _ = get_local_classifier().predict(text)
+    return label
 
 
-    # 3) FALLBACK LLM CLASSIFICATION
-    response = client.chat_completions.create(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": INTENT_SYSTEM_PROMPT},
-            {"role": "user", "content": text}
-        ]
-    ) if hasattr(client, "chat_completions") else client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": INTENT_SYSTEM_PROMPT},
-            {"role": "user", "content": text}
-        ]
-    )
-    
+def classify_intent_llm(text: str, timeout=None) -> str:
+    """
+    Classifies user query into exactly one intent label using:
+    1. Rule-based shortcuts (for accuracy and control)
+    2. Local TF-IDF classifier (when confident enough)
+    3. LLM classification (fallback for all other cases)
+    timeout (seconds) bounds the LLM call.
+    """
+    rule_intent = classify_intent_rules(text)
+    if rule_intent is not None:
+        return rule_intent
+
+    # 3) LOCAL CLASSIFIER (offline, ~ms)
+    local_intent = classify_intent_local(text)
+    if local_intent is not None:
+        return local_intent
+
+    # 4) FALLBACK LLM CLASSIFICATION
+    content, _ = chat_completion(MODEL_NAME, intent_messages(text), timeout=timeout)
+    return content.strip()
+
+
+async def classify_intent_llm_async(text: str, timeout=None) -> str:
+    """
+    Same cascade as classify_intent_llm, awaiting the LLM fallback
+    through the async inference client. The local classifier (trained on
+    first use) runs off the event loop.
+    """
+    rule_intent = classify_intent_rules(text)
+    if rule_intent is not None:
+        return rule_intent
+
+    local_intent = await asyncio.to_thread(classify_intent_local, text)
+    if local_intent is not None:
+        return local_intent
 
-    return response.choices[0].message["content"].strip()
+    content, _ = await chat_completion_async(MODEL_NAME, intent_messages(text), timeout=timeout)
+    return content.strip()
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from logs import get_logger
+
+log = get_logger("llm_memo")
+
+# ------------------------------------------------------------------
+# Persistent LLM memo
+# ------------------------------------------------------------------
+# SQLite table of completions keyed by a hash of
+# (model id, messages, temperature, max_tokens). Byte-identical prompts
+# (repeated evaluations, demos, dashboard refreshes) are answered from
+# disk instead of the inference provider.
+#
+# Modes (LLM_MEMO_MODE, default bypass):
+#   bypass    - never read or write
+#   read-only - answer from the memo, never record
+#   record    - answer from the memo and record new completions
+#
+# Entries older than LLM_MEMO_TTL_SECONDS are misses and get purged.
+
+MODES = {"bypass", "read-only", "record"}
+
+# Under the user cache dir, not the source tree
+CACHE_DIR = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+DEFAULT_PATH = os.path.join(CACHE_DIR, "airline_kg", "llm_memo.sqlite3")
+
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+def memo_key(model_id, messages, temperature=None, max_tokens=None):
+    payload = json.dumps(
+        {
+            "model": model_id,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMMemo:
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=10000, mode="bypass", ttl=DEFAULT_TTL):
+        """
+        ttl: seconds an entry stays valid after it was recorded (None = forever).
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM memo mode: {mode}")
+
+        self.path = path
+        self.max_entries = max_entries
+        self.mode = mode
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS memo (
+                    key TEXT PRIMARY KEY,
+                    model_id TEXT,
+                    response TEXT,
+                    created_at REAL,
+                    last_access REAL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS memo_last_access ON memo (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    # ------------------------------------------------
+    #              LOOKUP / STORE
+    # ------------------------------------------------
+    def get(self, key):
+        if self.mode == "bypass":
+            return None
+
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute("SELECT response, created_at FROM memo WHERE key = ?", (key,)).fetchone()
+
+                if row is None or self.expired(row[1]):
+                    self.misses += 1
+                    return None
+
+                self.hits += 1
+                if self.mode == "record":
+                    conn.execute("UPDATE memo SET last_access = ? WHERE key = ?", (time.time(), key))
+                    conn.commit()
+                return row[0]
+        except sqlite3.Error as e:
+            log.error("read_error", error=str(e))
+            return None
+
+    def put(self, key, model_id, response):
+        if self.mode != "record":
+            return
+
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO memo (key, model_id, response, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, model_id, response, now, now)
+                )
+
+                if self.ttl is not None:
+                    conn.execute("DELETE FROM memo WHERE created_at < ?", (now - self.ttl,))
+
+                # LRU eviction down to the size cap
+                (count,) = conn.execute("SELECT COUNT(*) FROM memo").fetchone()
+                if count > self.max_entries:
+                    conn.execute(
+                        "DELETE FROM memo WHERE key IN "
+                        "(SELECT key FROM memo ORDER BY last_access ASC LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+                conn.commit()
+        except sqlite3.Error as e:
+            log.error("write_error", error=str(e))
+
+    def expired(self, created_at):
+        return self.ttl is not None and created_at < time.time() - self.ttl
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+memo = LLMMemo(
+    path=os.environ.get("LLM_MEMO_PATH", DEFAULT_PATH),
+    max_entries=int(os.environ.get("LLM_MEMO_MAX_ENTRIES", "10000")),
+    mode=os.environ.get("LLM_MEMO_MODE", "bypass"),
+    ttl=float(os.environ.get("LLM_MEMO_TTL_SECONDS", DEFAULT_TTL)) or None
+)
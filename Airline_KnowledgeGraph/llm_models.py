@@ -1,11 +1,12 @@
 import time
-from huggingface_hub import InferenceClient
 import os
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from inference import chat_completion, chat_completion_async, chat_completion_stream
+from logs import get_logger
 
-HF_TOKEN = os.environ.get("HF_TOKEN")
-
-if HF_TOKEN is None:
-    raise ValueError("❌ HF_TOKEN is not set as environment variable.")
+log = get_logger("llm_models")
 
 
 AVAILABLE_MODELS = {
@@ -15,31 +16,243 @@ AVAILABLE_MODELS = {
 }
 
 
+# ------------------------------------------------------------------
+# Hedged requests
+# ------------------------------------------------------------------
+# With hedge=True, a duplicate request is fired when the first one has
+# been running longer than the HEDGE_PERCENTILE of that model's recent
+# latencies; whichever answers first wins.
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "20"))
+
+recent_latencies = {name: deque(maxlen=200) for name in AVAILABLE_MODELS}
+hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedged-llm")
+
+
+def record_latency(model_name, seconds):
+    recent_latencies[model_name].append(seconds)
+
+
+def hedge_delay(model_name):
+    """
+    Seconds to wait before hedging, or None while there are too few samples.
+    """
+    samples = sorted(recent_latencies[model_name])
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return samples[min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE))]
+
+
+def hedged_chat_completion(model_name, model_id, messages, max_tokens, timeout):
+    delay = hedge_delay(model_name)
+    kwargs = {"temperature": 0.2, "max_tokens": max_tokens, "timeout": timeout}
+
+    if delay is None:
+        return chat_completion(model_id, messages, **kwargs)
+
+    start = time.time()
+    pending = {hedge_pool.submit(chat_completion, model_id, messages, **kwargs)}
+    done, pending = wait(pending, timeout=delay)
+
+    if not done:
+        log.info("hedge", model=model_name, delay=round(delay, 3))
+        pending.add(hedge_pool.submit(chat_completion, model_id, messages, **kwargs))
+
+    error = None
+    while True:
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            error = future.exception()
+
+        if not pending:
+            raise error
+
+        remaining = None if timeout is None else max(0.0, timeout - (time.time() - start))
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            raise TimeoutError(f"{model_name} did not answer within {timeout}s")
+
+
+async def hedged_chat_completion_async(model_name, model_id, messages, max_tokens, timeout):
+    delay = hedge_delay(model_name)
+    kwargs = {"temperature": 0.2, "max_tokens": max_tokens, "timeout": timeout}
+
+    if delay is None:
+        return await chat_completion_async(model_id, messages, **kwargs)
 
-def run_llm(model_name, prompt, max_tokens=500):
+    start = time.time()
+    pending = {asyncio.create_task(chat_completion_async(model_id, messages, **kwargs))}
+    done, pending = await asyncio.wait(pending, timeout=delay)
+
+    if not done:
+        log.info("hedge", model=model_name, delay=round(delay, 3))
+        pending.add(asyncio.create_task(chat_completion_async(model_id, messages, **kwargs)))
+
+    error = None
+    try:
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+
+            if not pending:
+                raise error
+
+            remaining = None if timeout is None else max(0.0, timeout - (time.time() - start))
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"{model_name} did not answer within {timeout}s")
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def run_llm(model_name, prompt, max_tokens=500, timeout=None, hedge=False):
+    """
+    timeout bounds the request (seconds); hedge enables a duplicate request
+    after the model's latency percentile threshold.
+    """
     if model_name not in AVAILABLE_MODELS:
         raise ValueError(f"Unknown model: {model_name}")
 
     model_id = AVAILABLE_MODELS[model_name]
-    client = InferenceClient(api_key=HF_TOKEN)
 
     start = time.time()
 
-    response = client.chat.completions.create(
-        model=model_id,
-        messages=[{"role": "user", "content": prompt}],
+    messages = [{"role": "user", "content": prompt}]
+
+    if hedge:
+        answer, memo_hit = hedged_chat_completion(model_name, model_id, messages, max_tokens, timeout)
+    else:
+        answer, memo_hit = chat_completion(
+            model_id,
+            messages,
+            temperature=0.2,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
+
+    end = time.time()
+
+    if not memo_hit:
+        record_latency(model_name, end - start)
+
+    return {
+        "model": model_name,
+        "model_id": model_id,
+        "latency_seconds": round(end - start, 3),
+        "answer_length": len(answer),
+        "answer": answer,
+        "memo_hit": memo_hit
+    }
+
+
+def run_llm_stream(model_name, prompt, max_tokens=500, timeout=None):
+    """
+    Streaming variant of run_llm: yields answer tokens as they arrive and
+    returns (StopIteration.value) run_llm's result plus ttft_seconds and
+    tokens_per_second. Use stream_llm to consume it with a callback.
+    """
+    if model_name not in AVAILABLE_MODELS:
+        raise ValueError(f"Unknown model: {model_name}")
+
+    model_id = AVAILABLE_MODELS[model_name]
+
+    start = time.time()
+    first_token_at = None
+    tokens = []
+
+    messages = [{"role": "user", "content": prompt}]
+
+    stream = chat_completion_stream(
+        model_id,
+        messages,
+        temperature=0.2,
         max_tokens=max_tokens,
-        temperature=0.2
+        timeout=timeout
     )
+    while True:
+        try:
+            token = next(stream)
+        except StopIteration as stop:
+            memo_hit = stop.value
+            break
+        if first_token_at is None:
+            first_token_at = time.time()
+        tokens.append(token)
+        yield token
+
+    end = time.time()
+
+    if not memo_hit:
+        record_latency(model_name, end - start)
+
+    answer = "".join(tokens)
+    generation_time = end - first_token_at if first_token_at else 0.0
+
+    return {
+        "model": model_name,
+        "model_id": model_id,
+        "latency_seconds": round(end - start, 3),
+        "ttft_seconds": round(first_token_at - start, 3) if first_token_at else None,
+        "tokens_per_second": round(len(tokens) / generation_time, 1) if generation_time > 0 else None,
+        "answer_length": len(answer),
+        "answer": answer,
+        "memo_hit": memo_hit
+    }
+
+
+def stream_llm(model_name, prompt, on_token, max_tokens=500, timeout=None):
+    """
+    Runs run_llm_stream, calling on_token(token) for each token; returns
+    the final result dict.
+    """
+    stream = run_llm_stream(model_name, prompt, max_tokens=max_tokens, timeout=timeout)
+    while True:
+        try:
+            on_token(next(stream))
+        except StopIteration as stop:
+            return stop.value
+
+
+async def run_llm_async(model_name, prompt, max_tokens=500, timeout=None, hedge=False):
+    """
+    Async variant of run_llm (same return shape).
+    """
+    if model_name not in AVAILABLE_MODELS:
+        raise ValueError(f"Unknown model: {model_name}")
+
+    model_id = AVAILABLE_MODELS[model_name]
+
+    start = time.time()
+
+    messages = [{"role": "user", "content": prompt}]
+
+    if hedge:
+        answer, memo_hit = await hedged_chat_completion_async(model_name, model_id, messages, max_tokens, timeout)
+    else:
+        answer, memo_hit = await chat_completion_async(
+            model_id,
+            messages,
+            temperature=0.2,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
 
     end = time.time()
 
-    answer = response.choices[0].message["content"]
+    if not memo_hit:
+        record_latency(model_name, end - start)
 
     return {
         "model": model_name,
         "model_id": model_id,
         "latency_seconds": round(end - start, 3),
         "answer_length": len(answer),
-        "answer": answer
+        "answer": answer,
+        "memo_hit": memo_hit
     }
@@ -0,0 +1,296 @@
+import os
+import re
+import csv
+import math
+import time
+import random
+from collections import Counter, defaultdict
+from logs import get_logger
+
+log = get_logger("local_intent")
+
+# ------------------------------------------------------------------
+# Local (offline) intent classifier
+# ------------------------------------------------------------------
+# TF-IDF vectors + nearest centroid, trained from intent_examples.csv.
+# Pure Python so it answers in well under a millisecond and needs no
+# network access. classify_intent_llm only calls the remote model when
+# the confidence returned here is below INTENT_CONFIDENCE_THRESHOLD.
+
+EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_examples.csv")
+
+# Every label listed in intent_classifier.INTENT_SYSTEM_PROMPT
+INTENT_LABELS = [
+    "flight_search",
+    "delay_info",
+    "airport_delay",
+    "generation_analysis",
+    "route_satisfaction",
+    "class_delay",
+    "class_satisfaction",
+    "fleet_performance",
+    "high_risk_passengers",
+    "frequent_flyers",
+    "loyalty_miles",
+    "journey_stats",
+    "satisfaction_query",
+    "general_chat",
+]
+
+# Set from `python local_intent.py --calibrate`: the lowest threshold at
+# which cross-validated accepted predictions reach TARGET_ACCURACY. Below
+# it the question goes to the LLM. 0.85 gives 98.5-99.5% across CV
+# shuffles of intent_examples.csv (0.83 was the lowest passing one).
+CONFIDENCE_THRESHOLD = float(os.environ.get("INTENT_CONFIDENCE_THRESHOLD", "0.85"))
+TARGET_ACCURACY = 0.97
+
+# Softmax temperature applied to centroid cosine similarities
+TEMPERATURE = 0.05
+
+
+# Dropped from unigrams only (bigrams keep them for phrasing)
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "do", "does", "did",
+    "which", "what", "who", "how", "me", "show", "of", "by", "for", "to",
+    "from", "in", "on", "with", "and", "or", "there", "any", "our", "have",
+    "has", "had", "give", "list", "please", "most", "per", "between",
+}
+
+
+# ------------------------------------------------------------------
+# Text features
+# ------------------------------------------------------------------
+def _stem(word):
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """
+    Lowercased word stems plus adjacent-word bigrams.
+    Airport codes / record locators are folded into placeholders so the
+    classifier learns "from CODE to CODE" instead of specific codes.
+    """
+    text = re.sub(r"\b[A-Z]{3}\b", " airportcode ", text)
+    text = re.sub(r"\b[A-Z0-9]{5,8}\b", " recordlocator ", text)
+    words = [_stem(w) for w in re.findall(r"[a-z0-9_]+", text.lower())]
+    unigrams = [w for w in words if w not in STOPWORDS]
+    return unigrams + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def load_examples(path=EXAMPLES_PATH):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["question"], row["intent"]) for row in csv.DictReader(f)]
+
+
+# ------------------------------------------------------------------
+# Classifier
+# ------------------------------------------------------------------
+class LocalIntentClassifier:
+
+    def __init__(self, labels=None):
+        self.labels = labels or INTENT_LABELS
+        self.idf = {}
+        self.centroids = {}
+
+    def _vector(self, tokens):
+        counts = Counter(t for t in tokens if t in self.idf)
+        vec = {t: (1 + math.log(c)) * self.idf[t] for t, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        if norm == 0:
+            return {}
+        return {t: v / norm for t, v in vec.items()}
+
+    def fit(self, examples):
+        examples = [(text, label) for text, label in examples if label in self.labels]
+        tokenized = [(tokenize(text), label) for text, label in examples]
+
+        doc_freq = Counter()
+        for tokens, _ in tokenized:
+            doc_freq.update(set(tokens))
+
+        n_docs = len(tokenized)
+        self.idf = {t: math.log((1 + n_docs) / (1 + df)) + 1 for t, df in doc_freq.items()}
+
+        sums = defaultdict(lambda: defaultdict(float))
+        for tokens, label in tokenized:
+            for t, v in self._vector(tokens).items():
+                sums[label][t] += v
+
+        self.centroids = {}
+        for label, vec in sums.items():
+            norm = math.sqrt(sum(v * v for v in vec.values()))
+            self.centroids[label] = {t: v / norm for t, v in vec.items()}
+
+        return self
+
+    def scores(self, text):
+        vec = self._vector(tokenize(text))
+        return {
+            label: sum(v * centroid.get(t, 0.0) for t, v in vec.items())
+            for label, centroid in self.centroids.items()
+        }
+
+    def rank(self, text):
+        """
+        All labels as [(label, probability)], most likely first.
+        Probabilities are a softmax over centroid similarities; the list is
+        empty when no known token is present.
+        """
+        scores = self.scores(text)
+        if not scores or max(scores.values()) <= 0:
+            return []
+
+        best = max(scores.values())
+        exps = {label: math.exp((s - best) / TEMPERATURE) for label, s in scores.items()}
+        total = sum(exps.values())
+        return sorted(
+            ((label, round(e / total, 3)) for label, e in exps.items()),
+            key=lambda x: x[1],
+            reverse=True
+        )
+
+    def predict(self, text):
+        """
+        Returns (label, confidence). Confidence is the softmax probability
+        of the best centroid; it is 0.0 when no known token is present.
+        """
+        ranked = self.rank(text)
+        if not ranked:
+            return "general_chat", 0.0
+        return ranked[0]
+
+
+# ------------------------------------------------------------------
+# Shared instance (trained lazily on first use)
+# ------------------------------------------------------------------
+_classifier = None
+
+
+def get_local_classifier():
+    global _classifier
+    if _classifier is None:
+        _classifier = LocalIntentClassifier().fit(load_examples())
+    return _classifier
+
+
+def classify_intent_local(text, threshold=None):
+    """
+    Returns the local label if its confidence reaches the threshold,
+    otherwise None (caller should fall back to the LLM). Fails closed: a
+    classifier that cannot be trained also returns None.
+    """
+    threshold = CONFIDENCE_THRESHOLD if threshold is None else threshold
+    try:
+        label, confidence = get_local_classifier().predict(text)
+    except Exception as e:
+        log.error("classifier_error", error=str(e))
+        return None
+    if confidence >= threshold:
+        return label
+    return None
+
+
+# ------------------------------------------------------------------
+# Training / evaluation command
+# ------------------------------------------------------------------
+def cross_validate(examples, folds=5, seed=42):
+    """
+    k-fold predictions: [(label, predicted, confidence)] for every example,
+    and the total prediction time.
+    """
+    examples = list(examples)
+    random.Random(seed).shuffle(examples)
+
+    predictions = []
+    elapsed = 0.0
+
+    for k in range(folds):
+        test = examples[k::folds]
+        train = [ex for i, ex in enumerate(examples) if i % folds != k]
+        model = LocalIntentClassifier().fit(train)
+
+        for text, label in test:
+            start = time.perf_counter()
+            predicted, confidence = model.predict(text)
+            elapsed += time.perf_counter() - start
+            predictions.append((label, predicted, confidence))
+
+    return predictions, elapsed
+
+
+def accepted_accuracy(predictions, threshold):
+    """
+    (accuracy of the predictions accepted at threshold, fraction accepted).
+    """
+    accepted = [label == predicted for label, predicted, confidence in predictions if confidence >= threshold]
+    if not accepted:
+        return 0.0, 0.0
+    return sum(accepted) / len(accepted), len(accepted) / len(predictions)
+
+
+def calibrate_threshold(examples, target=TARGET_ACCURACY, folds=5):
+    """
+    Lowest threshold (0.50 - 0.99) whose accepted predictions reach
+    `target` accuracy in cross-validation, or None when none does (then
+    every question should go to the LLM).
+    """
+    predictions, _ = cross_validate(examples, folds=folds)
+    for step in range(50, 100):
+        threshold = step / 100
+        accuracy, accepted = accepted_accuracy(predictions, threshold)
+        if accepted and accuracy >= target:
+            return threshold
+    return None
+
+
+def evaluate(examples, threshold=CONFIDENCE_THRESHOLD, folds=5, seed=42):
+    """
+    k-fold cross-validation. Returns accuracy of the local model on all
+    questions, accuracy on the questions it would answer itself, and the
+    fraction of LLM calls avoided at the given threshold.
+    """
+    predictions, elapsed = cross_validate(examples, folds=folds, seed=seed)
+    accuracy, accepted = accepted_accuracy(predictions, threshold)
+
+    n = len(predictions)
+    return {
+        "examples": n,
+        "threshold": threshold,
+        "accuracy": round(sum(label == predicted for label, predicted, _ in predictions) / n, 3),
+        "accepted_accuracy": round(accuracy, 3),
+        "llm_calls_avoided": round(accepted, 3),
+        "avg_latency_ms": round(elapsed / n * 1000, 3),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train and evaluate the local intent classifier")
+    parser.add_argument("--examples", default=EXAMPLES_PATH)
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--calibrate", action="store_true",
+                        help=f"find the threshold for {TARGET_ACCURACY:.0%} accuracy on accepted predictions")
+    args = parser.parse_args()
+
+    data = load_examples(args.examples)
+    if args.calibrate:
+        threshold = calibrate_threshold(data, folds=args.folds)
+        if threshold is None:
+            print(f"No threshold reaches {TARGET_ACCURACY:.0%}; keep every question on the LLM")
+            raise SystemExit(1)
+        print(f"Calibrated threshold:  {threshold}")
+        args.threshold = threshold
+
+    report = evaluate(data, threshold=args.threshold, folds=args.folds)
+
+    print(f"Examples:              {report['examples']}")
+    print(f"Threshold:             {report['threshold']}")
+    print(f"Accuracy (all):        {report['accuracy']:.1%}")
+    print(f"Accuracy (accepted):   {report['accepted_accuracy']:.1%}")
+    print(f"LLM calls avoided:     {report['llm_calls_avoided']:.1%}")
+    print(f"Avg latency:           {report['avg_latency_ms']} ms")
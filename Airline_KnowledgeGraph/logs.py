@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+# ------------------------------------------------------------------
+# Structured logging
+# ------------------------------------------------------------------
+# log = get_logger("router")
+# log.info("answer", intent=intent, rows=len(rows), timings=timings)
+# log.debug("rows", merged=merged_list)        # full payloads: debug only
+#
+# - events below LOG_LEVEL are dropped before any field is touched;
+#   field values may be callables, evaluated only when the event is written
+# - LOG_SAMPLE="router.rows=0.1,retrieval.query=0.5" keeps that fraction
+#   of the named events (logger.event)
+# - records go through a queue to a background thread that formats them
+#   (JSON by default, LOG_FORMAT=text for humans) and writes to stderr,
+#   so serialization and I/O stay off the request path
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+
+SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, rate in (
+        item.split("=") for item in os.environ.get("LOG_SAMPLE", "").split(",") if "=" in item
+    )
+}
+
+ROOT_LOGGER = "airline_kg"
+
+
+def resolve(value):
+    return value() if callable(value) else value
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name[len(ROOT_LOGGER) + 1:],
+            "event": record.getMessage(),
+        }
+        payload.update({key: resolve(value) for key, value in getattr(record, "fields", {}).items()})
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+
+    def format(self, record):
+        fields = " ".join(
+            f"{key}={resolve(value)}" for key, value in getattr(record, "fields", {}).items()
+        )
+        line = (
+            f"{time.strftime('%H:%M:%S', time.localtime(record.created))} "
+            f"{record.levelname:<7} {record.name[len(ROOT_LOGGER) + 1:]}.{record.getMessage()} {fields}"
+        )
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class SamplingFilter(logging.Filter):
+
+    def filter(self, record):
+        rate = SAMPLE_RATES.get(f"{record.name[len(ROOT_LOGGER) + 1:]}.{record.msg}")
+        return rate is None or random.random() < rate
+
+
+class LazyQueueHandler(QueueHandler):
+
+    def prepare(self, record):
+        # QueueHandler.prepare formats the message in the calling thread;
+        # leave that to the listener.
+        return record
+
+
+class EventLogger:
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def _log(self, level, event, fields, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, exc_info=False, **fields):
+        self._log(logging.ERROR, event, fields, exc_info)
+
+    def enabled(self, level="debug"):
+        return self._logger.isEnabledFor(getattr(logging, level.upper()))
+
+
+_listener = None
+
+
+def setup():
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+    records = queue.SimpleQueue()
+    handler = LazyQueueHandler(records)
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(handler)
+    root.propagate = False
+
+    _listener = QueueListener(records, stream)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    setup()
+    return EventLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"))
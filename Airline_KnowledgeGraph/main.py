@@ -1,9 +1,12 @@
 from router import answer_question
+from conversation import Conversation
 
 
 print("🛫 Airline KG Assistant — Baseline Mode")
 print("Type 'exit' to quit.\n")
 
+conversation = Conversation()
+
 while True:
     user_input = input("> ")
     
@@ -11,9 +14,18 @@ while True:
         break
 
     try:
+        print("Answer: ", end="", flush=True)
         answer = answer_question(
-            user_input
+            user_input,
+            on_token=lambda token: print(token, end="", flush=True),
+            conversation=conversation
+        )
+        print()
+        print(
+            f"[{answer.get('model')}] latency {answer.get('latency_seconds')}s"
+            f" | first token {answer.get('ttft_seconds')}s"
+            f" | {answer.get('tokens_per_second')} tokens/s"
+            f" | KG accuracy {answer.get('accuracy')}%"
         )
-        print("Answer:", answer)
     except Exception as e:
         print("Error:", e)
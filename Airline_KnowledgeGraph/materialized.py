@@ -0,0 +1,321 @@
+import time
+from graph_version import GRAPH_META_KEY, VERSION_MAX_AGE, bump_graph_version
+from logs import get_logger
+
+log = get_logger("materialized")
+
+# ------------------------------------------------------------------
+# Materialized aggregates
+# ------------------------------------------------------------------
+# The aggregate intents (airport_delay, fleet_performance, ...) GROUP BY
+# over every Journey. Instead, ingestion keeps one node per group:
+#
+#   (:Aggregate {kind, group})  kind in airport / route / class / fleet /
+#                               generation / flight
+#   (:Passenger)                the same counters per passenger
+#
+# with journey_count, delay_sum/n/min/max, food_sum/n/min/max, miles_sum,
+# avg_delay and avg_food. queries.MATERIALIZED_QUERIES read these nodes
+# and the Retriever uses them once GraphMeta.aggregates says they cover
+# the graph (AGGREGATES_VERSION; older layouts fall back to the full scan
+# until rebuilt).
+#
+# Each ingestion batch recomputes, in its own transaction, every group
+# its journeys belonged to before and after the write, from the same
+# patterns as the full-scan QUERIES. So a flight that gains a route edge
+# moves all of its journeys into the new airport / route groups, and a
+# re-ingested journey (or a passenger whose generation changed) leaves
+# its old groups. A null class / generation is a group of its own, with
+# no group property, as in GROUP BY.
+
+AGGREGATES_VERSION = 2
+
+SCHEMA = [
+    "CREATE INDEX journey_feedback_id IF NOT EXISTS FOR (j:Journey) ON (j.feedback_ID)",
+    "CREATE INDEX aggregate_group IF NOT EXISTS FOR (a:Aggregate) ON (a.kind, a.group)",
+    "CREATE INDEX passenger_journey_count IF NOT EXISTS FOR (p:Passenger) ON (p.journey_count)",
+    "CREATE INDEX passenger_avg_delay IF NOT EXISTS FOR (p:Passenger) ON (p.avg_delay)",
+]
+
+# Counters over the journeys j of one group
+STATS = """{
+    journey_count: count(j),
+    delay_sum: sum(j.arrival_delay_minutes),
+    delay_n: count(j.arrival_delay_minutes),
+    delay_min: min(j.arrival_delay_minutes),
+    delay_max: max(j.arrival_delay_minutes),
+    avg_delay: avg(j.arrival_delay_minutes),
+    food_sum: sum(j.food_satisfaction_score),
+    food_n: count(j.food_satisfaction_score),
+    food_min: min(j.food_satisfaction_score),
+    food_max: max(j.food_satisfaction_score),
+    avg_food: avg(j.food_satisfaction_score),
+    miles_sum: sum(j.actual_flown_miles)
+}"""
+
+# kind -> pattern and group expression of its full-scan query; `anchor`
+# is an indexed expression that narrows the match to the wanted groups,
+# `columns` extra properties stored on the node
+GROUP_KINDS = {
+    "class": {
+        "match": "(:Passenger)-[:TOOK]->(j:Journey)",
+        "group": "j.passenger_class",
+    },
+    "generation": {
+        "match": "(p:Passenger)-[:TOOK]->(j:Journey)",
+        "group": "p.generation",
+    },
+    "fleet": {
+        "match": "(j:Journey)-[:ON]->(f:Flight)",
+        "group": "f.fleet_type_description",
+    },
+    "flight": {
+        "match": "(j:Journey)-[:ON]->(f:Flight)",
+        "group": "f.flight_number",
+    },
+    "airport": {
+        "match": "(j:Journey)-[:ON]->(:Flight)-[:DEPARTS_FROM]->(o:Airport)",
+        "group": "o.station_code",
+    },
+    "route": {
+        "match": "(j:Journey)-[:ON]->(f:Flight)-[:DEPARTS_FROM]->(o:Airport), (f)-[:ARRIVES_AT]->(d:Airport)",
+        "group": "toString(o.station_code) + '->' + toString(d.station_code)",
+        "anchor": "o.station_code",
+        "columns": {"origin": "o.station_code", "destination": "d.station_code"},
+    },
+}
+
+PASSENGER_GROUPS = """
+UNWIND $ids AS id
+MATCH (p:Passenger)-[:TOOK]->(j:Journey {feedback_ID: id})
+RETURN DISTINCT p.record_locator AS g, p.record_locator AS anchor
+"""
+
+PASSENGER_UPDATE = """
+UNWIND $groups AS locator
+MATCH (a:Passenger {record_locator: locator})-[:TOOK]->(j:Journey)
+WITH a, """ + STATS + """ AS stats
+SET a += stats
+"""
+
+GENERATIONS_OF = """
+UNWIND $locators AS locator
+MATCH (p:Passenger {record_locator: locator})
+RETURN DISTINCT p.generation AS g, p.generation AS anchor
+"""
+
+PASSENGER_FIELDS = [
+    "journey_count", "delay_sum", "delay_n", "delay_min", "delay_max",
+    "food_sum", "food_n", "food_min", "food_max", "miles_sum", "avg_delay", "avg_food",
+]
+
+
+def groups_statement(kind):
+    """
+    Returns the (group, anchor) pairs of kind `kind` the journeys $ids
+    belong to.
+    """
+    spec = GROUP_KINDS[kind]
+    return (
+        f"UNWIND $ids AS id\n"
+        f"MATCH {spec['match']}\n"
+        f"WHERE j.feedback_ID = id\n"
+        f"RETURN DISTINCT {spec['group']} AS g, {spec.get('anchor', spec['group'])} AS anchor"
+    )
+
+
+def recompute_statement(kind, scope):
+    """
+    Deletes and recreates the Aggregate nodes of kind `kind` for the groups
+    in scope: "groups" ($groups, narrowed by $anchors), "null" (the null
+    group) or "all".
+    """
+    spec = GROUP_KINDS[kind]
+    group, anchor = spec["group"], spec.get("anchor", spec["group"])
+    columns = spec.get("columns", {})
+
+    where = {
+        "groups": f"{anchor} IN $anchors AND {group} IN $groups",
+        "null": f"{group} IS NULL",
+        "all": "true",
+    }[scope]
+    delete = {
+        "groups": "WHERE a.group IN $groups",
+        "null": "WHERE a.group IS NULL",
+        "all": "",
+    }[scope]
+    keys = "".join(f", {expression} AS {name}" for name, expression in columns.items())
+    properties = "".join(f", {name}: {name}" for name in columns)
+
+    return (
+        f"CALL {{\n"
+        f"    MATCH (a:Aggregate {{kind: '{kind}'}}) {delete}\n"
+        f"    DETACH DELETE a\n"
+        f"}}\n"
+        f"CALL {{\n"
+        f"    MATCH {spec['match']}\n"
+        f"    WHERE {where}\n"
+        f"    WITH {group} AS g{keys}, " + STATS.replace("\n", "\n    ") + f" AS stats\n"
+        f"    CREATE (a:Aggregate {{kind: '{kind}', group: g{properties}}})\n"
+        f"    SET a += stats\n"
+        f"}}"
+    )
+
+
+# ------------------------------------------------
+#              MAINTENANCE (ingestion)
+# ------------------------------------------------
+def ensure_aggregate_schema(session):
+    for statement in SCHEMA:
+        session.run(statement)
+
+
+def affected_groups(tx, feedback_ids, record_locators=(), groups=None):
+    """
+    Adds to `groups` (kind -> {group: anchor}) every group the journeys,
+    and the generations of the passengers, belong to right now. Call it
+    before and after writing a batch; update_aggregates() does the after.
+    """
+    groups = groups if groups is not None else {}
+    statements = [(kind, groups_statement(kind), {"ids": list(feedback_ids)}) for kind in GROUP_KINDS]
+    statements.append(("passenger", PASSENGER_GROUPS, {"ids": list(feedback_ids)}))
+    if record_locators:
+        statements.append(("generation", GENERATIONS_OF, {"locators": list(record_locators)}))
+
+    for kind, statement, params in statements:
+        for record in tx.run(statement, **params):
+            groups.setdefault(kind, {})[record["g"]] = record["anchor"]
+    return groups
+
+
+def update_aggregates(tx, feedback_ids, stale=None):
+    """
+    Recomputes the aggregates of every group the given (already ingested)
+    journeys belong to, plus the `stale` groups from affected_groups()
+    before the write. Run it in the transaction that wrote them.
+    """
+    stale = {kind: dict(members) for kind, members in (stale or {}).items()}
+    groups = affected_groups(tx, feedback_ids, groups=stale)
+
+    for kind, members in groups.items():
+        if kind == "passenger":
+            tx.run(PASSENGER_UPDATE, groups=list(members))
+            continue
+        named = {group: anchor for group, anchor in members.items() if group is not None}
+        if named:
+            tx.run(
+                recompute_statement(kind, "groups"),
+                groups=list(named), anchors=list(set(named.values()))
+            )
+        if None in members:
+            tx.run(recompute_statement(kind, "null"))
+
+
+def set_aggregates_ready(session, ready=True):
+    session.run(
+        "MERGE (m:GraphMeta {key: $key}) SET m.aggregates = $ready",
+        key=GRAPH_META_KEY, ready=AGGREGATES_VERSION if ready else False
+    )
+    _cache.clear()
+
+
+def aggregates_current(session):
+    """
+    True when the aggregates cover every journey in the graph (current
+    layout, or no journeys yet), i.e. new batches can be added
+    incrementally.
+    """
+    record = session.run(
+        """
+        OPTIONAL MATCH (m:GraphMeta {key: $key})
+        RETURN m.aggregates = $version AS ready, EXISTS { MATCH (:Journey) } AS has_journeys
+        """,
+        key=GRAPH_META_KEY, version=AGGREGATES_VERSION
+    ).single()
+    return bool(record["ready"]) or not record["has_journeys"]
+
+
+def rebuild_aggregates(session, batch_size=1000):
+    """
+    Recomputes all aggregates from the journeys in the graph.
+    """
+    set_aggregates_ready(session, False)
+    # Counted-once marker of the previous layout
+    session.run("MATCH (j:Journey) WHERE j.materialized IS NOT NULL REMOVE j.materialized")
+
+    for kind in GROUP_KINDS:
+        session.execute_write(lambda tx, kind=kind: tx.run(recompute_statement(kind, "all")).consume())
+        print(f"Materialized {kind} aggregates...")
+
+    session.run(
+        "MATCH (p:Passenger) REMOVE " + ", ".join(f"p.{field}" for field in PASSENGER_FIELDS)
+    )
+    locators = [
+        record["locator"]
+        for record in session.run("MATCH (p:Passenger) WHERE (p)-[:TOOK]->() RETURN p.record_locator AS locator")
+    ]
+    for start in range(0, len(locators), batch_size):
+        session.execute_write(
+            lambda tx, batch: tx.run(PASSENGER_UPDATE, groups=batch).consume(),
+            locators[start:start + batch_size]
+        )
+        print(f"Materialized {min(start + batch_size, len(locators))}/{len(locators)} passengers...")
+
+    set_aggregates_ready(session)
+
+
+# ------------------------------------------------
+#              READERS
+# ------------------------------------------------
+_cache = {}
+
+
+def read_aggregates_ready(driver):
+    with driver.session() as session:
+        record = session.run(
+            "MATCH (m:GraphMeta {key: $key}) RETURN m.aggregates = $version AS ready",
+            key=GRAPH_META_KEY, version=AGGREGATES_VERSION
+        ).single()
+
+    return bool(record and record["ready"])
+
+
+def aggregates_ready(driver, max_age=VERSION_MAX_AGE):
+    """
+    Cached check that the materialized aggregates can be queried (at most
+    one query per max_age seconds per driver). False if unreachable.
+    """
+    now = time.monotonic()
+    cached = _cache.get(id(driver))
+    if cached and now - cached[1] < max_age:
+        return cached[0]
+
+    try:
+        ready = read_aggregates_ready(driver)
+    except Exception as e:
+        log.error("read_error", error=str(e))
+        return cached[0] if cached else False
+
+    _cache[id(driver)] = (ready, now)
+    return ready
+
+
+# ------------------------------------------------
+#              CLI
+# ------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+    from graph_db import get_driver
+
+    parser = argparse.ArgumentParser(description="Maintain the materialized aggregate nodes")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all aggregates from the journeys")
+    args = parser.parse_args()
+
+    driver = get_driver()
+    with driver.session() as session:
+        ensure_aggregate_schema(session)
+        if args.rebuild or not aggregates_current(session):
+            rebuild_aggregates(session)
+            bump_graph_version(session)
+        print("Aggregates ready")
+    driver.close()
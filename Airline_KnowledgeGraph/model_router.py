@@ -0,0 +1,135 @@
+import os
+import random
+import threading
+from collections import deque
+
+# ------------------------------------------------------------------
+# Adaptive answer-model routing
+# ------------------------------------------------------------------
+# Tracks rolling latency, error rate and KG-faithfulness per
+# (model, intent) and sends each question to the cheapest (or fastest)
+# model whose recent answers for that intent meet the quality threshold.
+# The remaining models are returned as fallbacks, most capable first.
+#
+# Before a model has MIN_SAMPLES answers for an intent it is assumed good
+# enough for SIMPLE_INTENTS (aggregate summaries) only; other intents
+# stay on the default model, apart from EXPLORE_RATE of requests that
+# try a cheaper model to gather samples.
+
+# Relative cost per answer (roughly parameter count)
+MODEL_COSTS = {
+    "gemma": 1,      # gemma-2-2b-it
+    "llama": 4,      # Llama-3.1-8B-Instruct
+    "deepseek": 20,  # DeepSeek-V3.2
+}
+
+DEFAULT_MODEL = os.environ.get("ANSWER_MODEL", "deepseek")
+QUALITY_THRESHOLD = float(os.environ.get("MODEL_QUALITY_THRESHOLD", "0.8"))
+MAX_ERROR_RATE = float(os.environ.get("MODEL_MAX_ERROR_RATE", "0.2"))
+MIN_SAMPLES = int(os.environ.get("MODEL_MIN_SAMPLES", "5"))
+EXPLORE_RATE = float(os.environ.get("MODEL_EXPLORE_RATE", "0.05"))
+WINDOW = 50
+
+# "cost" (cheapest qualifying model) or "latency" (fastest qualifying model)
+OBJECTIVE = os.environ.get("MODEL_ROUTING_OBJECTIVE", "cost")
+
+SIMPLE_INTENTS = {
+    "airport_delay",
+    "class_delay",
+    "class_satisfaction",
+    "fleet_performance",
+    "frequent_flyers",
+    "journey_stats",
+    "generation_analysis",
+    "route_satisfaction",
+}
+
+
+class ModelRouter:
+
+    def __init__(self, models=MODEL_COSTS, default_model=DEFAULT_MODEL, threshold=QUALITY_THRESHOLD,
+                 objective=OBJECTIVE, rng=None):
+        """
+        rng: random.Random used for exploration (seed it for reproducible picks).
+        """
+        self.models = dict(models)
+        self.default_model = default_model
+        self.threshold = threshold
+        self.objective = objective
+        self.rng = rng or random.Random()
+
+        # (model, intent) -> deque of (latency, ok, faithfulness)
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------
+    #                 FEEDBACK
+    # ------------------------------------------------
+    def record(self, model, intent, latency, ok=True, faithfulness=None):
+        with self._lock:
+            samples = self._samples.setdefault((model, intent), deque(maxlen=WINDOW))
+            samples.append((latency, ok, faithfulness))
+
+    def stats(self, model, intent):
+        with self._lock:
+            samples = list(self._samples.get((model, intent), ()))
+
+        successes = [s for s in samples if s[1]]
+        scores = [s[2] for s in successes if s[2] is not None]
+        return {
+            "samples": len(samples),
+            "error_rate": round(1 - len(successes) / len(samples), 3) if samples else 0.0,
+            "avg_latency": round(sum(s[0] for s in successes) / len(successes), 3) if successes else None,
+            "avg_faithfulness": round(sum(scores) / len(scores), 3) if scores else None,
+        }
+
+    def report(self):
+        with self._lock:
+            keys = list(self._samples)
+        return {f"{model}/{intent}": self.stats(model, intent) for model, intent in keys}
+
+    # ------------------------------------------------
+    #                 SELECTION
+    # ------------------------------------------------
+    def qualifies(self, model, intent, stats):
+        if model == self.default_model:
+            return stats["error_rate"] <= MAX_ERROR_RATE or stats["samples"] < MIN_SAMPLES
+        if stats["samples"] < MIN_SAMPLES:
+            return intent in SIMPLE_INTENTS
+        if stats["error_rate"] > MAX_ERROR_RATE:
+            return False
+        return stats["avg_faithfulness"] is not None and stats["avg_faithfulness"] >= self.threshold
+
+    def sort_key(self, model, stats):
+        if self.objective == "latency" and stats["avg_latency"] is not None:
+            return stats["avg_latency"], self.models[model]
+        return self.models[model], stats["avg_latency"] or 0.0
+
+    def choose(self, intent, override=None):
+        """
+        Returns the models to try in order: the pick first, then fallbacks.
+        override: a model name the user asked for explicitly.
+        """
+        stats = {model: self.stats(model, intent) for model in self.models}
+
+        qualifying = sorted(
+            (m for m in self.models if self.qualifies(m, intent, stats[m])),
+            key=lambda m: self.sort_key(m, stats[m])
+        )
+        if not qualifying:
+            qualifying = [self.default_model]
+
+        first = qualifying[0]
+        if override in self.models:
+            first = override
+        elif intent not in SIMPLE_INTENTS and self.rng.random() < EXPLORE_RATE:
+            unexplored = [m for m in self.models if stats[m]["samples"] < MIN_SAMPLES and m != first]
+            if unexplored:
+                first = self.rng.choice(unexplored)
+
+        # Fallbacks: most capable first
+        fallbacks = sorted((m for m in self.models if m != first), key=lambda m: -self.models[m])
+        return [first] + fallbacks
+
+
+model_router = ModelRouter()
@@ -0,0 +1,148 @@
+import os
+import re
+import copy
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from logs import get_logger
+
+log = get_logger("nlu_cache")
+
+# ------------------------------------------------------------------
+# NLU result cache
+# ------------------------------------------------------------------
+# Bounded LRU cache of (raw_intent, intent, entities) keyed by the
+# question (whitespace folded, case kept: entity extraction is
+# case-sensitive, "LAX" is an airport and "lax" a word) and the graph
+# version the entities were resolved against, so repeated questions skip
+# both classify_intent_llm and extract_entities_llm.
+
+
+def normalize_question(text):
+    """
+    Case, whitespace and punctuation folded:
+    "Which airport has the WORST delays?" -> "which airport has the worst delays"
+    """
+    text = re.sub(r"[^\w\s]", " ", str(text).lower())
+    return " ".join(text.split())
+
+
+def question_key(text):
+    """
+    Whitespace and trailing punctuation folded, case kept:
+    "  Delays at LAX ?" -> "Delays at LAX"
+    """
+    return " ".join(str(text).split()).rstrip("?!. ")
+
+
+class NLUCache:
+
+    def __init__(self, max_entries=1024, ttl=None, path=None):
+        """
+        max_entries: LRU bound
+        ttl:         seconds an entry stays valid (None = forever)
+        path:        optional JSON file the cache is loaded from / saved to
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    # ------------------------------------------------
+    #              LOOKUP / STORE
+    # ------------------------------------------------
+    def get(self, question, graph_version=None):
+        key = (question_key(question), graph_version)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(value)
+
+    def put(self, question, value, graph_version=None):
+        key = (question_key(question), graph_version)
+
+        with self._lock:
+            self._entries[key] = (time.time(), copy.deepcopy(value))
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    # ------------------------------------------------
+    #              PERSISTENCE
+    # ------------------------------------------------
+    def save(self):
+        if not self.path:
+            return
+
+        with self._lock:
+            data = [[key, stored_at, value] for key, (stored_at, value) in self._entries.items()]
+
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.error("save_error", error=str(e))
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.error("load_error", error=str(e))
+            return
+
+        with self._lock:
+            for key, stored_at, value in data[-self.max_entries:]:
+                # [question, graph_version]; older files keyed on the question only
+                if isinstance(key, list):
+                    self._entries[tuple(key)] = (stored_at, value)
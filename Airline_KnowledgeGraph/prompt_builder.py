@@ -1,4 +1,18 @@
+import os
 import json
+from itertools import islice
+
+# Rows placed in [KG_DATA]; row iterables (e.g. Retriever.stream_query)
+# are read only up to this many
+PROMPT_MAX_ROWS = int(os.environ.get("PROMPT_MAX_ROWS", "50"))
+
+
+def take_rows(rows, max_rows=PROMPT_MAX_ROWS):
+    """
+    The first max_rows rows of a list or any row iterable; a generator is
+    not consumed past them.
+    """
+    return list(islice(rows or [], max_rows))
 
 
 def format_context_json(obj):
@@ -27,8 +41,9 @@ def build_structured_prompt(user_query, context):
     user_query = str(user_query)
     q = user_query.lower()
 
-    # If context is a LIST → wrap it
-    if isinstance(context, list):
+    # If context is a LIST (or another row iterable) → wrap it
+    if not isinstance(context, (dict, str)) and hasattr(context, "__iter__"):
+        context = take_rows(context)
         context = {
             "merged": context,
             "embeddings": context
@@ -51,7 +66,7 @@ def build_structured_prompt(user_query, context):
     else:
         data_rows = context.get("merged", [])
 
-    context_json = format_context_json(data_rows)
+    context_json = format_context_json(take_rows(data_rows))
 
     # --------------------------------------------------
     # 2. PERSONA
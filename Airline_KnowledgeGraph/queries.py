@@ -1,3 +1,13 @@
+# Every query takes $limit (rows per page, filled in by the Retriever).
+# Listing queries in KEYSET_COLUMNS are ordered by that column and take
+# $after: the column value of the previous page's last row (null for the
+# first page).
+KEYSET_COLUMNS = {
+    "flight_search": "journey",
+    "class_search": "journey",
+    "loyalty_miles": "passenger",
+}
+
 QUERIES = {
 
     # 1. Flight search (origin -> destination)
@@ -8,6 +18,7 @@ QUERIES = {
     MATCH (f)-[:ARRIVES_AT]->(d:Airport)
     WHERE o.station_code = $origin
       AND d.station_code = $destination
+      AND ($after IS NULL OR j.feedback_ID > $after)
     RETURN
         j.feedback_ID AS journey,
         f.flight_number AS flight,
@@ -21,7 +32,8 @@ QUERIES = {
         p.generation AS generation,
         p.loyalty_program_level AS loyalty_level,
         f.fleet_type_description AS fleet
-    LIMIT 50
+    ORDER BY journey
+    LIMIT $limit
     """,
 
     # 2. Delay info – worst delayed flights
@@ -40,7 +52,7 @@ QUERIES = {
             p.loyalty_program_level AS loyalty_level,
             f.fleet_type_description AS fleet
         ORDER BY delay DESC
-        LIMIT 50
+        LIMIT $limit
     """,
 
     # 3. Best food satisfaction
@@ -59,7 +71,7 @@ QUERIES = {
             p.loyalty_program_level AS loyalty_level,
             f.fleet_type_description AS fleet
         ORDER BY food_score DESC
-        LIMIT 50
+        LIMIT $limit
     """,
 
     # 4. Journey stats – aggregate delay & satisfaction per flight
@@ -70,7 +82,7 @@ QUERIES = {
             AVG(j.arrival_delay_minutes) AS avg_delay,
             AVG(j.food_satisfaction_score) AS avg_food,
             COUNT(j) AS journey_count
-        LIMIT 50
+        LIMIT $limit
     """,
 
     # 5. Generation analysis
@@ -82,7 +94,7 @@ QUERIES = {
             AVG(j.arrival_delay_minutes) AS avg_delay,
             COUNT(j) AS journey_count
         ORDER BY avg_food DESC
-        LIMIT 50
+        LIMIT $limit
     """,
 
     # 6. Class search – journeys filtered by class
@@ -90,6 +102,7 @@ QUERIES = {
         MATCH (p:Passenger)-[:TOOK]->(j:Journey)
         MATCH (j)-[:ON]->(f:Flight)
         WHERE j.passenger_class = $class
+          AND ($after IS NULL OR j.feedback_ID > $after)
         RETURN
             j.feedback_ID AS journey,
             j.passenger_class AS passenger_class,
@@ -101,12 +114,14 @@ QUERIES = {
             p.loyalty_program_level AS loyalty_level,
             f.flight_number AS flight,
             f.fleet_type_description AS fleet
-        LIMIT 50
+        ORDER BY journey
+        LIMIT $limit
     """,
 
     # 7. Loyalty miles
     "loyalty_miles": """
         MATCH (p:Passenger {loyalty_program_level: $level})-[:TOOK]->(j:Journey)
+        WHERE $after IS NULL OR p.record_locator > $after
         MATCH (j)-[:ON]->(f:Flight)
         RETURN
             p.loyalty_program_level AS level,
@@ -116,7 +131,8 @@ QUERIES = {
             COUNT(j) AS journey_count,
             AVG(j.arrival_delay_minutes) AS avg_delay,
             AVG(j.food_satisfaction_score) AS avg_food
-        LIMIT 50
+        ORDER BY passenger
+        LIMIT $limit
     """,
 
     # 8. Airport delay – worst airports
@@ -127,7 +143,7 @@ QUERIES = {
             AVG(j.arrival_delay_minutes) AS avg_delay,
             COUNT(j) AS journey_count
         ORDER BY avg_delay DESC
-        LIMIT 50
+        LIMIT $limit
     """,
 
     # 9. Route satisfaction – best routes
@@ -141,7 +157,7 @@ QUERIES = {
             AVG(j.food_satisfaction_score) AS avg_food,
             COUNT(j) AS journey_count
         ORDER BY avg_food DESC
-        LIMIT 50
+        LIMIT $limit
     """,
 
     # 10. Class delay
@@ -152,7 +168,7 @@ QUERIES = {
             AVG(j.arrival_delay_minutes) AS avg_delay,
             COUNT(j) AS journey_count
         ORDER BY avg_delay DESC
-        LIMIT 50
+        LIMIT $limit
     """,
 
     # 11. Class satisfaction
@@ -163,7 +179,7 @@ QUERIES = {
             AVG(j.food_satisfaction_score) AS avg_food,
             COUNT(j) AS journey_count
         ORDER BY avg_food DESC
-        LIMIT 50
+        LIMIT $limit
     """,
 
     # 12. Fleet performance
@@ -175,7 +191,7 @@ QUERIES = {
             AVG(j.food_satisfaction_score) AS avg_food,
             COUNT(j) AS journey_count
         ORDER BY avg_delay ASC
-        LIMIT 50
+        LIMIT $limit
     """,
 
     # 13. High risk passengers
@@ -193,7 +209,7 @@ QUERIES = {
             journey_count,
             p.generation AS generation,
             p.loyalty_program_level AS loyalty_level
-        LIMIT 50
+        LIMIT $limit
     """,
 
     # 14. Frequent flyers
@@ -206,6 +222,130 @@ QUERIES = {
             COUNT(j) AS journey_count,
             SUM(j.actual_flown_miles) AS total_miles
         ORDER BY journey_count DESC
-        LIMIT 50
+        LIMIT $limit
+    """,
+}
+
+
+# ------------------------------------------------------------------
+# Variants over the materialized aggregates (materialized.py)
+# ------------------------------------------------------------------
+# Same columns as the QUERIES they replace, read from (:Aggregate) nodes
+# and per-passenger counters instead of scanning every Journey.
+MATERIALIZED_QUERIES = {
+
+    "journey_stats": """
+        MATCH (a:Aggregate {kind: 'flight'})
+        RETURN
+            a.group AS flight,
+            a.avg_delay AS avg_delay,
+            a.avg_food AS avg_food,
+            a.journey_count AS journey_count
+        LIMIT $limit
+    """,
+
+    "generation_analysis": """
+        MATCH (a:Aggregate {kind: 'generation'})
+        RETURN
+            a.group AS generation,
+            a.avg_food AS avg_food,
+            a.avg_delay AS avg_delay,
+            a.journey_count AS journey_count
+        ORDER BY avg_food DESC
+        LIMIT $limit
+    """,
+
+    "loyalty_miles": """
+        MATCH (p:Passenger {loyalty_program_level: $level})
+        WHERE p.journey_count IS NOT NULL
+          AND ($after IS NULL OR p.record_locator > $after)
+        RETURN
+            p.loyalty_program_level AS level,
+            p.record_locator AS passenger,
+            p.generation AS generation,
+            p.miles_sum AS total_miles,
+            p.journey_count AS journey_count,
+            p.avg_delay AS avg_delay,
+            p.avg_food AS avg_food
+        ORDER BY passenger
+        LIMIT $limit
+    """,
+
+    "airport_delay": """
+        MATCH (a:Aggregate {kind: 'airport'})
+        RETURN
+            a.group AS airport,
+            a.avg_delay AS avg_delay,
+            a.journey_count AS journey_count
+        ORDER BY avg_delay DESC
+        LIMIT $limit
+    """,
+
+    "route_satisfaction": """
+        MATCH (a:Aggregate {kind: 'route'})
+        RETURN
+            a.origin AS origin,
+            a.destination AS destination,
+            a.avg_food AS avg_food,
+            a.journey_count AS journey_count
+        ORDER BY avg_food DESC
+        LIMIT $limit
+    """,
+
+    "class_delay": """
+        MATCH (a:Aggregate {kind: 'class'})
+        RETURN
+            a.group AS passenger_class,
+            a.avg_delay AS avg_delay,
+            a.journey_count AS journey_count
+        ORDER BY avg_delay DESC
+        LIMIT $limit
+    """,
+
+    "class_satisfaction": """
+        MATCH (a:Aggregate {kind: 'class'})
+        RETURN
+            a.group AS passenger_class,
+            a.avg_food AS avg_food,
+            a.journey_count AS journey_count
+        ORDER BY avg_food DESC
+        LIMIT $limit
+    """,
+
+    "fleet_performance": """
+        MATCH (a:Aggregate {kind: 'fleet'})
+        RETURN
+            a.group AS fleet,
+            a.avg_delay AS avg_delay,
+            a.avg_food AS avg_food,
+            a.journey_count AS journey_count
+        ORDER BY avg_delay ASC
+        LIMIT $limit
+    """,
+
+    "high_risk_passengers": """
+        MATCH (p:Passenger)
+        WHERE p.avg_delay > 30 AND p.avg_food <= 2
+        RETURN
+            p.record_locator AS passenger,
+            p.avg_delay AS avg_delay,
+            p.avg_food AS avg_food,
+            p.journey_count AS journey_count,
+            p.generation AS generation,
+            p.loyalty_program_level AS loyalty_level
+        LIMIT $limit
+    """,
+
+    "frequent_flyers": """
+        MATCH (p:Passenger)
+        WHERE p.journey_count IS NOT NULL
+        RETURN
+            p.record_locator AS passenger,
+            p.loyalty_program_level AS loyalty_level,
+            p.generation AS generation,
+            p.journey_count AS journey_count,
+            p.miles_sum AS total_miles
+        ORDER BY journey_count DESC
+        LIMIT $limit
     """,
 }
@@ -0,0 +1,451 @@
+import os
+import re
+from functools import lru_cache
+from gazetteer import PHRASE_ALIASES
+
+# ------------------------------------------------------------------
+# Composed (filtered) queries
+# ------------------------------------------------------------------
+# QUERIES answers each intent over the whole graph. When the entities
+# narrow a question further ("delays by class on LAX -> IAX for Gen X")
+# the Retriever composes the query instead:
+#
+#   filters  entity_filters(): passenger, flight, origin + destination
+#            (a route) or airport (departures), fleet, level, generation,
+#            class
+#   anchor   the most selective filter present (ANCHOR_ORDER). Every
+#            filter property is indexed (FILTER_INDEXES), so the traversal
+#            starts from an index seek and walks the
+#            Passenger-TOOK-Journey-ON-Flight-DEPARTS_FROM/ARRIVES_AT-Airport
+#            chain only as far as the filters and the intent's columns need
+#   shape    the intent's RETURN / aggregation, with the same columns as
+#            its fixed query (SHAPES)
+#
+# Values are always parameters and the text depends only on the intent
+# and which filters are present, so each combination is planned once and
+# then served from Neo4j's plan cache. Query keys look like
+# "composed:class_delay:generation+origin+destination".
+#
+# QUERY_INDEX_HINTS=1 adds a USING INDEX hint on the anchor (the indexes
+# must exist: create_kg.py creates them).
+
+COMPOSED_PREFIX = "composed:"
+
+INDEX_HINTS = os.environ.get("QUERY_INDEX_HINTS", "0") == "1"
+
+LABELS = {"p": "Passenger", "j": "Journey", "f": "Flight", "o": "Airport", "d": "Airport"}
+
+# (from, type, to) as stored
+RELATIONSHIPS = [
+    ("p", "TOOK", "j"),
+    ("j", "ON", "f"),
+    ("f", "DEPARTS_FROM", "o"),
+    ("f", "ARRIVES_AT", "d"),
+]
+
+FILTERS = {
+    # filter: (variable, property)
+    "passenger": ("p", "record_locator"),
+    "flight": ("f", "flight_number"),
+    "origin": ("o", "station_code"),
+    "destination": ("d", "station_code"),
+    "airport": ("o", "station_code"),
+    "fleet": ("f", "fleet_type_description"),
+    "level": ("p", "loyalty_program_level"),
+    "generation": ("p", "generation"),
+    "class": ("j", "passenger_class"),
+}
+
+# Most selective first: a record locator is one passenger, a flight
+# number a couple of journeys, an airport a few dozen; fleets, loyalty
+# levels, generations and classes each cover a large share of the graph
+ANCHOR_ORDER = ["passenger", "flight", "origin", "destination", "airport", "fleet", "level", "generation", "class"]
+
+FILTER_INDEXES = [
+    "CREATE INDEX passenger_record_locator IF NOT EXISTS FOR (p:Passenger) ON (p.record_locator)",
+    "CREATE INDEX passenger_loyalty_level IF NOT EXISTS FOR (p:Passenger) ON (p.loyalty_program_level)",
+    "CREATE INDEX passenger_generation IF NOT EXISTS FOR (p:Passenger) ON (p.generation)",
+    "CREATE INDEX journey_passenger_class IF NOT EXISTS FOR (j:Journey) ON (j.passenger_class)",
+    "CREATE INDEX flight_number IF NOT EXISTS FOR (f:Flight) ON (f.flight_number)",
+    "CREATE INDEX flight_fleet_type IF NOT EXISTS FOR (f:Flight) ON (f.fleet_type_description)",
+    "CREATE INDEX airport_station_code IF NOT EXISTS FOR (a:Airport) ON (a.station_code)",
+]
+
+JOURNEY_ROWS = """RETURN
+    j.feedback_ID AS journey,
+    f.flight_number AS flight,
+    o.station_code AS origin,
+    d.station_code AS destination,
+    j.arrival_delay_minutes AS delay,
+    j.food_satisfaction_score AS food_score,
+    j.passenger_class AS passenger_class,
+    j.actual_flown_miles AS miles,
+    p.record_locator AS passenger,
+    p.generation AS generation,
+    p.loyalty_program_level AS loyalty_level,
+    f.fleet_type_description AS fleet"""
+
+# intent: variables the columns use, RETURN ... ORDER BY, and the keyset
+# (column, variable, property) for row listings paged with $after
+SHAPES = {
+    "flight_search": {
+        "vars": "pjfod",
+        "return": JOURNEY_ROWS + "\nORDER BY journey",
+        "keyset": ("journey", "j", "feedback_ID"),
+    },
+    "class_search": {
+        "vars": "pjfod",
+        "return": JOURNEY_ROWS + "\nORDER BY journey",
+        "keyset": ("journey", "j", "feedback_ID"),
+    },
+    "delay_info": {
+        "vars": "pjfod",
+        "return": JOURNEY_ROWS + "\nORDER BY delay DESC",
+    },
+    "satisfaction_query": {
+        "vars": "pjfod",
+        "return": JOURNEY_ROWS + "\nORDER BY food_score DESC",
+    },
+    "journey_stats": {
+        "vars": "jf",
+        "return": """RETURN
+    f.flight_number AS flight,
+    AVG(j.arrival_delay_minutes) AS avg_delay,
+    AVG(j.food_satisfaction_score) AS avg_food,
+    COUNT(j) AS journey_count""",
+    },
+    "generation_analysis": {
+        "vars": "pj",
+        "return": """RETURN
+    p.generation AS generation,
+    AVG(j.food_satisfaction_score) AS avg_food,
+    AVG(j.arrival_delay_minutes) AS avg_delay,
+    COUNT(j) AS journey_count
+ORDER BY avg_food DESC""",
+    },
+    "loyalty_miles": {
+        "vars": "pj",
+        "return": """RETURN
+    p.loyalty_program_level AS level,
+    p.record_locator AS passenger,
+    p.generation AS generation,
+    SUM(j.actual_flown_miles) AS total_miles,
+    COUNT(j) AS journey_count,
+    AVG(j.arrival_delay_minutes) AS avg_delay,
+    AVG(j.food_satisfaction_score) AS avg_food
+ORDER BY passenger""",
+        "keyset": ("passenger", "p", "record_locator"),
+    },
+    "airport_delay": {
+        "vars": "jfo",
+        "return": """RETURN
+    o.station_code AS airport,
+    AVG(j.arrival_delay_minutes) AS avg_delay,
+    COUNT(j) AS journey_count
+ORDER BY avg_delay DESC""",
+    },
+    "route_satisfaction": {
+        "vars": "jfod",
+        "return": """RETURN
+    o.station_code AS origin,
+    d.station_code AS destination,
+    AVG(j.food_satisfaction_score) AS avg_food,
+    COUNT(j) AS journey_count
+ORDER BY avg_food DESC""",
+    },
+    "class_delay": {
+        "vars": "j",
+        "return": """RETURN
+    j.passenger_class AS passenger_class,
+    AVG(j.arrival_delay_minutes) AS avg_delay,
+    COUNT(j) AS journey_count
+ORDER BY avg_delay DESC""",
+    },
+    "class_satisfaction": {
+        "vars": "j",
+        "return": """RETURN
+    j.passenger_class AS passenger_class,
+    AVG(j.food_satisfaction_score) AS avg_food,
+    COUNT(j) AS journey_count
+ORDER BY avg_food DESC""",
+    },
+    "fleet_performance": {
+        "vars": "jf",
+        "return": """RETURN
+    f.fleet_type_description AS fleet,
+    AVG(j.arrival_delay_minutes) AS avg_delay,
+    AVG(j.food_satisfaction_score) AS avg_food,
+    COUNT(j) AS journey_count
+ORDER BY avg_delay ASC""",
+    },
+    "high_risk_passengers": {
+        "vars": "pj",
+        "return": """WITH p,
+    AVG(j.arrival_delay_minutes) AS avg_delay,
+    AVG(j.food_satisfaction_score) AS avg_food,
+    COUNT(j) AS journey_count
+WHERE avg_delay > 30 AND avg_food <= 2
+RETURN
+    p.record_locator AS passenger,
+    avg_delay,
+    avg_food,
+    journey_count,
+    p.generation AS generation,
+    p.loyalty_program_level AS loyalty_level""",
+    },
+    "frequent_flyers": {
+        "vars": "pj",
+        "return": """RETURN
+    p.record_locator AS passenger,
+    p.loyalty_program_level AS loyalty_level,
+    p.generation AS generation,
+    COUNT(j) AS journey_count,
+    SUM(j.actual_flown_miles) AS total_miles
+ORDER BY journey_count DESC""",
+    },
+}
+
+# Filters the fixed QUERIES already take; anything beyond them is composed
+FIXED_FILTERS = {
+    "flight_search": {"origin", "destination"},
+    "class_search": {"class"},
+    "loyalty_miles": {"level"},
+}
+
+
+# ------------------------------------------------
+#              ENTITIES → FILTERS
+# ------------------------------------------------
+# Record locators are six alphanumerics masked as "XX" in the middle
+# (BTXXE0); entity extraction lowercases them
+LOCATOR_PATTERN = re.compile(r"^[a-z0-9]{2}xx[a-z0-9]{2}$")
+
+# Loyalty levels as stored in the graph, used when there is no vocabulary
+LOYALTY_LEVELS = (
+    "non-elite", "premier silver", "premier gold", "premier platinum", "premier 1k", "global services", "NBK",
+)
+
+VOCAB_CATEGORIES = {
+    # filter: gazetteer vocabulary category
+    "passenger": "record_locators",
+    "flight": "flights",
+    "origin": "airports",
+    "destination": "airports",
+    "airport": "airports",
+    "fleet": "fleets",
+    "level": "loyalty_levels",
+    "generation": "generations",
+    "class": "classes",
+}
+
+
+def generation_names(vocab=None):
+    """
+    Lowercased word -> generation: the gazetteer aliases plus each
+    generation's own name, singular and plural ("silent", "boomers").
+    """
+    names = dict(PHRASE_ALIASES["generations"])
+    for value in set(names.values()) | set((vocab or {}).get("generations", ())):
+        if value:
+            names[str(value).lower()] = value
+            names[str(value).lower() + "s"] = value
+    return names
+
+
+def level_names(vocab=None):
+    """
+    Lowercased level -> stored spelling ("nbk" -> "NBK").
+    """
+    levels = (vocab or {}).get("loyalty_levels") or LOYALTY_LEVELS
+    return {str(level).lower(): level for level in levels}
+
+
+def first(values):
+    for value in values or []:
+        if value:
+            return value
+    return None
+
+
+def entity_filters(entities, vocab=None):
+    """
+    {filter: value} for the entities that narrow a query. With a
+    vocabulary (Gazetteer.vocab), values the graph does not hold are
+    dropped and the rest take the stored spelling.
+    """
+    routes = entities.get("routes") or {}
+    airports = entities.get("airports") or []
+    generation_aliases = generation_names(vocab)
+    level_aliases = level_names(vocab)
+
+    # "passengers" mixes record locators, loyalty levels and groups; other
+    # words ("economy") are left to their own entity lists
+    locators, generations = [], []
+    levels = [level_aliases.get(str(level).strip().lower()) for level in entities.get("loyalty_levels") or []]
+    for value in entities.get("passengers") or []:
+        value = str(value).strip().lower()
+        if value in generation_aliases:
+            generations.append(generation_aliases[value])
+        elif value in level_aliases:
+            levels.append(level_aliases[value])
+        elif LOCATOR_PATTERN.match(value):
+            locators.append(value.upper())
+
+    origin = routes.get("origin") or (airports[0] if len(airports) > 0 else None)
+    destination = routes.get("destination") or (airports[1] if len(airports) > 1 else None)
+
+    filters = {
+        "passenger": first(locators),
+        "flight": first(entities.get("flights")),
+        "fleet": first(entities.get("fleets")),
+        "level": first(levels),
+        "generation": first(entities.get("generations")) or first(generations),
+        "class": first(entities.get("classes")),
+    }
+    if origin and destination:
+        filters["origin"], filters["destination"] = origin, destination
+    else:
+        filters["airport"] = origin
+
+    if vocab is not None:
+        filters = {name: known_value(vocab, name, value) for name, value in filters.items()}
+
+    filters = {name: value for name, value in filters.items() if value}
+    if "flight" in filters and str(filters["flight"]).isdigit():
+        filters["flight"] = int(filters["flight"])
+    return filters
+
+
+def known_value(vocab, name, value):
+    """
+    The stored spelling of `value` for filter `name`, or None.
+    """
+    if not value:
+        return None
+    stored = {str(v).lower(): v for v in vocab.get(VOCAB_CATEGORIES[name], ())}
+    return stored.get(str(value).lower())
+
+
+# ------------------------------------------------
+#              COMPOSITION
+# ------------------------------------------------
+def is_composed(query_key):
+    return isinstance(query_key, str) and query_key.startswith(COMPOSED_PREFIX)
+
+
+def needs_composition(intent, filters):
+    """
+    True when the fixed query for `intent` cannot apply all of `filters`.
+    """
+    return intent in SHAPES and bool(set(filters) - FIXED_FILTERS.get(intent, set()))
+
+
+def compose(intent, filters):
+    """
+    (query_key, params) of the composed query for `intent` narrowed by
+    `filters`; its text is composed_text(query_key).
+    """
+    names = sorted(filters)
+    return f"{COMPOSED_PREFIX}{intent}:{'+'.join(names)}", {name: filters[name] for name in names}
+
+
+def parse_key(query_key):
+    _, intent, names = query_key.split(":", 2)
+    return intent, tuple(name for name in names.split("+") if name)
+
+
+def keyset_column(query_key):
+    """
+    The cursor column of a composed row listing, else None.
+    """
+    if not is_composed(query_key):
+        return None
+    keyset = SHAPES.get(parse_key(query_key)[0], {}).get("keyset")
+    return keyset[0] if keyset else None
+
+
+def anchor_for(names, variables):
+    for name in ANCHOR_ORDER:
+        if name in names:
+            return name, FILTERS[name][0]
+    return None, variables[0]
+
+
+def traversal(anchor, needed):
+    """
+    Variables in the order they are matched, starting from `anchor`, each
+    with the relationship (from, type, to) that reaches it.
+    """
+    neighbours = {}
+    for rel in RELATIONSHIPS:
+        neighbours.setdefault(rel[0], []).append((rel[2], rel))
+        neighbours.setdefault(rel[2], []).append((rel[0], rel))
+
+    # Breadth-first from the anchor; the chain is a tree, so each needed
+    # variable has exactly one path back to it
+    parent = {anchor: None}
+    order = [anchor]
+    for var in order:
+        for other, rel in neighbours.get(var, []):
+            if other not in parent:
+                parent[other] = (var, rel)
+                order.append(other)
+
+    keep = set()
+    for var in needed:
+        while var is not None and var not in keep:
+            keep.add(var)
+            var = parent[var][0] if parent[var] else None
+
+    return [(var, parent[var][1] if parent[var] else None) for var in order if var in keep]
+
+
+def node(var, bound):
+    return f"({var})" if var in bound else f"({var}:{LABELS[var]})"
+
+
+@lru_cache(maxsize=512)
+def composed_text(query_key):
+    """
+    Cypher for a key from compose(), or None for an unknown intent / filter.
+    """
+    intent, names = parse_key(query_key)
+    shape = SHAPES.get(intent)
+    if shape is None or any(name not in FILTERS for name in names):
+        return None
+
+    keyset = shape.get("keyset")
+    anchor_name, anchor = anchor_for(names, shape["vars"])
+    needed = set(shape["vars"]) | {FILTERS[name][0] for name in names}
+
+    conditions = {}
+    for name in names:
+        var, prop = FILTERS[name]
+        conditions.setdefault(var, []).append(f"{var}.{prop} = ${name}")
+    if keyset:
+        _, var, prop = keyset
+        conditions.setdefault(var, []).append(f"($after IS NULL OR {var}.{prop} > $after)")
+
+    lines = []
+    bound = set()
+    for var, rel in traversal(anchor, needed):
+        if rel is None:
+            lines.append(f"MATCH {node(var, bound)}")
+            if INDEX_HINTS and anchor_name:
+                lines.append(f"USING INDEX {var}:{LABELS[var]}({FILTERS[anchor_name][1]})")
+        else:
+            start, rel_type, end = rel
+            lines.append(f"MATCH {node(start, bound)}-[:{rel_type}]->{node(end, bound)}")
+        bound.update(v for v in (var, rel and rel[0], rel and rel[2]) if v)
+        if var in conditions:
+            lines.append("WHERE " + "\n  AND ".join(conditions[var]))
+
+    lines.append(shape["return"])
+    lines.append("LIMIT $limit")
+    body = "\n".join(lines)
+    return "\n" + "\n".join("        " + line for line in body.splitlines()) + "\n    "
+
+
+def ensure_filter_indexes(session):
+    for statement in FILTER_INDEXES:
+        session.run(statement)
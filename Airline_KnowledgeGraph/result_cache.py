@@ -0,0 +1,112 @@
+import json
+import threading
+from collections import OrderedDict
+
+# ------------------------------------------------------------------
+# Cypher result cache
+# ------------------------------------------------------------------
+# Rows of executed queries keyed by query_cache_key(query_key, params)
+# and tagged with the graph version (graph_version.py) they were read
+# at. A lookup with a different version drops the entry, so ingestion /
+# embedding jobs that bump the version invalidate everything at once.
+# Bounded by an approximate memory budget (JSON size of the rows) with
+# LRU eviction.
+
+
+def rows_size(rows):
+    return len(json.dumps(rows, ensure_ascii=False, default=str))
+
+
+class ResultCache:
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # key -> (graph_version, rows, size)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ------------------------------------------------
+    #              LOOKUP / STORE
+    # ------------------------------------------------
+    def get(self, key, graph_version):
+        """
+        Returns a copy of the cached rows, or None. graph_version None
+        (database unreachable) is always a miss.
+        """
+        with self._lock:
+            if graph_version is None:
+                self.misses += 1
+                return None
+            self._set_version(graph_version)
+
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            rows = entry[1]
+
+        return [dict(row) for row in rows]
+
+    def put(self, key, graph_version, rows):
+        if graph_version is None:
+            return
+
+        rows = [dict(row) for row in rows]
+        size = rows_size(rows)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            # Rows read at an older version than the cache holds are stale
+            if self._version is not None and graph_version < self._version:
+                return
+            self._set_version(graph_version)
+
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (graph_version, rows, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def _set_version(self, graph_version):
+        # Caller holds the lock
+        if graph_version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = graph_version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "graph_version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
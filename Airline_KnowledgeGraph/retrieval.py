@@ -1,6 +1,114 @@
-from neo4j import GraphDatabase
-from queries import QUERIES
-from embeddings.embedding_retreival import get_similar_journeys
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from neo4j import Query
+import graph_db
+from queries import QUERIES, MATERIALIZED_QUERIES, KEYSET_COLUMNS
+import query_builder
+from gazetteer import get_gazetteer
+from singleflight import SingleFlight, AsyncSingleFlight
+from embeddings.embedding_retreival import get_similar_journeys, get_similar_journeys_async
+from result_cache import ResultCache
+from graph_version import get_graph_version
+from materialized import aggregates_ready
+from logs import get_logger
+
+log = get_logger("retrieval")
+
+# Cypher results are cached until the graph version changes
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE", "1") == "1"
+RESULT_CACHE_MB = float(os.environ.get("RESULT_CACHE_MB", "64"))
+
+# Read aggregate intents from the materialized nodes when they are current
+MATERIALIZED_ENABLED = os.environ.get("MATERIALIZED_QUERIES", "1") == "1"
+
+# Narrow intents by the question's entities with composed queries
+COMPOSED_ENABLED = os.environ.get("COMPOSED_QUERIES", "1") == "1"
+
+# Hybrid retrieval runs the baseline and embedding branches side by side.
+# Each branch gets the query timeout (or BRANCH_TIMEOUT without one) plus
+# a small grace for the driver to report it; a branch that has not
+# answered by then is left out of the merge.
+BRANCH_TIMEOUT = float(os.environ.get("RETRIEVAL_BRANCH_TIMEOUT", "10"))
+BRANCH_GRACE = 0.1
+
+branch_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("RETRIEVAL_BRANCH_WORKERS", "8")),
+    thread_name_prefix="retrieval-branch"
+)
+
+
+def branch_timeout(timeout):
+    return (BRANCH_TIMEOUT if timeout is None else timeout) + BRANCH_GRACE
+
+
+# Rows per page ($limit) when the caller does not ask for a size. Records
+# are pulled from the server FETCH_SIZE at a time (None: the driver's
+# NEO4J_FETCH_SIZE), so a stream stopped early does not transfer the rest.
+PAGE_SIZE = int(os.environ.get("RETRIEVAL_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = 1000
+FETCH_SIZE = int(os.environ["RETRIEVAL_FETCH_SIZE"]) if os.environ.get("RETRIEVAL_FETCH_SIZE") else None
+
+
+def query_params(params=None):
+    """
+    The parameters sent to Neo4j: `params` plus the paging defaults
+    (limit = PAGE_SIZE, after = null for the first page).
+    """
+    full = {"limit": PAGE_SIZE, "after": None}
+    full.update(params or {})
+    full["limit"] = max(1, min(int(full["limit"]), MAX_PAGE_SIZE))
+    return full
+
+
+# Intents whose query takes no parameters (route() ignores entities)
+PARAMETER_FREE_INTENTS = {
+    "delay_info",
+    "journey_stats",
+    "satisfaction_query",
+    "generation_analysis",
+    "airport_delay",
+    "route_satisfaction",
+    "class_delay",
+    "class_satisfaction",
+    "fleet_performance",
+    "high_risk_passengers",
+    "frequent_flyers"
+}
+
+
+def has_query(query_key):
+    return query_key in QUERIES or query_builder.is_composed(query_key)
+
+
+def keyset_column(query_key):
+    """
+    The cursor column of a keyset-paged query, else None.
+    """
+    return KEYSET_COLUMNS.get(query_key) or query_builder.keyset_column(query_key)
+
+
+def query_cache_key(query_key, params=None):
+    """
+    Hashable identity of one Cypher execution: (query_key, sorted params).
+    """
+    return query_key, tuple(sorted((params or {}).items()))
+
+
+def run_branch(branch, call, default, intent, incomplete):
+    """
+    Runs one retrieval branch; a failed branch yields `default` and is
+    recorded in `incomplete`.
+    """
+    if call is None:
+        return default
+    try:
+        return call()
+    except Exception as e:
+        log.error("branch_error", branch=branch, intent=intent, error=str(e))
+        incomplete.append(branch)
+        return default
 
 
 # ====================================================
@@ -65,66 +173,296 @@ def merge_results(baseline_list, embedding_list, key_candidates=None):
 # ====================================================
 class Retriever:
 
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self):
+        # Uses the process-wide drivers from graph_db, opened on first use,
+        # so constructing a Retriever needs neither credentials nor a database
+
+        # Identical concurrent queries share one execution
+        self.inflight = SingleFlight()
+        self.async_inflight = AsyncSingleFlight()
+
+        # Results of earlier executions, valid for the current graph version
+        self.result_cache = ResultCache(int(RESULT_CACHE_MB * 1024 * 1024)) if RESULT_CACHE_ENABLED else None
+
+    @property
+    def driver(self):
+        return graph_db.get_driver()
+
+    @property
+    def async_driver(self):
+        return graph_db.get_async_driver()
+
+    def warmup(self):
+        """
+        Opens the sync driver and checks the database is reachable.
+        """
+        self.driver.verify_connectivity()
 
     def close(self):
-        self.driver.close()
+        graph_db.close()
+
+    async def close_async(self):
+        await graph_db.close_async()
 
     # ------------------------------------------------
     #               CYPHER EXECUTION
     # ------------------------------------------------
-    def run_query(self, query_key, params=None):
-        query = QUERIES.get(query_key)
-        if not query:
+    def graph_version(self):
+        """
+        Current graph version for the result cache; None (no caching) when
+        the cache is off or the database cannot be reached.
+        """
+        if self.result_cache is None:
+            return None
+        try:
+            return get_graph_version(self.driver)
+        except ValueError:
+            return None
+
+    def query_text(self, query_key):
+        """
+        The MATERIALIZED_QUERIES variant when the aggregates cover the
+        graph, otherwise the full-scan query. Composed keys are built by
+        query_builder.
+        """
+        if query_builder.is_composed(query_key):
+            return query_builder.composed_text(query_key)
+        if MATERIALIZED_ENABLED and query_key in MATERIALIZED_QUERIES:
+            try:
+                if aggregates_ready(self.driver):
+                    return MATERIALIZED_QUERIES[query_key]
+            except ValueError:
+                pass
+        return QUERIES.get(query_key)
+
+    def run_query(self, query_key, params=None, timeout=None):
+        if not has_query(query_key):
             return []
 
+        key = query_cache_key(query_key, params)
+        version = self.graph_version()
+        if self.result_cache is not None:
+            rows = self.result_cache.get(key, version)
+            if rows is not None:
+                return rows
+
+        rows, shared = self.inflight.do(key, self.execute_query, query_key, params, timeout, version)
+        # Coalesced callers each get their own rows, as cache hits do
+        return [dict(row) for row in rows] if shared else rows
+
+    def stream_query(self, query_key, params=None, timeout=None, fetch_size=FETCH_SIZE):
+        """
+        Generator over the rows of one query, uncached, pulled from the
+        server fetch_size records at a time. Closing it early ends the
+        session and discards the rest of the result. Errors are raised.
+        """
+        query = self.query_text(query_key)
+        if not query:
+            return
+
+        config = {} if fetch_size is None else {"fetch_size": fetch_size}
+        with self.driver.session(**config) as session:
+            result = session.run(Query(query, timeout=timeout), query_params(params))
+            for record in result:
+                yield record.data()
+
+    def execute_query(self, query_key, params=None, timeout=None, graph_version=None):
+        """
+        timeout (seconds) is enforced server-side as a transaction timeout.
+        Errors and timeouts are logged and raised, so the caller can mark
+        the result incomplete; only successful results are cached under
+        graph_version.
+        """
         params = params or {}
 
         try:
-            with self.driver.session() as session:
-                result = session.run(query, params)
-                return [r.data() for r in result]
+            start = time.time()
+            rows = list(self.stream_query(query_key, params, timeout))
+            log.debug("query", query=query_key, rows=len(rows), seconds=round(time.time() - start, 3))
         except Exception as e:
-            print("Cypher error:", e)
+            log.error("cypher_error", query=query_key, error=str(e))
+            raise
+
+        if self.result_cache is not None:
+            self.result_cache.put(query_cache_key(query_key, params), graph_version, rows)
+        return rows
+
+    async def run_query_async(self, query_key, params=None, timeout=None):
+        if not has_query(query_key):
             return []
 
+        key = query_cache_key(query_key, params)
+        version = None
+        if self.result_cache is not None:
+            # Version reads are cached for a few seconds; the occasional
+            # refresh is a blocking query, so keep it off the event loop
+            version = await asyncio.to_thread(self.graph_version)
+            rows = self.result_cache.get(key, version)
+            if rows is not None:
+                return rows
+
+        rows, shared = await self.async_inflight.do(
+            key, self.execute_query_async, query_key, params, timeout, version
+        )
+        return [dict(row) for row in rows] if shared else rows
+
+    async def stream_query_async(self, query_key, params=None, timeout=None, fetch_size=FETCH_SIZE):
+        """
+        Async generator variant of stream_query.
+        """
+        # The readiness check is cached but its refresh is a blocking query
+        query = await asyncio.to_thread(self.query_text, query_key)
+        if not query:
+            return
+
+        config = {} if fetch_size is None else {"fetch_size": fetch_size}
+        async with self.async_driver.session(**config) as session:
+            result = await session.run(Query(query, timeout=timeout), query_params(params))
+            async for record in result:
+                yield record.data()
+
+    async def execute_query_async(self, query_key, params=None, timeout=None, graph_version=None):
+        params = params or {}
+
+        try:
+            start = time.time()
+            rows = [row async for row in self.stream_query_async(query_key, params, timeout)]
+            log.debug("query", query=query_key, rows=len(rows), seconds=round(time.time() - start, 3))
+        except Exception as e:
+            log.error("cypher_error", query=query_key, error=str(e))
+            raise
+
+        if self.result_cache is not None:
+            self.result_cache.put(query_cache_key(query_key, params), graph_version, rows)
+        return rows
+
     # ------------------------------------------------
     #           EMBEDDING RETRIEVAL
     # ------------------------------------------------
-    def run_embedding_query(self, intent, params, embedding_model):
+    def embedding_query_text(self, intent, params, embedding_model):
         """
         Embedding retrieval is ONLY used for journey similarity.
+        Returns the text to embed, or None when the request does not qualify.
         """
 
         if intent != "journey_similarity":
-            return []
+            return None
 
         journey_id = params.get("journey_id")
         if not journey_id:
-            print("⚠ journey_similarity without journey_id")
-            return []
+            log.warning("missing_journey_id", intent=intent)
+            return None
 
         if embedding_model not in {"minilm", "mpnet"}:
-            print("⚠ Invalid embedding model:", embedding_model)
-            return []
+            log.warning("invalid_embedding_model", embedding_model=embedding_model)
+            return None
 
-        query_text = f"Journey similar to {journey_id}"
+        return f"Journey similar to {journey_id}"
 
+    def run_embedding_query(self, intent, params, embedding_model, timeout=None):
+        query_text = self.embedding_query_text(intent, params, embedding_model)
+        if query_text is None:
+            return []
+        return self.search_embeddings(query_text, embedding_model, timeout)
+
+    def search_embeddings(self, query_text, embedding_model, timeout=None):
         try:
             return get_similar_journeys(
                 query_text=query_text,
                 model_key=embedding_model,
-                top_k=15
+                top_k=15,
+                timeout=timeout
             )
         except Exception as e:
-            print("Embedding retrieval error:", e)
+            log.error("embedding_error", embedding_model=embedding_model, error=str(e))
+            raise
+
+    async def run_embedding_query_async(self, intent, params, embedding_model, timeout=None):
+        query_text = self.embedding_query_text(intent, params, embedding_model)
+        if query_text is None:
             return []
 
+        try:
+            return await get_similar_journeys_async(
+                query_text=query_text,
+                model_key=embedding_model,
+                top_k=15,
+                timeout=timeout
+            )
+        except Exception as e:
+            log.error("embedding_error", embedding_model=embedding_model, error=str(e))
+            raise
+
+    # ------------------------------------------------
+    #                  PAGINATION
+    # ------------------------------------------------
+    def next_cursor(self, query_key, params, count, last_row):
+        """
+        The `after` value for the page following one that returned `count`
+        rows ending in `last_row`; None when that was the last page or the
+        query has no keyset.
+        """
+        column = keyset_column(query_key)
+        if column is None or not last_row or count < query_params(params)["limit"]:
+            return None
+        return last_row.get(column)
+
+    def page(self, query_key, params, rows):
+        """
+        Paging state returned with a result: enough to fetch the next page
+        with stream_page(), or None when there is none.
+        """
+        after = self.next_cursor(query_key, params, len(rows), rows[-1] if rows else None)
+        if after is None:
+            return None
+        return {"query": query_key, "params": dict(params), "next_after": after}
+
+    def stream_page(self, page, timeout=None):
+        """
+        Generator over the rows after page["next_after"]; once exhausted,
+        page["next_after"] points at the following page (None at the end).
+        """
+        params = dict(page["params"], after=page["next_after"])
+        count, last_row = 0, None
+        for row in self.stream_query(page["query"], params, timeout):
+            count, last_row = count + 1, row
+            yield row
+        page["next_after"] = self.next_cursor(page["query"], params, count, last_row)
+
     # ------------------------------------------------
     #           INTENT → QUERY ROUTER
     # ------------------------------------------------
-    def route(self, intent, entities):
+    def vocabulary(self):
+        """
+        The graph's entity values (gazetteer) to validate filters against,
+        or None when unavailable.
+        """
+        gazetteer = get_gazetteer()
+        return gazetteer.vocab if gazetteer is not None else None
+
+    def route(self, intent, entities, after=None, limit=None):
+        """
+        (query_key, params) for an intent. `limit` sets the page size and
+        `after` continues a keyset query (keyset_column) after that value.
+        """
+        query_key, params = self.route_query(intent, entities)
+        if query_key is not None:
+            params = dict(params)
+            if after is not None and keyset_column(query_key):
+                params["after"] = after
+            if limit is not None:
+                params["limit"] = limit
+        return query_key, params
+
+    def route_query(self, intent, entities):
+        # ---------- FILTERED (composed) ----------
+        # Entities beyond what the intent's fixed query takes narrow it
+        # through query_builder instead of being ignored
+        if COMPOSED_ENABLED and intent in query_builder.SHAPES:
+            filters = query_builder.entity_filters(entities, self.vocabulary())
+            if query_builder.needs_composition(intent, filters):
+                return query_builder.compose(intent, filters)
+
         airports = entities.get("airports", [])
         routes = entities.get("routes", {}) or {}
         passengers = entities.get("passengers", [])
@@ -140,19 +478,7 @@ class Retriever:
             return "flight_search", {"origin": origin, "destination": dest}
 
         # ---------- SIMPLE AGGREGATES ----------
-        if intent in {
-            "delay_info",
-            "journey_stats",
-            "satisfaction_query",
-            "generation_analysis",
-            "airport_delay",
-            "route_satisfaction",
-            "class_delay",
-            "class_satisfaction",
-            "fleet_performance",
-            "high_risk_passengers",
-            "frequent_flyers"
-        }:
+        if intent in PARAMETER_FREE_INTENTS:
             return intent, {}
 
         # ---------- LOYALTY ----------
@@ -163,6 +489,9 @@ class Retriever:
 
         # ---------- CLASS SEARCH ----------
         if intent == "class_search":
+            classes = entities.get("classes", [])
+            if classes:
+                return "class_search", {"class": classes[0]}
             if not passengers:
                 return None, {}
             return "class_search", {"class": passengers[0]}
@@ -184,35 +513,167 @@ class Retriever:
         entities,
         embedding_model,
         use_embeddings=True,
-        retrieval_mode="hybrid"
+        retrieval_mode="hybrid",
+        prefetched=None,
+        timeout=None,
+        after=None,
+        limit=None,
+        embedding_timeout=None
     ):
         """
         Supports:
         - baseline only
         - embeddings only
         - hybrid
+
+        prefetched: optional {query_cache_key(...): rows} of baseline results
+        already fetched (e.g. speculatively); a match skips the Cypher call.
+        timeout: per-query timeout (seconds) for the Cypher query, and for
+        the vector search unless embedding_timeout is given.
+        after / limit: baseline page (see route()); result["page"] holds the
+        cursor for the next one and result["limit"] the page size used.
         """
 
-        query_key, params = self.route(intent, entities)
+        prefetched = prefetched or {}
+
+        query_key, params = self.route(intent, entities, after, limit)
+        if embedding_timeout is None:
+            embedding_timeout = timeout
 
+        baseline_call = None
+        embedding_call = None
         baseline_rows = []
-        embedding_rows = []
         queries_run = []
 
         # ---------- BASELINE ----------
-        if retrieval_mode != "embeddings only" and query_key in QUERIES:
-            baseline_rows = self.run_query(query_key, params)
-            queries_run.append(QUERIES[query_key])
+        if retrieval_mode != "embeddings only" and has_query(query_key):
+            cache_key = query_cache_key(query_key, params)
+            if cache_key in prefetched:
+                baseline_rows = prefetched[cache_key]
+            else:
+                baseline_call = lambda: self.run_query(query_key, params, timeout)
+            queries_run.append(self.query_text(query_key))
 
         # ---------- EMBEDDINGS ----------
         if use_embeddings and retrieval_mode != "baseline only":
-            embedding_rows = self.run_embedding_query(
-                intent,
-                params,
-                embedding_model
-            )
+            query_text = self.embedding_query_text(intent, params, embedding_model)
+            if query_text is not None:
+                embedding_call = lambda: self.search_embeddings(query_text, embedding_model, embedding_timeout)
+
+        # ---------- RUN (concurrently when both are needed) ----------
+        incomplete = []
+        if baseline_call and embedding_call:
+            futures = {
+                "baseline": branch_pool.submit(baseline_call),
+                "embeddings": branch_pool.submit(embedding_call),
+            }
+            rows = {}
+            # Both started together, so each expiry counts from the same
+            # start: hybrid costs max(baseline, embeddings), not their sum
+            started = time.monotonic()
+            expires = {
+                "baseline": started + branch_timeout(timeout),
+                "embeddings": started + branch_timeout(embedding_timeout),
+            }
+            for branch, future in futures.items():
+                try:
+                    rows[branch] = future.result(timeout=max(0.0, expires[branch] - time.monotonic()))
+                except FutureTimeout:
+                    log.warning("branch_timeout", branch=branch, intent=intent)
+                    incomplete.append(branch)
+                    rows[branch] = []
+                except Exception as e:
+                    log.error("branch_error", branch=branch, intent=intent, error=str(e))
+                    incomplete.append(branch)
+                    rows[branch] = []
+            baseline_rows, embedding_rows = rows["baseline"], rows["embeddings"]
+        else:
+            baseline_rows = run_branch("baseline", baseline_call, baseline_rows, intent, incomplete)
+            embedding_rows = run_branch("embeddings", embedding_call, [], intent, incomplete)
+
+        result = self.assemble(baseline_rows, embedding_rows, queries_run, retrieval_mode)
+        result["incomplete"] = incomplete
+        result["page"] = self.page(query_key, params, baseline_rows) if queries_run else None
+        result["limit"] = query_params(params)["limit"]
+        return result
+
+    async def retrieve_async(
+        self,
+        intent,
+        entities,
+        embedding_model,
+        use_embeddings=True,
+        retrieval_mode="hybrid",
+        prefetched=None,
+        timeout=None,
+        after=None,
+        limit=None,
+        embedding_timeout=None
+    ):
+        """
+        Async variant of retrieve: the baseline Cypher query and the
+        embedding search run concurrently.
+        """
+
+        prefetched = prefetched or {}
+
+        query_key, params = self.route(intent, entities, after, limit)
+        if embedding_timeout is None:
+            embedding_timeout = timeout
 
-        # ---------- MODE LOGIC ----------
+        baseline_call = None
+        embedding_call = None
+        baseline_rows = []
+        queries_run = []
+        ran_baseline = False
+
+        # ---------- BASELINE ----------
+        if retrieval_mode != "embeddings only" and has_query(query_key):
+            cache_key = query_cache_key(query_key, params)
+            if cache_key in prefetched:
+                baseline_rows = prefetched[cache_key]
+            else:
+                baseline_call = self.run_query_async(query_key, params, timeout)
+            ran_baseline = True
+
+        # ---------- EMBEDDINGS ----------
+        if use_embeddings and retrieval_mode != "baseline only":
+            embedding_call = self.run_embedding_query_async(intent, params, embedding_model, embedding_timeout)
+
+        incomplete = []
+        baseline_rows, embedding_rows = await asyncio.gather(
+            self.await_branch("baseline", baseline_call, baseline_rows, timeout, incomplete),
+            self.await_branch("embeddings", embedding_call, [], embedding_timeout, incomplete)
+        )
+        if ran_baseline:
+            queries_run.append(await asyncio.to_thread(self.query_text, query_key))
+
+        result = self.assemble(baseline_rows, embedding_rows, queries_run, retrieval_mode)
+        result["incomplete"] = incomplete
+        result["page"] = self.page(query_key, params, baseline_rows) if ran_baseline else None
+        result["limit"] = query_params(params)["limit"]
+        return result
+
+    async def await_branch(self, branch, awaitable, default, timeout, incomplete):
+        """
+        Awaits one retrieval branch within its timeout; a late or failed
+        branch yields `default` and is recorded in `incomplete`.
+        """
+        if awaitable is None:
+            return default
+        try:
+            return await asyncio.wait_for(awaitable, branch_timeout(timeout))
+        except asyncio.TimeoutError:
+            log.warning("branch_timeout", branch=branch)
+        except Exception as e:
+            log.error("branch_error", branch=branch, error=str(e))
+        incomplete.append(branch)
+        return default
+
+    # ------------------------------------------------
+    #                MODE LOGIC
+    # ------------------------------------------------
+    def assemble(self, baseline_rows, embedding_rows, queries_run, retrieval_mode):
         if retrieval_mode == "baseline only":
             return {
                 "baseline": baseline_rows,
@@ -1,37 +1,91 @@
 import os
-import configparser
+import asyncio
 import time
-from intent_classifier import classify_intent_llm
-from entity_extraction import extract_entities_llm
+import copy
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from intent_classifier import (
+    classify_intent_llm, classify_intent_llm_async, classify_intent_rules, classify_intent_offline
+)
+from local_intent import get_local_classifier
+from entity_extraction import extract_entities_llm, extract_entities_llm_async, extract_entities_offline
 from prompt_builder import build_structured_prompt
-from retrieval import Retriever
-from llm_models import run_llm
+from retrieval import Retriever, PARAMETER_FREE_INTENTS, query_cache_key
+from llm_models import run_llm, run_llm_async, stream_llm
 from accuracy import compute_kg_faithfulness_accuracy
+from nlu_cache import NLUCache, normalize_question
+from singleflight import SingleFlight, AsyncSingleFlight
+from answer_cache import SemanticAnswerCache, literal_signature
+from templated_answers import render_templated_answer
+from model_router import model_router
+from graph_version import get_graph_version
+from gazetteer import get_gazetteer
+from inference import warmup as warmup_inference
+from embeddings.embedding_retreival import get_model
+from logs import get_logger
+from deadline import (
+    Deadline, NLU_TIMEOUT, RETRIEVAL_TIMEOUT, EMBEDDING_TIMEOUT, ANSWER_TIMEOUT,
+    MIN_NLU_BUDGET, MIN_EMBEDDING_BUDGET, MIN_ANSWER_BUDGET
+)
+
+
+log = get_logger("router")
 
 
 # ----------------------------------------------------
 # Config / Env
 # ----------------------------------------------------
-config = configparser.ConfigParser()
-config.read("config.txt")
+# Neo4j settings (env / config.txt) live in graph_db.py
+
+# Single retriever instance; the shared drivers are opened on first use
+# (or by warmup()), missing credentials are reported then
+retriever = Retriever()
 
-URI = os.environ.get("NEO4J_URI")
-USER = os.environ.get("USER_NAME")
-PASSWORD = os.environ.get("PASSWORD")
+# Intent / entity results for repeated questions
+NLU_CACHE_TTL = os.environ.get("NLU_CACHE_TTL")
 
-if not URI or not USER or not PASSWORD:
-    raise ValueError("Missing Neo4j env vars: NEO4J_URI / USER_NAME / PASSWORD")
+nlu_cache = NLUCache(
+    max_entries=int(os.environ.get("NLU_CACHE_SIZE", "1024")),
+    ttl=float(NLU_CACHE_TTL) if NLU_CACHE_TTL else None,
+    path=os.environ.get("NLU_CACHE_PATH")
+)
+
+
+# ----------------------------------------------------
+# Warmup
+# ----------------------------------------------------
+def warmup(embedding_models=("minilm",)):
+    """
+    Initializes what the first request would otherwise pay for: the Neo4j
+    driver, inference clients, local intent classifier, gazetteer and
+    embedding models. Failures are logged, not raised.
+    Returns {component: seconds} for the components that came up.
+    """
+    steps = [
+        ("neo4j", retriever.warmup),
+        ("inference", warmup_inference),
+        ("local_intent", get_local_classifier),
+        ("gazetteer", get_gazetteer),
+    ] + [(f"embedding_{key}", lambda key=key: get_model(key)) for key in embedding_models]
 
+    timings = {}
+    for name, step in steps:
+        start = time.time()
+        try:
+            step()
+        except Exception as e:
+            log.error("warmup_failed", component=name, error=str(e))
+            continue
+        timings[name] = round(time.time() - start, 3)
 
-# Single retriever instance
-retriever = Retriever(URI, USER, PASSWORD)
+    log.info("warmup", timings=timings)
+    return timings
 
 
 # ----------------------------------------------------
 # Intent Correction (rule-based overrides)
 # ----------------------------------------------------
 def correct_intent(user_query: str, intent_from_llm: str) -> str:
-    print("user_query2  ", user_query)
+    log.debug("correct_intent", question=user_query, llm_intent=intent_from_llm)
     q = user_query.lower()
 
     # Class-related
@@ -100,11 +154,810 @@ def normalize_embedding_model(embedding_model):
         return "mpnet"
 
     return None
+# ----------------------------------------------------
+# NLU (intent + entities), cached per normalized question
+# ----------------------------------------------------
+def run_stage(stage, call, fallback, deadline, min_budget, cap, degraded):
+    """
+    Runs call(timeout) within the deadline. Falls back (and records the
+    stage in `degraded`) when too little time is left or the call fails.
+    """
+    if not deadline.allows(min_budget):
+        log.warning("stage_skipped", stage=stage, reason="deadline")
+        degraded.append(stage)
+        return fallback()
+
+    try:
+        return call(deadline.timeout(cap))
+    except Exception as e:
+        log.warning("stage_failed", stage=stage, error=str(e))
+        degraded.append(stage)
+        return fallback()
+
+
+async def run_stage_async(stage, call, fallback, deadline, min_budget, cap, degraded):
+    """
+    Async variant of run_stage; call(timeout) returns an awaitable.
+    """
+    if not deadline.allows(min_budget):
+        log.warning("stage_skipped", stage=stage, reason="deadline")
+        degraded.append(stage)
+        return fallback()
+
+    try:
+        return await call(deadline.timeout(cap))
+    except Exception as e:
+        log.warning("stage_failed", stage=stage, error=str(e))
+        degraded.append(stage)
+        return fallback()
+
+
+def nlu_graph_version():
+    """
+    Graph version cached NLU results are keyed on: entities are resolved
+    against the graph's vocabulary. None when the graph is unreachable.
+    """
+    try:
+        return get_graph_version(retriever.driver)
+    except Exception:
+        return None
+
+
+def understand_question(user_question: str, deadline=None):
+    """
+    Returns (raw_intent, intent, entities, cache_hit, degraded).
+    Without time for the LLM, intent falls back to rules + the local
+    classifier and entities to the gazetteer / regexes.
+    """
+    graph_version = nlu_graph_version()
+    cached = nlu_cache.get(user_question, graph_version)
+    if cached is not None:
+        return cached["raw_intent"], cached["intent"], cached["entities"], True, []
+
+    deadline = Deadline.coerce(deadline)
+    degraded = []
+
+    raw_intent = run_stage(
+        "intent",
+        lambda timeout: classify_intent_llm(user_question, timeout=timeout),
+        lambda: classify_intent_offline(user_question),
+        deadline, MIN_NLU_BUDGET, NLU_TIMEOUT, degraded
+    )
+    intent = correct_intent(user_question, raw_intent)
+    entities = run_stage(
+        "entities",
+        lambda timeout: extract_entities_llm(user_question, timeout=timeout),
+        lambda: extract_entities_offline(user_question),
+        deadline, MIN_NLU_BUDGET, NLU_TIMEOUT, degraded
+    )
+
+    if not degraded:
+        nlu_cache.put(user_question, {
+            "raw_intent": raw_intent,
+            "intent": intent,
+            "entities": entities
+        }, graph_version)
+
+    return raw_intent, intent, entities, False, degraded
+
+
+# ----------------------------------------------------
+# Speculative retrieval
+# ----------------------------------------------------
+# Parameter-free aggregate queries are started while the NLU calls run.
+# The result matching the final intent is kept, the rest are cancelled
+# (a query already running on the database is simply discarded).
+SPECULATIVE_RETRIEVAL = os.environ.get("SPECULATIVE_RETRIEVAL", "1") == "1"
+
+# At most this many candidate queries per question
+SPECULATIVE_MAX_CANDIDATES = int(os.environ.get("SPECULATIVE_MAX_CANDIDATES", "2"))
+
+# Minimum local-classifier probability for a candidate
+SPECULATIVE_MIN_PROBABILITY = float(os.environ.get("SPECULATIVE_MIN_PROBABILITY", "0.2"))
+
+speculation_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("SPECULATIVE_WORKERS", "4")),
+    thread_name_prefix="speculative-retrieval"
+)
+
+
+def predict_candidate_intents(user_question: str):
+    """
+    Cheap guesses at the final intent, without any LLM call.
+    correct_intent and the rule shortcuts are deterministic, so when one of
+    them fires the final intent is already known.
+    """
+    corrected = correct_intent(user_question, None)
+    if corrected is not None:
+        return [corrected]
+
+    rule_intent = classify_intent_rules(user_question)
+    if rule_intent is not None:
+        return [rule_intent]
+
+    return [
+        label
+        for label, probability in get_local_classifier().rank(user_question)[:SPECULATIVE_MAX_CANDIDATES]
+        if probability >= SPECULATIVE_MIN_PROBABILITY
+    ]
+
+
+def speculative_candidates(user_question: str, retrieval_mode: str):
+    """
+    The parameter-free intents worth prefetching for this question.
+    """
+    if not SPECULATIVE_RETRIEVAL or retrieval_mode == "embeddings only":
+        return []
+    return [intent for intent in predict_candidate_intents(user_question) if intent in PARAMETER_FREE_INTENTS]
+
+
+def speculative_target(intent, entities):
+    """
+    query_cache_key of the query the final intent and entities will run.
+    """
+    query_key, params = retriever.route(intent, entities)
+    return query_cache_key(query_key, params)
+
+
+def start_speculative_retrieval(user_question: str, retrieval_mode: str):
+    """
+    Returns {query_cache_key: Future} for the parameter-free candidates.
+    """
+    return {
+        query_cache_key(intent): speculation_pool.submit(retriever.run_query, intent)
+        for intent in speculative_candidates(user_question, retrieval_mode)
+    }
+
+
+def collect_speculative_retrieval(futures, intent, entities, timeout=None):
+    """
+    Keeps the speculative result whose query matches the final intent and
+    cancels the others. Returns a `prefetched` dict for Retriever.retrieve.
+    """
+    if not futures:
+        return {}
+    wanted = speculative_target(intent, entities)
+
+    prefetched = {}
+    for key, future in futures.items():
+        if key == wanted:
+            try:
+                prefetched[key] = future.result(timeout=timeout)
+            except Exception as e:
+                log.warning("speculative_unused", query=key, error=str(e))
+        else:
+            future.cancel()
+
+    return prefetched
+
+
+async def start_speculative_retrieval_async(user_question: str, retrieval_mode: str):
+    """
+    Async variant: {query_cache_key: Task}. The candidates come from the
+    local classifier, so they are predicted off the event loop.
+    """
+    candidates = await asyncio.to_thread(speculative_candidates, user_question, retrieval_mode)
+    return {
+        query_cache_key(intent): asyncio.create_task(retriever.run_query_async(intent))
+        for intent in candidates
+    }
+
+
+async def collect_speculative_retrieval_async(tasks, intent, entities, timeout=None):
+    """
+    Async variant of collect_speculative_retrieval.
+    """
+    if not tasks:
+        return {}
+    # Routing may read (and reload) the gazetteer vocabulary
+    wanted = await asyncio.to_thread(speculative_target, intent, entities)
+
+    prefetched = {}
+    for key, task in tasks.items():
+        if key == wanted:
+            try:
+                prefetched[key] = await asyncio.wait_for(task, timeout)
+            except Exception as e:
+                log.warning("speculative_unused", query=key, error=str(e))
+        else:
+            task.cancel()
+
+    return prefetched
+
+
+def next_page(page, timeout=RETRIEVAL_TIMEOUT):
+    """
+    Generator over the baseline rows after an answer's context["page"],
+    streamed from Neo4j; stop iterating to stop fetching. When it is
+    exhausted, page["next_after"] is the cursor for the following page.
+    """
+    return retriever.stream_page(page, timeout=timeout)
+
+
+# ----------------------------------------------------
+# Shared pipeline steps (sync + async)
+# ----------------------------------------------------
+def decide_embeddings(intent: str, retrieval_mode: str, embedding_model):
+    """
+    Returns (use_embeddings, model_key).
+    """
+    if retrieval_mode == "baseline only":
+        use_embeddings = False
+    elif retrieval_mode == "embeddings only":
+        use_embeddings = True
+    else:  # hybrid
+        use_embeddings = intent not in NO_EMBEDDING_INTENTS
+
+    # Normalize model
+    model_key = normalize_embedding_model(embedding_model)
+
+    # If user selected embeddings but no valid model key -> disable embeddings gracefully
+    if use_embeddings and retrieval_mode != "baseline only" and model_key is None:
+        log.warning("embeddings_disabled", embedding_model=embedding_model)
+        use_embeddings = False
+
+    return use_embeddings, model_key
+
+
+def degraded_answer(reason):
+    """
+    Stand-in for run_llm's result when the answer model is skipped or fails:
+    the caller still gets the retrieved KG context.
+    """
+    answer = (
+        f"⚠ The answer model was unavailable ({reason}). "
+        "Showing the retrieved knowledge-graph rows instead."
+    )
+    return {
+        "answer": answer,
+        "latency_seconds": 0.0,
+        "answer_length": len(answer),
+        "degraded": True
+    }
+
+
+def interrupted_answer(model_name, text, seconds):
+    """
+    Stand-in for stream_llm's result when the stream fails after tokens
+    were shown: the partial text is kept as the answer.
+    """
+    return {
+        "model": model_name,
+        "answer": text,
+        "latency_seconds": round(seconds, 3),
+        "answer_length": len(text),
+        "degraded": True
+    }
+
+
+def templated_result(user_question, intent, retrieval_mode, retrieval_result):
+    """
+    LLM-free answer for deterministic aggregate intents (templated_answers.py),
+    shaped like run_llm's result; None when the LLM should answer.
+    """
+    if retrieval_mode == "embeddings only":
+        return None
+
+    start = time.time()
+    answer = render_templated_answer(
+        intent, retrieval_result.get("baseline", []), retrieval_result.get("limit"), user_question
+    )
+    if answer is None:
+        return None
+
+    return {
+        "model": "template",
+        "answer": answer,
+        "latency_seconds": round(time.time() - start, 3),
+        "answer_length": len(answer),
+        "templated": True
+    }
+
+
+# ----------------------------------------------------
+# Answer model selection (model_router.py)
+# ----------------------------------------------------
+def record_answer_quality(intent, llm_result, retrieval_result):
+    """
+    Scores the answer against the KG rows and feeds the model router.
+    Memo hits are scored but not recorded (their latency is not the model's).
+    """
+    rows = retrieval_result.get("merged") or retrieval_result.get("baseline", [])
+    llm_result["faithfulness"] = compute_kg_faithfulness_accuracy(llm_result["answer"], rows)
+
+    if not llm_result.get("memo_hit"):
+        model_router.record(
+            llm_result["model"], intent, llm_result["latency_seconds"], ok=True,
+            faithfulness=llm_result["faithfulness"]
+        )
+
+
+def answer_with_models(intent, prompt, retrieval_result, model, deadline, hedge, degraded, on_token=None):
+    """
+    Answers with the model router's pick for this intent (or `model` when
+    the user chose one), falling back to the next model on errors.
+    With on_token the answer is streamed (no hedging); once tokens have
+    been emitted there is no fallback to another model, and a stream that
+    fails midway returns the text emitted so far (degraded "interrupted").
+    """
+    emitted = []
+
+    def emit(token):
+        emitted.append(token)
+        on_token(token)
+
+    for name in model_router.choose(intent, model):
+        if not deadline.allows(MIN_ANSWER_BUDGET):
+            break
+
+        start = time.time()
+        try:
+            if on_token:
+                llm_result = stream_llm(name, prompt, emit, timeout=deadline.timeout(ANSWER_TIMEOUT))
+            else:
+                llm_result = run_llm(name, prompt, timeout=deadline.timeout(ANSWER_TIMEOUT), hedge=hedge)
+        except Exception as e:
+            log.warning("model_failed", model=name, intent=intent, error=str(e), emitted_tokens=len(emitted))
+            model_router.record(name, intent, time.time() - start, ok=False)
+            if emitted:
+                degraded.append("interrupted")
+                return interrupted_answer(name, "".join(emitted), time.time() - start)
+            continue
+
+        record_answer_quality(intent, llm_result, retrieval_result)
+        return llm_result
+
+    degraded.append("answer")
+    return degraded_answer("out of time" if not deadline.allows(MIN_ANSWER_BUDGET) else "error")
+
+
+async def answer_with_models_async(intent, prompt, retrieval_result, model, deadline, hedge, degraded,
+                                   on_token=None):
+    """
+    Async variant of answer_with_models. With on_token the blocking token
+    stream runs in a worker thread, so on_token is called from that thread.
+    """
+    if on_token:
+        return await asyncio.to_thread(
+            answer_with_models, intent, prompt, retrieval_result, model, deadline, hedge, degraded, on_token
+        )
+
+    for name in model_router.choose(intent, model):
+        if not deadline.allows(MIN_ANSWER_BUDGET):
+            break
+
+        start = time.time()
+        try:
+            llm_result = await run_llm_async(name, prompt, timeout=deadline.timeout(ANSWER_TIMEOUT), hedge=hedge)
+        except Exception as e:
+            log.warning("model_failed", model=name, intent=intent, error=str(e))
+            model_router.record(name, intent, time.time() - start, ok=False)
+            continue
+
+        record_answer_quality(intent, llm_result, retrieval_result)
+        return llm_result
+
+    degraded.append("answer")
+    return degraded_answer("out of time" if not deadline.allows(MIN_ANSWER_BUDGET) else "error")
+
+
+# ----------------------------------------------------
+# Multi-model fan-out (compare answers side by side)
+# ----------------------------------------------------
+# Per-model answer timeouts, e.g. MODEL_TIMEOUTS="gemma=10,llama=20,deepseek=60"
+MODEL_TIMEOUTS = {
+    name.strip(): float(seconds)
+    for name, seconds in (
+        item.split("=") for item in os.environ.get("MODEL_TIMEOUTS", "").split(",") if "=" in item
+    )
+}
+
+fanout_pool = ThreadPoolExecutor(max_workers=12, thread_name_prefix="fanout-llm")
+
+
+def model_timeout(name, deadline):
+    return deadline.timeout(MODEL_TIMEOUTS.get(name, ANSWER_TIMEOUT))
+
+
+def model_answer_entry(llm_result):
+    return {
+        "model": llm_result["model"],
+        "answer": llm_result["answer"],
+        "latency_seconds": llm_result["latency_seconds"],
+        "answer_length": llm_result["answer_length"],
+        "faithfulness": llm_result["faithfulness"],
+        "accuracy": llm_result["faithfulness"]*100,
+        "memo_hit": llm_result.get("memo_hit", False),
+    }
+
+
+def model_error_entry(name, intent, start, error):
+    latency = time.time() - start
+    model_router.record(name, intent, latency, ok=False)
+    return {"model": name, "answer": None, "latency_seconds": round(latency, 3), "error": error}
+
+
+def fan_out_answers(intent, prompt, retrieval_result, models, deadline, on_answer=None):
+    """
+    Sends the prompt to every model concurrently. Returns one entry per
+    model in arrival order; on_answer(entry) is called as each arrives.
+    A model that misses its timeout gets an error entry instead of
+    holding up the others.
+    """
+    start = time.time()
+    timeouts = {name: model_timeout(name, deadline) for name in models}
+    futures = {
+        fanout_pool.submit(run_llm, name, prompt, timeout=timeouts[name]): name
+        for name in models
+    }
+
+    results = []
+
+    def deliver(entry):
+        results.append(entry)
+        if on_answer:
+            on_answer(entry)
+
+    expires = {future: start + timeouts[name] for future, name in futures.items()}
+    pending = set(futures)
+    while pending:
+        next_expiry = min(expires[future] for future in pending)
+        done, pending = wait(pending, timeout=max(0.0, next_expiry - time.time()), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            name = futures[future]
+            try:
+                llm_result = future.result()
+            except Exception as e:
+                deliver(model_error_entry(name, intent, start, str(e) or type(e).__name__))
+                continue
+            record_answer_quality(intent, llm_result, retrieval_result)
+            deliver(model_answer_entry(llm_result))
+
+        # Give up on models past their own timeout; the others keep going
+        now = time.time()
+        for future in [f for f in pending if expires[f] <= now]:
+            pending.discard(future)
+            future.cancel()
+            deliver(model_error_entry(futures[future], intent, start, "timeout"))
+
+    return results
+
+
+async def fan_out_answers_async(intent, prompt, retrieval_result, models, deadline, on_answer=None):
+    """
+    Async variant of fan_out_answers.
+    """
+    start = time.time()
+
+    async def ask(name):
+        timeout = model_timeout(name, deadline)
+        try:
+            llm_result = await asyncio.wait_for(run_llm_async(name, prompt, timeout=timeout), timeout)
+        except Exception as e:
+            return model_error_entry(name, intent, start, str(e) or type(e).__name__)
+        record_answer_quality(intent, llm_result, retrieval_result)
+        return model_answer_entry(llm_result)
+
+    results = []
+    for next_answer in asyncio.as_completed([ask(name) for name in models]):
+        entry = await next_answer
+        results.append(entry)
+        if on_answer:
+            on_answer(entry)
+    return results
+
+
+def primary_answer(intent, model, model_answers, degraded):
+    """
+    The answer shown as final_answer in fan-out mode: the model the user
+    (or the model router) would have picked, else the next one that answered.
+    """
+    answered = {entry["model"]: entry for entry in model_answers if entry["answer"] is not None}
+    for name in model_router.choose(intent, model):
+        if name in answered:
+            return answered[name]
+
+    degraded.append("answer")
+    return degraded_answer("no model answered in time")
+
+
+def build_response(intent, entities, retrieval_result, prompt, llm_result, nlu_cache_hit, degraded=None):
+    baseline_list = retrieval_result.get("baseline", [])
+    merged_list = retrieval_result.get("merged", [])
+
+    if llm_result.get("degraded"):
+        accuracy = None
+    elif "faithfulness" in llm_result:
+        accuracy = llm_result["faithfulness"]*100
+    else:
+        accuracy = compute_kg_faithfulness_accuracy(
+                llm_result["answer"],
+                merged_list if merged_list else baseline_list
+            )
+
+        accuracy = accuracy*100
+
+    return {
+        "intent": intent,
+        "entities": entities,
+        "context": {
+            "baseline": baseline_list,
+            "embeddings": retrieval_result.get("embeddings", []),
+            "merged": merged_list,
+            "queries": retrieval_result.get("queries_executed", []),
+            # Cursor for more baseline rows (next_page), None if there are none
+            "page": retrieval_result.get("page")
+        },
+        "prompt_used": prompt,
+        "final_answer": llm_result["answer"],
+        "model": llm_result.get("model"),
+        "latency_seconds": llm_result["latency_seconds"],
+        "ttft_seconds": llm_result.get("ttft_seconds"),
+        "tokens_per_second": llm_result.get("tokens_per_second"),
+        "answer_length": llm_result["answer_length"],
+        "accuracy": accuracy,
+        "nlu_cache_hit": nlu_cache_hit,
+        "degraded": degraded or []
+    }
+
+
+def log_nlu(raw_intent, intent, entities, retrieval_mode, embedding_model, nlu_cache_hit, prefetched, seconds):
+    log.info(
+        "nlu", raw_intent=raw_intent, intent=intent, cache_hit=nlu_cache_hit, speculative_hit=bool(prefetched),
+        retrieval_mode=retrieval_mode, embedding_model=embedding_model, seconds=round(seconds, 3)
+    )
+    log.debug("entities", intent=intent, entities=entities)
+
+
+def log_retrieval(intent, retrieval_result, seconds):
+    # Row counts by default; the rows themselves only at debug level
+    log.info(
+        "retrieval", intent=intent,
+        baseline_rows=len(retrieval_result.get("baseline", [])),
+        embedding_rows=len(retrieval_result.get("embeddings", [])),
+        merged_rows=len(retrieval_result.get("merged", [])),
+        queries=len(retrieval_result.get("queries_executed", [])),
+        seconds=round(seconds, 3)
+    )
+    log.debug(
+        "retrieval_rows", intent=intent,
+        baseline=retrieval_result.get("baseline", []),
+        embeddings=retrieval_result.get("embeddings", []),
+        merged=retrieval_result.get("merged", [])
+    )
+
+
+def log_answer(response, timings):
+    log.info(
+        "answer", intent=response["intent"], model=response["model"], degraded=response["degraded"],
+        accuracy=response["accuracy"], answer_length=response["answer_length"],
+        timings={stage: round(seconds, 3) for stage, seconds in timings.items()}
+    )
+
+
+# ----------------------------------------------------
+# Semantic answer cache (paraphrased repeats)
+# ----------------------------------------------------
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE", "1") == "1"
+
+def answer_signature(question):
+    """
+    Literals a cached answer's question must share with this one: resolved
+    entities and graph values, compared case-insensitively.
+    """
+    gazetteer = get_gazetteer()
+    return literal_signature(
+        question, extract_entities_offline(question), gazetteer.literals if gazetteer is not None else None
+    )
+
+
+answer_cache = SemanticAnswerCache(
+    max_entries=int(os.environ.get("ANSWER_CACHE_SIZE", "256")),
+    threshold=float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.92")),
+    signature=answer_signature
+)
+
+
+def answer_cache_mode(retrieval_mode, embedding_model, model=None):
+    return retrieval_mode, normalize_embedding_model(embedding_model), model
+
+
+def lookup_cached_answer(user_question, retrieval_mode, embedding_model, model=None):
+    """
+    Returns (response or None, graph_version).
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None, None
+
+    graph_version = get_graph_version(retriever.driver)
+    try:
+        hit = answer_cache.lookup(
+            user_question, answer_cache_mode(retrieval_mode, embedding_model, model), graph_version
+        )
+    except Exception as e:
+        log.error("answer_cache_error", error=str(e))
+        return None, graph_version
+
+    if hit is None:
+        return None, graph_version
+
+    response, similarity = hit
+    response["answer_cache"] = {"hit": True, "similarity": similarity}
+    return response, graph_version
+
+
+def store_cached_answer(user_question, retrieval_mode, embedding_model, graph_version, response, elapsed, model=None):
+    if not ANSWER_CACHE_ENABLED:
+        return
+    try:
+        answer_cache.store(
+            user_question,
+            answer_cache_mode(retrieval_mode, embedding_model, model),
+            graph_version,
+            response,
+            elapsed
+        )
+    except Exception as e:
+        log.error("answer_cache_error", error=str(e))
+
+
 # ----------------------------------------------------
 # MAIN QA FUNCTION
 # ----------------------------------------------------
 
-def answer_question(user_question: str, retrieval_mode: str= "hybrid", embedding_model: str = "minilm"):
+# Identical questions in flight at the same moment share one computation
+inflight_questions = SingleFlight()
+async_inflight_questions = AsyncSingleFlight()
+
+
+def answer_key(model, compare_models=None):
+    """
+    The answer-model part of the cache / in-flight keys.
+    """
+    if compare_models:
+        return model, tuple(compare_models)
+    return model
+
+
+# Fire a duplicate answer request after the model's latency percentile
+HEDGE_ANSWERS = os.environ.get("HEDGE_ANSWERS", "0") == "1"
+
+
+def inflight_key(user_question, retrieval_mode, embedding_model, model=None, deadline=None, hedge=None):
+    """
+    Questions coalesce only when they would be answered the same way:
+    same model, hedging and (bucketed) deadline.
+    """
+    deadline = Deadline.coerce(deadline)
+    hedge = HEDGE_ANSWERS if hedge is None else hedge
+    return (
+        normalize_question(user_question), retrieval_mode, normalize_embedding_model(embedding_model), model,
+        deadline.bucket(), bool(hedge)
+    )
+
+
+def refined_response(conversation, user_question):
+    """
+    Answers a follow-up from the conversation's previous rows
+    (conversation.py), or None when it needs new data.
+    """
+    try:
+        # Entities first: a follow-up naming anything the previous rows do
+        # not hold needs the graph
+        refined = conversation.refine(user_question, extract_entities_offline(user_question))
+    except Exception as e:
+        log.error("refinement_error", error=str(e))
+        return None
+    if refined is None:
+        return None
+
+    answer, rows, plan, elapsed = refined
+    log.info("refinement", plan=plan, rows=len(rows), seconds=round(elapsed, 3))
+    accuracy = compute_kg_faithfulness_accuracy(answer, conversation.rows) * 100
+    return {
+        "intent": conversation.intent,
+        "entities": conversation.entities,
+        "context": {
+            "baseline": rows,
+            "embeddings": [],
+            "merged": rows,
+            "queries": []
+        },
+        "prompt_used": "",
+        "final_answer": answer,
+        "model": "conversation",
+        "latency_seconds": round(elapsed, 3),
+        "ttft_seconds": None,
+        "tokens_per_second": None,
+        "answer_length": len(answer),
+        "accuracy": accuracy,
+        "nlu_cache_hit": False,
+        "degraded": [],
+        "refinement": plan
+    }
+
+
+def answer_question(user_question: str, retrieval_mode: str= "hybrid", embedding_model: str = "minilm",
+                    deadline=None, hedge=None, model=None,
+                    compare_models=None, on_model_answer=None, on_token=None, conversation=None):
+    """
+    Concurrent identical questions are coalesced into one computation;
+    callers that joined an in-flight one get their own copy of its result.
+
+    deadline: seconds (or a Deadline) for the whole question; stages that
+    run out of time degrade instead of stalling.
+    hedge: send a hedged duplicate answer request (default HEDGE_ANSWERS).
+    model: answer model to use (llm_models.AVAILABLE_MODELS); None lets the
+    model router pick per intent.
+    compare_models: list of models to ask concurrently; their answers come
+    back as response["model_answers"] and on_model_answer(entry) is called
+    as each arrives (not for cached or coalesced results).
+    on_token: called with each answer token as the LLM streams it; cached,
+    coalesced and templated answers arrive as a single token.
+    conversation: a conversation.Conversation for this chat session;
+    follow-ups that refine the previous result set are answered from its
+    rows, and every answer is recorded in it.
+    """
+    if conversation is not None and not compare_models:
+        response = refined_response(conversation, user_question)
+        if response is not None:
+            conversation.update(user_question, response)
+            if on_token:
+                on_token(response["final_answer"])
+            return response
+
+    streamed = []
+
+    def emit(token):
+        streamed.append(token)
+        on_token(token)
+
+    deadline = Deadline.coerce(deadline)
+    response, shared = inflight_questions.do(
+        inflight_key(
+            user_question, retrieval_mode, embedding_model, answer_key(model, compare_models), deadline, hedge
+        ),
+        compute_answer,
+        user_question, retrieval_mode, embedding_model, deadline, hedge, model,
+        compare_models, on_model_answer, emit if on_token else None
+    )
+    if on_token and not streamed:
+        on_token(response["final_answer"])
+    if shared:
+        response = copy.deepcopy(response)
+    if conversation is not None:
+        conversation.update(user_question, response)
+    return response
+
+
+def compute_answer(user_question: str, retrieval_mode: str= "hybrid", embedding_model: str = "minilm",
+                   deadline=None, hedge=None, model=None,
+                   compare_models=None, on_model_answer=None, on_token=None):
+    """
+    Answers from the semantic answer cache when a near-duplicate question
+    was answered on the current graph version, otherwise runs the pipeline.
+    """
+    key = answer_key(model, compare_models)
+    cached, graph_version = lookup_cached_answer(user_question, retrieval_mode, embedding_model, key)
+    if cached is not None:
+        return cached
+
+    start = time.time()
+    response = answer_question_uncached(
+        user_question, retrieval_mode, embedding_model, deadline, hedge, model, compare_models, on_model_answer,
+        on_token
+    )
+    if not response["degraded"]:
+        store_cached_answer(
+            user_question, retrieval_mode, embedding_model, graph_version, response, time.time() - start, key
+        )
+    return response
+
+
+def answer_question_uncached(user_question: str, retrieval_mode: str= "hybrid", embedding_model: str = "minilm",
+                             deadline=None, hedge=None, model=None,
+                             compare_models=None, on_model_answer=None, on_token=None):
     
     """
     retrieval_mode expected values:
@@ -115,58 +968,54 @@ def answer_question(user_question: str, retrieval_mode: str= "hybrid", embedding
       - "MiniLM"
       - "mpnet"
     """
+    deadline = Deadline.coerce(deadline)
+    hedge = HEDGE_ANSWERS if hedge is None else hedge
+    started = time.time()
     
     # -------------------------------
     # Step 1: Intent + Entities
     # -------------------------------
-    raw_intent = classify_intent_llm(user_question)
-    intent = correct_intent(user_question, raw_intent)
-    entities = extract_entities_llm(user_question)
+    speculative = start_speculative_retrieval(user_question, retrieval_mode)
+    raw_intent, intent, entities, nlu_cache_hit, degraded = understand_question(user_question, deadline)
+    prefetched = collect_speculative_retrieval(
+        speculative, intent, entities, deadline.timeout(RETRIEVAL_TIMEOUT)
+    )
 
-    print("\n--- ROUTER DEBUG ---")
-    print("Raw Intent:", raw_intent)
-    print("Final Intent:", intent)
-    print("Entities:", entities)
-    print("Retrieval Mode:", retrieval_mode)
-    print("Embedding UI:", embedding_model)
+    timings = {"nlu": time.time() - started}
+    log_nlu(raw_intent, intent, entities, retrieval_mode, embedding_model, nlu_cache_hit, prefetched, timings["nlu"])
 
     # -------------------------------
     # Step 2: Decide use_embeddings
     # -------------------------------
-    if retrieval_mode == "baseline only":
-        use_embeddings = False
-    elif retrieval_mode == "embeddings only":
-        use_embeddings = True
-    else:  # hybrid
-        use_embeddings = intent not in NO_EMBEDDING_INTENTS
-
-    # Normalize model
-    model_key = normalize_embedding_model(embedding_model)
+    use_embeddings, model_key = decide_embeddings(intent, retrieval_mode, embedding_model)
 
-    # If user selected embeddings but no valid model key -> disable embeddings gracefully
-    if use_embeddings and retrieval_mode != "baseline only" and model_key is None:
-        print("⚠ No valid embedding model selected -> embeddings disabled")
+    if use_embeddings and not deadline.allows(MIN_EMBEDDING_BUDGET):
+        log.warning("stage_skipped", stage="embeddings", reason="deadline")
         use_embeddings = False
+        degraded.append("embeddings")
 
     # -------------------------------
     # Step 3: Retrieval (delegated to Retriever)
     # -------------------------------
+    stage_start = time.time()
     retrieval_result = retriever.retrieve(
         intent=intent,
         entities=entities,
         embedding_model=model_key,
         use_embeddings=use_embeddings,
-        retrieval_mode=retrieval_mode
+        retrieval_mode=retrieval_mode,
+        prefetched=prefetched,
+        timeout=deadline.timeout(RETRIEVAL_TIMEOUT),
+        embedding_timeout=deadline.timeout(EMBEDDING_TIMEOUT)
     )
 
+    timings["retrieval"] = time.time() - stage_start
+    log_retrieval(intent, retrieval_result, timings["retrieval"])
+    # Branches that timed out or failed: partial context, don't cache
+    degraded.extend(retrieval_result.get("incomplete", []))
+
     baseline_list = retrieval_result.get("baseline", [])
-    embeddings_list = retrieval_result.get("embeddings", [])
     merged_list = retrieval_result.get("merged", [])
-    executed_queries = retrieval_result.get("queries_executed", [])
-
-    print("baseline_List", baseline_list)
-    print("embeddings_List", embeddings_list)
-    print("merged_list", merged_list)
 
     # -------------------------------
     # Step 4: Prompt construction
@@ -176,41 +1025,228 @@ def answer_question(user_question: str, retrieval_mode: str= "hybrid", embedding
         
     )
 
-    if use_embeddings and not embedding_model:
-        print("⚠ No embedding model selected -> embeddings disabled")
-        use_embeddings = False
-
     # -------------------------------
     # Step 5: Run LLM
     # -------------------------------
-    llm_result = run_llm("deepseek", prompt)
-
-    accuracy = compute_kg_faithfulness_accuracy(
-            llm_result["answer"],
-            merged_list if merged_list else baseline_list
-        )
-    
-    accuracy = accuracy*100
+    stage_start = time.time()
+    if compare_models:
+        model_answers = fan_out_answers(intent, prompt, retrieval_result, compare_models, deadline, on_model_answer)
+        llm_result = primary_answer(intent, model, model_answers, degraded)
+    else:
+        llm_result = templated_result(user_question, intent, retrieval_mode, retrieval_result)
+        if llm_result is None:
+            llm_result = answer_with_models(
+                intent, prompt, retrieval_result, model, deadline, hedge, degraded, on_token
+            )
 
-    final_answer = llm_result["answer"]
-    latency = llm_result["latency_seconds"]
-    answer_length = llm_result["answer_length"]
+    timings["answer"] = time.time() - stage_start
 
     # -------------------------------
     # Step 6: Return final object
     # -------------------------------
-    return {
-        "intent": intent,
-        "entities": entities,
-        "context": {
-            "baseline": baseline_list,
-            "embeddings": embeddings_list,
-            "merged": merged_list,
-            "queries": executed_queries
-        },
-        "prompt_used": prompt,
-        "final_answer": final_answer,
-        "latency_seconds": latency,
-        "answer_length": answer_length,
-        "accuracy": accuracy
-    }
+    response = build_response(intent, entities, retrieval_result, prompt, llm_result, nlu_cache_hit, degraded)
+    if compare_models:
+        response["model_answers"] = model_answers
+
+    timings["total"] = time.time() - started
+    log_answer(response, timings)
+    return response
+
+
+# ----------------------------------------------------
+# ASYNC QA FUNCTION
+# ----------------------------------------------------
+# Same pipeline on the async inference client and async Neo4j driver.
+# Intent + entities run concurrently, as do baseline + embeddings, and
+# many questions can be in flight per process (capped by a semaphore).
+MAX_CONCURRENT_QUESTIONS = int(os.environ.get("MAX_CONCURRENT_QUESTIONS", "32"))
+
+_question_semaphore = None
+
+
+def get_question_semaphore():
+    global _question_semaphore
+    if _question_semaphore is None:
+        _question_semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUESTIONS)
+    return _question_semaphore
+
+
+def set_max_concurrent_questions(limit: int):
+    """
+    Changes the in-flight question cap (takes effect for new questions).
+    """
+    global MAX_CONCURRENT_QUESTIONS, _question_semaphore
+    MAX_CONCURRENT_QUESTIONS = limit
+    _question_semaphore = asyncio.Semaphore(limit)
+
+
+async def understand_question_async(user_question: str, deadline=None):
+    """
+    Async variant of understand_question; intent and entities run concurrently.
+    """
+    # The version read is cached, but its refresh is a blocking query
+    graph_version = await asyncio.to_thread(nlu_graph_version)
+    cached = nlu_cache.get(user_question, graph_version)
+    if cached is not None:
+        return cached["raw_intent"], cached["intent"], cached["entities"], True, []
+
+    deadline = Deadline.coerce(deadline)
+    degraded = []
+
+    raw_intent, entities = await asyncio.gather(
+        run_stage_async(
+            "intent",
+            lambda timeout: classify_intent_llm_async(user_question, timeout=timeout),
+            lambda: classify_intent_offline(user_question),
+            deadline, MIN_NLU_BUDGET, NLU_TIMEOUT, degraded
+        ),
+        run_stage_async(
+            "entities",
+            lambda timeout: extract_entities_llm_async(user_question, timeout=timeout),
+            lambda: extract_entities_offline(user_question),
+            deadline, MIN_NLU_BUDGET, NLU_TIMEOUT, degraded
+        )
+    )
+    intent = correct_intent(user_question, raw_intent)
+
+    if not degraded:
+        nlu_cache.put(user_question, {
+            "raw_intent": raw_intent,
+            "intent": intent,
+            "entities": entities
+        }, graph_version)
+
+    return raw_intent, intent, entities, False, degraded
+
+
+async def answer_question_async(user_question: str, retrieval_mode: str = "hybrid", embedding_model: str = "minilm",
+                                deadline=None, hedge=None, model=None,
+                                compare_models=None, on_model_answer=None, on_token=None):
+    """
+    Async variant of answer_question (same arguments, except conversation,
+    and return shape). on_token is called from a worker thread while the
+    LLM streams; cached, coalesced and templated answers arrive as a
+    single token, from the event loop.
+    """
+    streamed = []
+
+    def emit(token):
+        streamed.append(token)
+        on_token(token)
+
+    deadline = Deadline.coerce(deadline)
+    response, shared = await async_inflight_questions.do(
+        inflight_key(
+            user_question, retrieval_mode, embedding_model, answer_key(model, compare_models), deadline, hedge
+        ),
+        compute_answer_async,
+        user_question, retrieval_mode, embedding_model, deadline, hedge, model,
+        compare_models, on_model_answer, emit if on_token else None
+    )
+    if on_token and not streamed:
+        on_token(response["final_answer"])
+    return copy.deepcopy(response) if shared else response
+
+
+async def compute_answer_async(user_question: str, retrieval_mode: str = "hybrid", embedding_model: str = "minilm",
+                               deadline=None, hedge=None, model=None,
+                               compare_models=None, on_model_answer=None, on_token=None):
+    key = answer_key(model, compare_models)
+    async with get_question_semaphore():
+        cached, graph_version = await asyncio.to_thread(
+            lookup_cached_answer, user_question, retrieval_mode, embedding_model, key
+        )
+        if cached is not None:
+            return cached
+
+        start = time.time()
+        response = await answer_question_uncached_async(
+            user_question, retrieval_mode, embedding_model, deadline, hedge, model,
+            compare_models, on_model_answer, on_token
+        )
+        if not response["degraded"]:
+            await asyncio.to_thread(
+                store_cached_answer,
+                user_question, retrieval_mode, embedding_model, graph_version, response, time.time() - start, key
+            )
+        return response
+
+
+async def answer_question_uncached_async(user_question: str, retrieval_mode: str = "hybrid", embedding_model: str = "minilm",
+                                         deadline=None, hedge=None, model=None,
+                                         compare_models=None, on_model_answer=None, on_token=None):
+    """
+    answer_question_async without the semantic answer cache.
+    """
+    deadline = Deadline.coerce(deadline)
+    hedge = HEDGE_ANSWERS if hedge is None else hedge
+    started = time.time()
+
+    # Step 1: Intent + Entities, with speculative parameter-free queries
+    speculative = await start_speculative_retrieval_async(user_question, retrieval_mode)
+    raw_intent, intent, entities, nlu_cache_hit, degraded = await understand_question_async(user_question, deadline)
+    prefetched = await collect_speculative_retrieval_async(
+        speculative, intent, entities, deadline.timeout(RETRIEVAL_TIMEOUT)
+    )
+
+    timings = {"nlu": time.time() - started}
+    log_nlu(raw_intent, intent, entities, retrieval_mode, embedding_model, nlu_cache_hit, prefetched, timings["nlu"])
+
+    # Step 2: Decide use_embeddings
+    use_embeddings, model_key = decide_embeddings(intent, retrieval_mode, embedding_model)
+
+    if use_embeddings and not deadline.allows(MIN_EMBEDDING_BUDGET):
+        log.warning("stage_skipped", stage="embeddings", reason="deadline")
+        use_embeddings = False
+        degraded.append("embeddings")
+
+    # Step 3: Retrieval (baseline + embeddings concurrently)
+    stage_start = time.time()
+    retrieval_result = await retriever.retrieve_async(
+        intent=intent,
+        entities=entities,
+        embedding_model=model_key,
+        use_embeddings=use_embeddings,
+        retrieval_mode=retrieval_mode,
+        prefetched=prefetched,
+        timeout=deadline.timeout(RETRIEVAL_TIMEOUT),
+        embedding_timeout=deadline.timeout(EMBEDDING_TIMEOUT)
+    )
+
+    timings["retrieval"] = time.time() - stage_start
+    log_retrieval(intent, retrieval_result, timings["retrieval"])
+    # Branches that timed out or failed: partial context, don't cache
+    degraded.extend(retrieval_result.get("incomplete", []))
+
+    merged_list = retrieval_result.get("merged", [])
+    baseline_list = retrieval_result.get("baseline", [])
+
+    # Step 4: Prompt construction
+    prompt = build_structured_prompt(
+        user_question, merged_list if merged_list else baseline_list
+    )
+
+    # Step 5: Run LLM
+    stage_start = time.time()
+    if compare_models:
+        model_answers = await fan_out_answers_async(
+            intent, prompt, retrieval_result, compare_models, deadline, on_model_answer
+        )
+        llm_result = primary_answer(intent, model, model_answers, degraded)
+    else:
+        llm_result = templated_result(user_question, intent, retrieval_mode, retrieval_result)
+        if llm_result is None:
+            llm_result = await answer_with_models_async(
+                intent, prompt, retrieval_result, model, deadline, hedge, degraded, on_token
+            )
+
+    timings["answer"] = time.time() - stage_start
+
+    # Step 6: Return final object
+    response = build_response(intent, entities, retrieval_result, prompt, llm_result, nlu_cache_hit, degraded)
+    if compare_models:
+        response["model_answers"] = model_answers
+
+    timings["total"] = time.time() - started
+    log_answer(response, timings)
+    return response
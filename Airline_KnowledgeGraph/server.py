@@ -0,0 +1,416 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from llm_models import AVAILABLE_MODELS
+from logs import get_logger
+
+log = get_logger("server")
+
+# ------------------------------------------------------------------
+# HTTP API (ASGI)
+# ------------------------------------------------------------------
+# Plain ASGI app so it runs under any ASGI server (uvicorn, hypercorn):
+#
+#   POST /answer          {"question": ..., "retrieval_mode": ..., "embedding_model": ..., "model": ..., "deadline": ...,
+#                          "compare_models": [...]}
+#                         -> the answer_question response as JSON
+#   POST /answer/stream   same body, answered as server-sent events:
+#                         "accepted", "token" events as the answer is
+#                         generated, then "answer" (or "error"), then "done"
+#   GET  /health          status, load and cache stats
+#
+# One process-wide router (retriever, drivers, caches, model clients) is
+# shared by all requests. At most `max_concurrency` questions run at once
+# and up to `max_queue` more wait; beyond that requests get 429.
+#
+#   python server.py --port 8000
+#   python server.py --stub          # no Neo4j / HF needed
+#
+# Invalid bodies get 400; unexpected failures get a generic 500 (or
+# "error" event) and the detail goes to the log only.
+
+MAX_CONCURRENCY = int(os.environ.get("SERVER_MAX_CONCURRENCY", "16"))
+MAX_QUEUE = int(os.environ.get("SERVER_MAX_QUEUE", "32"))
+MAX_BODY_BYTES = 64 * 1024
+HEARTBEAT_SECONDS = 10
+STUB_LATENCY = float(os.environ.get("STUB_LATENCY", "0.2"))
+INTERNAL_ERROR = "internal error"
+
+
+class Saturated(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+# ----------------------------------------------------
+# Backends
+# ----------------------------------------------------
+def router_backend():
+    """
+    Real backend: the router's async pipeline. Imported lazily so the
+    module loads without Neo4j / HF credentials (e.g. for --stub); loading
+    it warms drivers, clients and models before the first request.
+    """
+    import router
+    import graph_db
+    from inference import inference_stats
+
+    router.warmup()
+
+    async def answer(question, retrieval_mode, embedding_model, model, deadline, compare_models=None,
+                     on_token=None):
+        return await router.answer_question_async(
+            question, retrieval_mode, embedding_model, deadline=deadline, model=model,
+            compare_models=compare_models, on_token=on_token
+        )
+
+    def stats():
+        return {
+            "nlu_cache": router.nlu_cache.stats(),
+            "answer_cache": router.answer_cache.stats(),
+            "result_cache": router.retriever.result_cache.stats() if router.retriever.result_cache else None,
+            "inflight_questions": router.async_inflight_questions.stats(),
+            "model_router": router.model_router.report(),
+            "inference": inference_stats(),
+            "neo4j_pool": graph_db.pool_stats(),
+        }
+
+    return answer, stats
+
+
+def stub_backend(latency=STUB_LATENCY):
+    """
+    Stubbed model + database: canned response after `latency` seconds.
+    """
+    async def answer(question, retrieval_mode, embedding_model, model, deadline, compare_models=None,
+                     on_token=None):
+        await asyncio.sleep(latency)
+        final_answer = f"Stub answer to: {question}"
+        if on_token:
+            for token in final_answer.split(" "):
+                on_token(token + " ")
+        return {
+            "intent": "stub",
+            "entities": {},
+            "context": [],
+            "prompt_used": question,
+            "final_answer": final_answer,
+            "model": model or "stub",
+            "latency_seconds": latency,
+            "answer_length": len(final_answer),
+            "accuracy": None,
+            "nlu_cache_hit": False,
+            "degraded": [],
+        }
+
+    def stats():
+        return {"backend": "stub"}
+
+    return answer, stats
+
+
+# ----------------------------------------------------
+# App
+# ----------------------------------------------------
+class AnswerServer:
+
+    def __init__(self, backend=None, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE):
+        """
+        backend: callable returning (answer_fn, stats_fn); defaults to the
+        router. It is loaded once, at startup or on the first request.
+        """
+        self.backend = backend or router_backend
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+
+        self.answer_fn = None
+        self.stats_fn = None
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._load_lock = threading.Lock()
+
+        self.active = 0
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+        self.started_at = time.time()
+
+    def load(self):
+        with self._load_lock:
+            if self.answer_fn is None:
+                self.answer_fn, self.stats_fn = self.backend()
+
+    async def answer(self, body, on_token=None):
+        """
+        on_token(token), when given, receives the answer as it is generated
+        (possibly from a worker thread).
+        """
+        question, options = validate(body)
+
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise Saturated()
+
+        self.waiting += 1
+        try:
+            if self.answer_fn is None:
+                await asyncio.to_thread(self.load)
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            return await self.answer_fn(question, *options, on_token=on_token)
+        finally:
+            self.active -= 1
+            self.served += 1
+            self._slots.release()
+
+    def health(self):
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "served": self.served,
+            "rejected": self.rejected,
+            "backend": self.stats_fn() if self.stats_fn else None,
+        }
+
+    # ------------------------------------------------
+    #                 ASGI
+    # ------------------------------------------------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method, path = scope["method"], scope["path"].rstrip("/") or "/"
+
+        if path == "/health" and method == "GET":
+            await send_json(send, 200, self.health())
+            return
+
+        if path in ("/answer", "/answer/stream") and method == "POST":
+            try:
+                body = await read_json(receive)
+            except BadRequest as e:
+                await send_json(send, 400 if str(e) != "body too large" else 413, {"error": str(e)})
+                return
+
+            if path == "/answer":
+                await self.handle_answer(body, send)
+            else:
+                await self.handle_stream(body, send)
+            return
+
+        await send_json(send, 404, {"error": f"no route for {method} {path}"})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    # Warm the retriever, drivers and model clients once
+                    await asyncio.to_thread(self.load)
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def handle_answer(self, body, send):
+        try:
+            response = await self.answer(body)
+        except Saturated:
+            await send_json(send, 429, {"error": "server busy, retry later"}, [(b"retry-after", b"1")])
+        except BadRequest as e:
+            await send_json(send, 400, {"error": str(e)})
+        except Exception as e:
+            log.error("answer_error", exc_info=True, error=str(e))
+            await send_json(send, 500, {"error": INTERNAL_ERROR})
+        else:
+            await send_json(send, 200, response)
+
+    async def handle_stream(self, body, send):
+        # Reject before committing to a 200 event stream
+        try:
+            validate(body)
+        except BadRequest as e:
+            await send_json(send, 400, {"error": str(e)})
+            return
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            await send_json(send, 429, {"error": "server busy, retry later"}, [(b"retry-after", b"1")])
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+        })
+        await send_event(send, "accepted", {"question": body.get("question")})
+
+        # Tokens may come from a worker thread; hand them to this loop
+        loop = asyncio.get_running_loop()
+        loop_thread = threading.get_ident()
+        tokens = asyncio.Queue()
+
+        def on_token(token):
+            if threading.get_ident() == loop_thread:
+                tokens.put_nowait(token)
+            else:
+                loop.call_soon_threadsafe(tokens.put_nowait, token)
+
+        task = asyncio.ensure_future(self.answer(body, on_token))
+        next_token = None
+        try:
+            while not (task.done() and tokens.empty()):
+                next_token = asyncio.ensure_future(tokens.get())
+                done, _ = await asyncio.wait({task, next_token}, timeout=HEARTBEAT_SECONDS,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if next_token in done:
+                    await send_event(send, "token", {"text": next_token.result()})
+                    continue
+                next_token.cancel()
+                if not done:
+                    await send({"type": "http.response.body", "body": b": keep-alive\n\n", "more_body": True})
+
+            try:
+                await send_event(send, "answer", task.result())
+            except Exception as e:
+                log.error("answer_error", exc_info=True, error=str(e))
+                await send_event(send, "error", {"error": INTERNAL_ERROR})
+
+            await send_event(send, "done", {}, more_body=False)
+        finally:
+            # A failed send means the client is gone: stop answering for it
+            if not task.done():
+                log.warning("stream_abandoned", question=body.get("question"))
+                task.cancel()
+            if next_token is not None:
+                next_token.cancel()
+
+
+# ----------------------------------------------------
+# Validation
+# ----------------------------------------------------
+def validate(body):
+    """
+    Returns (question, (retrieval_mode, embedding_model, model, deadline,
+    compare_models)) or raises BadRequest.
+    """
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise BadRequest("'question' must be a non-empty string")
+
+    retrieval_mode = body.get("retrieval_mode", "hybrid")
+    embedding_model = body.get("embedding_model", "minilm")
+    for name, value in (("retrieval_mode", retrieval_mode), ("embedding_model", embedding_model)):
+        if not isinstance(value, str):
+            raise BadRequest(f"'{name}' must be a string")
+
+    model = body.get("model")
+    if model is not None and (not isinstance(model, str) or model not in AVAILABLE_MODELS):
+        raise BadRequest(f"'model' must be one of {sorted(AVAILABLE_MODELS)}")
+
+    deadline = body.get("deadline")
+    if deadline is not None:
+        if isinstance(deadline, bool) or not isinstance(deadline, (int, float)) or not 0 < deadline < float("inf"):
+            raise BadRequest("'deadline' must be a positive number of seconds")
+
+    compare_models = body.get("compare_models")
+    if compare_models is not None:
+        if not isinstance(compare_models, list) or not compare_models:
+            raise BadRequest("'compare_models' must be a non-empty list of model names")
+        unknown = [name for name in compare_models if not isinstance(name, str) or name not in AVAILABLE_MODELS]
+        if unknown:
+            raise BadRequest(f"unknown models in 'compare_models': {unknown}")
+        if len(set(compare_models)) != len(compare_models):
+            raise BadRequest("'compare_models' has duplicates")
+
+    return question, (retrieval_mode, embedding_model, model, deadline, compare_models)
+
+
+# ----------------------------------------------------
+# ASGI helpers
+# ----------------------------------------------------
+async def read_json(receive):
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise BadRequest("body too large")
+        chunks.append(chunk)
+        more_body = message.get("more_body", False)
+
+    try:
+        body = json.loads(b"".join(chunks) or b"{}")
+    except ValueError:
+        raise BadRequest("body must be JSON")
+    if not isinstance(body, dict):
+        raise BadRequest("body must be a JSON object")
+    return body
+
+
+async def send_json(send, status, payload, headers=None):
+    data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())]
+                   + (headers or []),
+    })
+    await send({"type": "http.response.body", "body": data})
+
+
+async def send_event(send, event, payload, more_body=True):
+    data = json.dumps(payload, ensure_ascii=False, default=str)
+    message = f"event: {event}\ndata: {data}\n\n".encode("utf-8")
+    await send({"type": "http.response.body", "body": message, "more_body": more_body})
+
+
+def create_app(stub=False, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE):
+    return AnswerServer(
+        backend=stub_backend if stub else router_backend,
+        max_concurrency=max_concurrency,
+        max_queue=max_queue
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the Airline KG assistant over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    parser.add_argument("--stub", action="store_true", help="canned answers, no Neo4j / HF calls")
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("server.py needs an ASGI server: pip install uvicorn")
+
+    uvicorn.run(
+        create_app(args.stub, args.max_concurrency, args.max_queue),
+        host=args.host,
+        port=args.port
+    )
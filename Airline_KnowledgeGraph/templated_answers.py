@@ -0,0 +1,133 @@
+import os
+from conversation import sort_direction
+
+# ------------------------------------------------------------------
+# LLM-free answers for aggregate intents
+# ------------------------------------------------------------------
+# For these intents the Cypher rows already are the answer, so the
+# router renders them with a per-intent template (headline + markdown
+# table) instead of asking DeepSeek to restate them. Every number in the
+# answer comes straight from the rows.
+#
+# The query sorts one way ("descending" below); a question asking for the
+# other end ("least delayed airport") leads with the last row, which is
+# only the true other end when the result was not truncated.
+#
+# TEMPLATED_ANSWER_INTENTS=airport_delay,class_delay   (only these)
+# TEMPLATED_ANSWER_INTENTS=none                        (always use the LLM)
+
+TABLE_ROWS = 10
+
+
+def fmt(value, digits=1):
+    if value is None:
+        return "n/a"
+    if isinstance(value, float):
+        return f"{value:.{digits}f}"
+    return str(value)
+
+
+TEMPLATES = {
+    "airport_delay": {
+        "columns": [("airport", "Airport", 0), ("avg_delay", "Avg delay (min)", 1), ("journey_count", "Journeys", 0)],
+        "metric": "delay", "descending": True,
+        "top": "{airport} has the worst average delay: {avg_delay} minutes over {journey_count} journeys.",
+        "bottom": "{airport} has the lowest average delay: {avg_delay} minutes over {journey_count} journeys.",
+    },
+    "class_delay": {
+        "columns": [("passenger_class", "Class", 0), ("avg_delay", "Avg delay (min)", 1), ("journey_count", "Journeys", 0)],
+        "metric": "delay", "descending": True,
+        "top": "{passenger_class} has the highest average arrival delay: {avg_delay} minutes over {journey_count} journeys.",
+        "bottom": "{passenger_class} has the lowest average arrival delay: {avg_delay} minutes "
+                  "over {journey_count} journeys.",
+    },
+    "class_satisfaction": {
+        "columns": [("passenger_class", "Class", 0), ("avg_food", "Avg food score", 2), ("journey_count", "Journeys", 0)],
+        "metric": "food", "descending": True,
+        "top": "{passenger_class} has the highest average food satisfaction: {avg_food} over {journey_count} journeys.",
+        "bottom": "{passenger_class} has the lowest average food satisfaction: {avg_food} "
+                  "over {journey_count} journeys.",
+    },
+    "fleet_performance": {
+        "columns": [
+            ("fleet", "Fleet", 0), ("avg_delay", "Avg delay (min)", 1),
+            ("avg_food", "Avg food score", 2), ("journey_count", "Journeys", 0)
+        ],
+        "metric": "delay", "descending": False,
+        "top": "{fleet} performs best, with the lowest average delay: {avg_delay} minutes "
+               "(food score {avg_food}, {journey_count} journeys).",
+        "bottom": "{fleet} performs worst, with the highest average delay: {avg_delay} minutes "
+                  "(food score {avg_food}, {journey_count} journeys).",
+    },
+    "frequent_flyers": {
+        "columns": [
+            ("passenger", "Passenger", 0), ("loyalty_level", "Loyalty level", 0),
+            ("generation", "Generation", 0), ("journey_count", "Journeys", 0), ("total_miles", "Total miles", 0)
+        ],
+        "metric": "journeys", "descending": True,
+        "top": "The most frequent flyer is passenger {passenger} ({loyalty_level}) "
+               "with {journey_count} journeys and {total_miles} miles flown.",
+        "bottom": None,
+    },
+}
+
+
+def enabled_intents():
+    setting = os.environ.get("TEMPLATED_ANSWER_INTENTS")
+    if setting is None:
+        return set(TEMPLATES)
+    if setting.strip().lower() in ("", "none"):
+        return set()
+    return {name.strip() for name in setting.split(",")} & set(TEMPLATES)
+
+
+TEMPLATED_INTENTS = enabled_intents()
+
+
+def markdown_table(rows, columns):
+    header = "| " + " | ".join(title for _, title, _ in columns) + " |"
+    divider = "|" + "|".join("---" for _ in columns) + "|"
+    lines = [header, divider]
+    for row in rows:
+        lines.append("| " + " | ".join(fmt(row.get(key), digits) for key, _, digits in columns) + " |")
+    return "\n".join(lines)
+
+
+def render_templated_answer(intent, rows, limit=None, question=None):
+    """
+    Returns the answer text for an enabled aggregate intent, or None when
+    the intent has no (enabled) template, there are no rows, or the
+    question asks for an end of the ranking the rows cannot show.
+    limit: the $limit the rows were queried with; None if unknown.
+    """
+    if intent not in TEMPLATED_INTENTS or not rows:
+        return None
+
+    template = TEMPLATES[intent]
+    columns = template["columns"]
+    # The last row is only the true other end when the query was not truncated
+    complete = limit is not None and len(rows) < limit
+
+    def values(row):
+        return {key: fmt(row.get(key), digits) for key, _, digits in columns}
+
+    headline, other = template["top"], template["bottom"]
+    descending = sort_direction(question.lower(), template["metric"]) if question else None
+    if descending is not None and descending != template["descending"]:
+        if not (template["bottom"] and complete):
+            return None
+        rows = rows[::-1]
+        headline, other = other, headline
+
+    lines = [headline.format(**values(rows[0]))]
+    if other and complete and len(rows) > 1:
+        lines.append(other.format(**values(rows[-1])))
+
+    shown = rows[:TABLE_ROWS]
+    lines.append("")
+    if len(rows) > len(shown):
+        lines.append(f"Top {len(shown)} of {len(rows)}:")
+        lines.append("")
+    lines.append(markdown_table(shown, columns))
+
+    return "\n".join(lines)
@@ -0,0 +1,36 @@
+import os
+import sys
+import types
+import importlib
+
+# The modules are flat scripts in Airline_KnowledgeGraph/, imported by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# No test talks to Neo4j; when the driver is not installed, a stand-in
+# lets the modules import and fails any attempt to connect
+try:
+    importlib.import_module("neo4j")
+except ImportError:
+    class Query:
+        def __init__(self, text, metadata=None, timeout=None):
+            self.text = text
+            self.metadata = metadata
+            self.timeout = timeout
+
+    class GraphDatabase:
+        @staticmethod
+        def driver(*args, **kwargs):
+            raise ConnectionError("neo4j is not installed")
+
+    neo4j = types.ModuleType("neo4j")
+    neo4j.Query = Query
+    neo4j.GraphDatabase = neo4j.AsyncGraphDatabase = GraphDatabase
+    sys.modules["neo4j"] = neo4j
+
+# Never pick up real credentials from the environment or config.txt
+for variable in ("NEO4J_URI", "USER_NAME", "PASSWORD", "HF_TOKEN"):
+    os.environ.pop(variable, None)
+os.environ["NEO4J_CONFIG_FILE"] = ""
+
+# No test reads or writes the on-disk LLM memo
+os.environ["LLM_MEMO_MODE"] = "bypass"
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from answer_cache import SemanticAnswerCache, literal_signature
+
+
+class IdenticalEmbeddings(SemanticAnswerCache):
+    # Every question embeds to the same vector: only the signature can
+    # keep two questions apart
+    def _embed(self, question):
+        return np.ones(4, dtype=np.float32) / 2
+
+
+def signature(question):
+    # Resolved entities as the gazetteer would return them
+    entities = {
+        "flights from lax to iax": {"airports": ["LAX", "IAX"], "routes": {"origin": "LAX", "destination": "IAX"}},
+        "flights from lax to dex": {"airports": ["LAX", "DEX"], "routes": {"origin": "LAX", "destination": "DEX"}},
+        "flights from iax to lax": {"airports": ["IAX", "LAX"], "routes": {"origin": "IAX", "destination": "LAX"}},
+        "Flights from LAX to IAX": {"airports": ["LAX", "IAX"], "routes": {"origin": "LAX", "destination": "IAX"}},
+    }.get(question)
+    return literal_signature(question, entities, vocabulary={"lax", "iax", "dex", "btxxe0", "abcdef"})
+
+
+@pytest.fixture
+def cache():
+    cache = IdenticalEmbeddings(signature=signature)
+    cache.store("flights from lax to iax", "hybrid", 1, {"final_answer": "LAX-IAX"}, 1.0)
+    cache.store("passenger btxxe0", "hybrid", 1, {"final_answer": "BTXXE0"}, 1.0)
+    return cache
+
+
+@pytest.mark.parametrize("question", [
+    "flights from lax to dex",
+    "flights from iax to lax",
+    "passenger abcdef",
+    "passenger bnxx5r",
+])
+def test_different_literals_miss(cache, question):
+    assert cache.lookup(question, "hybrid", 1) is None
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("flights from lax to iax", "LAX-IAX"),
+    ("Flights from LAX to IAX", "LAX-IAX"),
+    ("passenger BTXXE0", "BTXXE0"),
+])
+def test_same_literals_hit_regardless_of_case(cache, question, answer):
+    response, similarity = cache.lookup(question, "hybrid", 1)
+    assert response["final_answer"] == answer
+    assert similarity == pytest.approx(1.0)
+
+
+def test_other_mode_or_graph_version_misses(cache):
+    assert cache.lookup("flights from lax to iax", "baseline only", 1) is None
+    assert cache.lookup("flights from lax to iax", "hybrid", 2) is None
+
+
+def test_signature_without_vocabulary_is_case_insensitive():
+    assert literal_signature("journey f_1 on flight 2411") == literal_signature("Journey F_1 on flight 2411")
+    assert literal_signature("passenger btxxe0") != literal_signature("passenger bnxx5r")
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("which airport has the worst delays", "which airport has the best delays"),
+    ("class with the most journeys", "class with the least journeys"),
+    ("highest food score by class", "lowest food score by class"),
+    ("top 5 delayed airports", "top 10 delayed airports"),
+    ("flights delayed over 30 minutes", "flights delayed under 30 minutes"),
+])
+def test_antonyms_and_limits_miss(stored, asked):
+    cache = IdenticalEmbeddings()
+    cache.store(stored, "hybrid", 1, {"final_answer": stored}, 1.0)
+
+    assert cache.lookup(asked, "hybrid", 1) is None
+    assert cache.lookup(stored.capitalize(), "hybrid", 1)[0]["final_answer"] == stored
+
+
+def test_spelled_out_limits_match_digits():
+    assert literal_signature("top five delayed airports") == literal_signature("Top 5 delayed airports")
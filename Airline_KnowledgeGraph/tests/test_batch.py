@@ -0,0 +1,102 @@
+import io
+import json
+import threading
+import pytest
+import batch
+from batch import answer_questions, read_questions, write_jsonl
+
+INTENTS = {
+    "worst airports": ("airport_delay", {}),
+    "airports with the worst delays": ("airport_delay", {}),
+    "flights from lax to iax": ("flight_search", {"routes": {"origin": "LAX", "destination": "IAX"}}),
+}
+
+
+class FakeRetriever:
+
+    def __init__(self):
+        self.retrievals = []
+        self._lock = threading.Lock()
+
+    def route(self, intent, entities):
+        routes = entities.get("routes")
+        return intent, ({"origin": routes["origin"], "destination": routes["destination"]} if routes else {})
+
+    def retrieve(self, intent, entities, **kwargs):
+        with self._lock:
+            self.retrievals.append(intent)
+        return {"baseline": [{"intent": intent}], "merged": [], "incomplete": []}
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    calls = {"nlu": [], "llm": []}
+    retriever = FakeRetriever()
+
+    def understand_question(question, deadline):
+        calls["nlu"].append(question)
+        if question == "boom":
+            raise RuntimeError("NLU failed")
+        intent, entities = INTENTS[batch.normalize_question(question)]
+        return intent, intent, entities, False, []
+
+    def answer_with_models(intent, prompt, retrieval_result, model, deadline, hedge, degraded):
+        calls["llm"].append(intent)
+        return {"answer": f"answer for {intent}", "latency_seconds": 0.0, "answer_length": 1}
+
+    def build_response(intent, entities, retrieval_result, prompt, llm_result, nlu_cache_hit, degraded):
+        return {"intent": intent, "final_answer": llm_result["answer"], "degraded": degraded}
+
+    monkeypatch.setattr(batch, "retriever", retriever)
+    monkeypatch.setattr(batch, "understand_question", understand_question)
+    monkeypatch.setattr(batch, "answer_with_models", answer_with_models)
+    monkeypatch.setattr(batch, "build_response", build_response)
+    monkeypatch.setattr(batch, "templated_result", lambda *args: None)
+    monkeypatch.setattr(batch, "decide_embeddings", lambda *args: (False, None))
+    monkeypatch.setattr(batch, "lookup_cached_answer", lambda *args: (None, 1))
+    monkeypatch.setattr(batch, "store_cached_answer", lambda *args: None)
+    calls["retriever"] = retriever
+    return calls
+
+
+def run(questions, **kwargs):
+    stats = {}
+    results = list(answer_questions(questions, llm_rate=None, stats=stats, **kwargs))
+    return results, stats
+
+
+def test_duplicates_are_answered_once_in_input_order(pipeline):
+    questions = ["Worst airports?", "flights from LAX to IAX", "worst   AIRPORTS"]
+
+    results, stats = run(questions)
+
+    assert [(r["index"], r["question"]) for r in results] == list(enumerate(questions))
+    assert results[0]["final_answer"] == results[2]["final_answer"] == "answer for airport_delay"
+    assert sorted(pipeline["nlu"]) == ["Worst airports?", "flights from LAX to IAX"]
+    assert stats["questions"] == 3 and stats["distinct"] == 2
+
+
+def test_questions_on_the_same_query_share_one_retrieval(pipeline):
+    _, stats = run(["worst airports", "airports with the worst delays", "flights from lax to iax"])
+
+    assert sorted(pipeline["retriever"].retrievals) == ["airport_delay", "flight_search"]
+    assert stats["retrieval_groups"] == 2
+    assert len(pipeline["llm"]) == 3 and stats["llm_calls"] == 3
+
+
+def test_a_failing_question_does_not_stop_the_batch(pipeline):
+    results, stats = run(["boom", "worst airports"])
+
+    assert results[0]["error"] == "NLU failed"
+    assert results[1]["final_answer"] == "answer for airport_delay"
+    assert stats["errors"] == 1
+
+
+def test_questions_file_and_jsonl_output(tmp_path):
+    path = tmp_path / "questions.txt"
+    path.write_text("# report\nworst airports\n\n  flights from lax to iax  \n", encoding="utf-8")
+    assert read_questions(path) == ["worst airports", "flights from lax to iax"]
+
+    out = io.StringIO()
+    write_jsonl([{"index": 0, "answer": "é"}, {"index": 1}], out)
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [{"index": 0, "answer": "é"}, {"index": 1}]
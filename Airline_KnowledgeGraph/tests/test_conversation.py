@@ -0,0 +1,55 @@
+import pytest
+from conversation import Conversation
+
+ROWS = [
+    {"journey": "F_1", "flight": 2411, "origin": "LAX", "destination": "IAX",
+     "delay": 30, "food_score": 3, "passenger_class": "Economy"},
+    {"journey": "F_2", "flight": 57, "origin": "LAX", "destination": "IAX",
+     "delay": 5, "food_score": 4, "passenger_class": "Economy"},
+]
+
+
+@pytest.fixture
+def conversation():
+    conversation = Conversation()
+    conversation.update("Show me flights from LAX to IAX", {"intent": "flight_search", "context": {"merged": ROWS}})
+    return conversation
+
+
+@pytest.mark.parametrize("question, entities", [
+    # No explicit reference back to the previous rows
+    ("Now show me flights from LAX to DEX", {"airports": ["LAX", "DEX"], "routes": {"origin": "LAX", "destination": "DEX"}}),
+    ("Then which of them has the highest delay overall?", {}),
+    ("What about the most delayed flights overall?", {}),
+    ("Then which fleet has the highest delay?", {}),
+    # Refers back, but names what the rows do not hold
+    ("Which of those were from DEX?", {"airports": ["DEX"]}),
+    ("Which of those fleets is most delayed?", {}),
+    ("Which of those flew the most miles?", {}),
+])
+def test_new_questions_go_to_the_graph(conversation, question, entities):
+    assert conversation.refine(question, entities) is None
+
+
+def test_sorts_previous_rows(conversation):
+    answer, rows, plan, _ = conversation.refine("Which of those had the highest delay?", {})
+    assert plan["sort"] == ("delay", True)
+    assert rows[0]["journey"] == "F_1"
+    assert "30" in answer
+
+
+def test_filters_and_counts_previous_rows(conversation):
+    answer, rows, plan, _ = conversation.refine("How many of those were economy?", {})
+    assert plan["filters"] == [("passenger_class", "==", "Economy")]
+    assert plan["aggregate"] == ("count", None)
+    assert "2 match" in answer
+
+
+def test_entities_in_rows_allow_refinement(conversation):
+    refined = conversation.refine("Which of those from LAX had the best food?", {"airports": ["LAX"]})
+    assert refined is not None
+    assert refined[1][0]["journey"] == "F_2"
+
+
+def test_no_rows_no_refinement():
+    assert Conversation().refine("Which of those had the highest delay?", {}) is None
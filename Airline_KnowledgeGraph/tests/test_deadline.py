@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from collections import deque
+import pytest
+import deadline as deadline_module
+import llm_models
+from deadline import Deadline
+
+
+# ------------------------------------------------
+#              DEADLINE
+# ------------------------------------------------
+def test_no_deadline_leaves_the_stage_caps():
+    deadline = Deadline()
+
+    assert deadline.remaining() is None
+    assert deadline.timeout(10) == 10 and deadline.timeout() is None
+    assert deadline.allows(1000)
+    assert deadline.bucket() is None
+
+
+def test_stage_timeout_is_the_cap_or_the_time_left():
+    deadline = Deadline(5)
+
+    assert deadline.timeout(60) == pytest.approx(5, abs=0.1)
+    assert deadline.timeout(2) == 2
+    assert deadline.allows(4) and not deadline.allows(6)
+
+
+def test_spent_deadline_allows_nothing():
+    deadline = Deadline(0)
+
+    assert deadline.remaining() == 0.0
+    assert deadline.timeout(10) == 0.0
+    assert not deadline.allows(0.5)
+
+
+def test_coerce(monkeypatch):
+    deadline = Deadline(3)
+    assert Deadline.coerce(deadline) is deadline
+    assert Deadline.coerce(3).timeout() == pytest.approx(3, abs=0.1)
+    assert Deadline.coerce(None).remaining() is None
+
+    monkeypatch.setattr(deadline_module, "DEFAULT_DEADLINE", "7")
+    assert Deadline.coerce(None).timeout() == pytest.approx(7, abs=0.1)
+
+
+def test_buckets_group_close_deadlines(monkeypatch):
+    monkeypatch.setattr(deadline_module, "DEADLINE_BUCKET", 5.0)
+
+    assert Deadline(29.5).bucket() == Deadline(26).bucket() == 6
+    assert Deadline(24).bucket() == 5
+
+
+# ------------------------------------------------
+#              HEDGING
+# ------------------------------------------------
+@pytest.fixture
+def latencies(monkeypatch):
+    monkeypatch.setattr(llm_models, "HEDGE_MIN_SAMPLES", 4)
+    monkeypatch.setattr(llm_models, "HEDGE_PERCENTILE", 0.75)
+    monkeypatch.setattr(llm_models, "recent_latencies", {"llama": deque(maxlen=50)})
+
+
+def test_no_hedge_delay_until_enough_samples(latencies):
+    for seconds in (0.4, 0.1, 0.3):
+        llm_models.record_latency("llama", seconds)
+    assert llm_models.hedge_delay("llama") is None
+
+    llm_models.record_latency("llama", 0.2)
+    assert llm_models.hedge_delay("llama") == 0.4
+
+
+def test_slow_request_is_hedged_and_the_first_answer_wins(latencies, monkeypatch):
+    for _ in range(4):
+        llm_models.record_latency("llama", 0.01)
+    calls = []
+    release = threading.Event()
+
+    def chat_completion(model_id, messages, **kwargs):
+        calls.append(model_id)
+        if len(calls) == 1:
+            release.wait(2)
+            return "slow", False
+        return "fast", False
+
+    monkeypatch.setattr(llm_models, "chat_completion", chat_completion)
+    try:
+        assert llm_models.hedged_chat_completion("llama", "id", [], 10, timeout=2) == ("fast", False)
+    finally:
+        release.set()
+    assert len(calls) == 2
+
+
+def test_fast_request_is_not_hedged(latencies, monkeypatch):
+    for _ in range(4):
+        llm_models.record_latency("llama", 1.0)
+    calls = []
+
+    def chat_completion(model_id, messages, **kwargs):
+        calls.append(model_id)
+        return "fast", False
+
+    monkeypatch.setattr(llm_models, "chat_completion", chat_completion)
+
+    assert llm_models.hedged_chat_completion("llama", "id", [], 10, timeout=2) == ("fast", False)
+    assert len(calls) == 1
+
+
+def test_async_hedge_survives_a_failed_first_request(latencies, monkeypatch):
+    for _ in range(4):
+        llm_models.record_latency("llama", 0.01)
+    calls = []
+
+    async def chat_completion_async(model_id, messages, **kwargs):
+        calls.append(model_id)
+        if len(calls) == 1:
+            await asyncio.sleep(0.05)
+            raise ConnectionError("reset")
+        return "hedged", False
+
+    monkeypatch.setattr(llm_models, "chat_completion_async", chat_completion_async)
+
+    result = asyncio.run(llm_models.hedged_chat_completion_async("llama", "id", [], 10, timeout=2))
+    assert result == ("hedged", False) and len(calls) == 2
@@ -0,0 +1,116 @@
+import pytest
+import gazetteer
+from gazetteer import Gazetteer, PrefixTrie
+
+VOCAB = {
+    "airports": ["LAX", "IAX", "DEX"],
+    "flights": ["2411"],
+    "fleets": ["B737-800"],
+    "record_locators": ["BTXXE0", "0BXX7K"],
+    "loyalty_levels": ["premier gold", "NBK"],
+    "generations": ["Boomer", "Gen X", "Millennial"],
+    "classes": ["Economy", "Business"],
+}
+
+
+@pytest.fixture
+def gaz():
+    return Gazetteer(VOCAB)
+
+
+# ------------------------------------------------
+#              TRIE
+# ------------------------------------------------
+def test_trie_prefers_the_longest_phrase_on_a_word_boundary():
+    trie = PrefixTrie()
+    trie.insert("Gen", "short")
+    trie.insert("Gen X", "long")
+
+    assert trie.match_at("gen x travellers", 0) == (5, "long")
+    assert trie.match_at("gen z", 0) == (3, "short")
+    assert trie.match_at("general", 0) is None
+
+
+def test_trie_accepts_plurals():
+    trie = PrefixTrie()
+    trie.insert("boomer", "Boomer")
+    trie.insert("business", "Business")
+
+    assert trie.match_at("boomers", 0) == (7, "Boomer")
+    assert trie.match_at("businesses", 0) == (10, "Business")
+
+
+# ------------------------------------------------
+#              EXTRACTION
+# ------------------------------------------------
+def test_phrases_and_aliases_resolve_to_stored_values(gaz):
+    entities, resolved = gaz.extract("Average delay of baby boomers in economy with premier gold status")
+
+    assert entities["generations"] == ["Boomer"]
+    assert entities["classes"] == ["Economy"]
+    assert entities["loyalty_levels"] == ["premier gold"]
+    assert entities["passengers"] == ["premier gold"]
+    assert resolved
+
+
+def test_aliases_need_the_value_in_the_graph(gaz):
+    # "gen z" is an alias, but the graph has no Gen Z passengers
+    entities, _ = gaz.extract("delays for gen z")
+    assert "generations" not in entities
+
+
+@pytest.mark.parametrize("question, route", [
+    ("flights from LAX to IAX", {"origin": "LAX", "destination": "IAX"}),
+    ("flights from iax into lax", {"origin": "IAX", "destination": "LAX"}),
+    ("flights from LAX to XYZ", {"origin": "", "destination": ""}),
+])
+def test_routes_keep_their_direction(gaz, question, route):
+    entities, _ = gaz.extract(question)
+    assert entities["routes"] == route
+
+
+def test_codes_flights_and_journeys(gaz):
+    entities, resolved = gaz.extract("Did BTXXE0 fly flight 2411 or journey F_12 at DEX?")
+
+    assert entities["passengers"] == ["btxxe0"]
+    assert entities["flights"] == ["2411"]
+    assert entities["journeys"] == ["F_12"]
+    assert entities["airports"] == ["DEX"]
+    assert resolved
+
+
+@pytest.mark.parametrize("question", [
+    "What about passenger ZZXX99?",
+    "What about passenger 9QXX1A?",
+    "flight 9999 delays",
+])
+def test_unknown_codes_are_unresolved(gaz, question):
+    assert gaz.extract(question)[1] is False
+
+
+def test_locators_starting_with_a_digit_resolve(gaz):
+    entities, resolved = gaz.extract("trips by 0BXX7K in 2024")
+    assert entities["passengers"] == ["0bxx7k"] and resolved
+
+
+# ------------------------------------------------
+#              SHARED INSTANCE
+# ------------------------------------------------
+def test_reloads_only_when_the_graph_version_changes(monkeypatch):
+    versions = iter([1, 1, 2])
+    loads = []
+
+    def load(self, driver):
+        loads.append(driver)
+        return self.build(VOCAB) or self
+
+    monkeypatch.setattr(gazetteer, "_gazetteer", None)
+    monkeypatch.setattr(gazetteer.graph_db, "has_credentials", lambda: True)
+    monkeypatch.setattr(gazetteer.graph_db, "get_driver", lambda: "driver")
+    monkeypatch.setattr(gazetteer, "get_graph_version", lambda driver: next(versions))
+    monkeypatch.setattr(Gazetteer, "load", load)
+
+    first = gazetteer.get_gazetteer()
+    assert gazetteer.get_gazetteer() is first
+    assert gazetteer.get_gazetteer() is not first
+    assert len(loads) == 2
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import pytest
+import graph_db
+from graph_db import PoolStats, TrackedDriver, load_settings
+
+
+class FakeSession:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeDriver:
+
+    def session(self, **config):
+        return FakeSession()
+
+
+def tracked(is_async=False, max_sessions=1, timeout=0.05):
+    return TrackedDriver(FakeDriver(), PoolStats(), is_async=is_async, max_sessions=max_sessions, timeout=timeout)
+
+
+def test_sessions_are_counted_and_released():
+    driver = tracked(max_sessions=2)
+
+    with driver.session():
+        with driver.session():
+            assert driver.stats.report()["session_slots_in_use"] == 2
+    with driver.session():
+        pass
+
+    report = driver.stats.report()
+    assert report["sessions_admitted"] == 3
+    assert report["session_slots_in_use"] == 0 and report["session_slots_peak"] == 2
+
+
+def test_session_waits_for_a_slot():
+    driver = tracked(timeout=5)
+    opened = threading.Event()
+
+    def hold():
+        with driver.session():
+            opened.set()
+            threading.Event().wait(0.1)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    opened.wait()
+    with driver.session():
+        pass
+    holder.join()
+
+    assert driver.stats.report()["max_slot_wait_seconds"] >= 0.05
+
+
+def test_no_slot_within_the_timeout_raises():
+    driver = tracked()
+
+    with driver.session():
+        with pytest.raises(TimeoutError):
+            with driver.session():
+                pass
+
+    assert driver.stats.report()["session_slot_timeouts"] == 1
+    with driver.session():
+        pass
+
+
+def test_async_sessions_share_the_slots():
+    driver = tracked(is_async=True)
+
+    async def run():
+        async with driver.session():
+            with pytest.raises(TimeoutError):
+                async with driver.session():
+                    pass
+        async with driver.session():
+            pass
+
+    asyncio.run(run())
+    report = driver.stats.report()
+    assert report["sessions_admitted"] == 2 and report["session_slot_timeouts"] == 1
+
+
+def test_env_only_settings_ignore_the_config_file(tmp_path, monkeypatch):
+    config = tmp_path / "config.txt"
+    config.write_text("[DEFAULT]\nURI=neo4j://example:7687\nUSERNAME=neo4j\nPASSWORD=secret\n")
+
+    assert load_settings(str(config))["password"] == "secret"
+    assert load_settings("")["password"] is None
+
+    monkeypatch.setenv("PASSWORD", "from-env")
+    assert load_settings("")["password"] == "from-env"
+
+
+def test_tests_run_without_credentials():
+    # conftest clears the env and sets NEO4J_CONFIG_FILE="", so the
+    # "no credentials" paths are the ones exercised
+    assert not graph_db.has_credentials()
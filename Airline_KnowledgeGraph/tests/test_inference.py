@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+import pytest
+import inference
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+class FakeClient:
+    """
+    Raises the queued errors in turn, then answers.
+    """
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(message={"content": "ok"})])
+
+
+@pytest.fixture
+def client(monkeypatch, request):
+    fake = FakeClient(request.param)
+    sleeps = []
+    monkeypatch.setattr(inference, "client_for", lambda timeout: fake)
+    monkeypatch.setattr(inference.time, "sleep", sleeps.append)
+    inference.configure_model("test-model")
+    # Only backoff sleeps are recorded: the rate limiter is not under test
+    monkeypatch.setattr(inference.limits_for("test-model").limiter, "acquire", lambda: None)
+    fake.sleeps = sleeps
+    return fake
+
+
+def stats():
+    return inference.inference_stats()["test-model"]
+
+
+@pytest.mark.parametrize("client", [[HTTPError(429, {"retry-after": "2"}), HTTPError(503)]], indirect=True)
+def test_retries_honour_retry_after(client):
+    assert inference.chat_completion("test-model", []) == ("ok", False)
+
+    assert client.calls == 3
+    assert client.sleeps[0] == 2.0
+    assert 0 <= client.sleeps[1] <= inference.BACKOFF_BASE * 2
+    assert stats()["retries"] == 2 and stats()["errors"] == 0
+
+
+@pytest.mark.parametrize("client", [[HTTPError(500)] * (inference.MAX_RETRIES + 1)], indirect=True)
+def test_gives_up_after_max_retries(client):
+    with pytest.raises(HTTPError):
+        inference.chat_completion("test-model", [])
+
+    assert client.calls == inference.MAX_RETRIES + 1
+    assert stats()["retries"] == inference.MAX_RETRIES and stats()["errors"] == 1
+
+
+@pytest.mark.parametrize("client", [[HTTPError(400)], [HTTPError(404)], [ValueError("bad payload")]], indirect=True)
+def test_client_errors_are_not_retried(client):
+    with pytest.raises(Exception):
+        inference.chat_completion("test-model", [])
+
+    assert client.calls == 1 and client.sleeps == []
+    assert stats()["retries"] == 0 and stats()["errors"] == 1
+
+
+@pytest.mark.parametrize("client", [[HTTPError(429, {"retry-after": "30"})]], indirect=True)
+def test_no_retry_when_retry_after_outlasts_the_timeout(client):
+    with pytest.raises(HTTPError):
+        inference.chat_completion("test-model", [], timeout=5)
+
+    assert client.calls == 1
@@ -0,0 +1,60 @@
+import pytest
+import llm_memo
+from llm_memo import LLMMemo, memo_key
+
+KEY = memo_key("model", [{"role": "user", "content": "Worst delays?"}])
+
+
+def test_default_memo_stays_out_of_the_source_tree():
+    assert LLMMemo().mode == "bypass"
+    assert "Airline_KnowledgeGraph" not in llm_memo.DEFAULT_PATH
+
+
+def test_record_then_read(tmp_path):
+    path = tmp_path / "cache" / "memo.sqlite3"
+    LLMMemo(path=str(path), mode="record").put(KEY, "model", "LAX")
+
+    memo = LLMMemo(path=str(path), mode="read-only")
+    assert memo.get(KEY) == "LAX"
+    memo.put(memo_key("model", []), "model", "not recorded")
+    assert memo.get(memo_key("model", [])) is None
+    assert memo.stats()["hits"] == 1
+
+
+def test_bypass_never_touches_disk(tmp_path):
+    path = tmp_path / "memo.sqlite3"
+    memo = LLMMemo(path=str(path), mode="bypass")
+    memo.put(KEY, "model", "LAX")
+
+    assert memo.get(KEY) is None
+    assert not path.exists()
+
+
+def test_expired_entries_are_misses_and_purged(tmp_path, monkeypatch):
+    memo = LLMMemo(path=str(tmp_path / "memo.sqlite3"), mode="record", ttl=60)
+    memo.put(KEY, "model", "LAX")
+
+    now = llm_memo.time.time()
+    monkeypatch.setattr(llm_memo.time, "time", lambda: now + 61)
+    assert memo.get(KEY) is None
+
+    memo.put(memo_key("model", []), "model", "IAX")
+    (count,) = memo._connection().execute("SELECT COUNT(*) FROM memo").fetchone()
+    assert count == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = iter(range(1000))
+    monkeypatch.setattr(llm_memo.time, "time", lambda: next(clock))
+    memo = LLMMemo(path=str(tmp_path / "memo.sqlite3"), max_entries=2, mode="record", ttl=None)
+    keys = [memo_key("model", [{"content": str(i)}]) for i in range(3)]
+    for i, key in enumerate(keys):
+        memo.put(key, "model", str(i))
+
+    assert memo.get(keys[0]) is None
+    assert [memo.get(key) for key in keys[1:]] == ["1", "2"]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        LLMMemo(mode="write-only")
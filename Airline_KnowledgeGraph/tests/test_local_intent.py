@@ -0,0 +1,37 @@
+import local_intent
+from local_intent import (
+    CONFIDENCE_THRESHOLD, TARGET_ACCURACY, accepted_accuracy, classify_intent_local, cross_validate, load_examples
+)
+
+
+def test_default_threshold_meets_target_accuracy():
+    examples = load_examples()
+    for seed in (1, 2, 42):
+        predictions, _ = cross_validate(examples, seed=seed)
+        accuracy, accepted = accepted_accuracy(predictions, CONFIDENCE_THRESHOLD)
+        assert accepted > 0.3
+        assert accuracy >= TARGET_ACCURACY
+
+
+def test_every_intent_has_enough_examples():
+    counts = {}
+    for _, intent in load_examples():
+        counts[intent] = counts.get(intent, 0) + 1
+    assert set(counts) == set(local_intent.INTENT_LABELS)
+    assert min(counts.values()) >= 30
+
+
+def test_confident_prediction_is_accepted():
+    assert classify_intent_local("Which airport has the worst delays?") == "airport_delay"
+
+
+def test_low_confidence_goes_to_llm():
+    assert classify_intent_local("Tell me about the blue widgets") is None
+
+
+def test_fails_closed_when_classifier_unavailable(monkeypatch):
+    def broken():
+        raise OSError("intent_examples.csv missing")
+
+    monkeypatch.setattr(local_intent, "get_local_classifier", broken)
+    assert classify_intent_local("Which airport has the worst delays?") is None
@@ -0,0 +1,65 @@
+import json
+import logging
+import pytest
+import logs
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logs.JsonFormatter())
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(self.format(record)))
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    logger = logging.getLogger(f"{logs.ROOT_LOGGER}.test")
+    handler = ListHandler()
+    # setLevel, not the attribute: it also clears isEnabledFor's cache
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    # Keep records away from the background listener (it would format them too)
+    monkeypatch.setattr(logger, "propagate", False)
+    yield handler
+    logger.removeHandler(handler)
+    logger.setLevel(logging.NOTSET)
+
+
+def record(event, logger="test"):
+    return logging.LogRecord(f"{logs.ROOT_LOGGER}.{logger}", logging.INFO, __file__, 0, event, (), None)
+
+
+def test_callable_fields_are_not_evaluated_below_the_level(captured):
+    log = logs.get_logger("test")
+    calls = []
+
+    def rows():
+        calls.append(1)
+        return [{"airport": "LAX"}]
+
+    log.debug("rows", merged=rows)
+    assert calls == [] and captured.lines == []
+
+    log.info("answer", merged=rows, intent="airport_delay")
+    assert calls == [1]
+    assert captured.lines[0]["merged"] == [{"airport": "LAX"}]
+    assert captured.lines[0]["intent"] == "airport_delay" and captured.lines[0]["logger"] == "test"
+
+
+def test_sampled_events_keep_their_fraction(monkeypatch):
+    monkeypatch.setattr(logs, "SAMPLE_RATES", {"test.rows": 0.5, "test.never": 0.0})
+    sampler = logs.SamplingFilter()
+
+    monkeypatch.setattr(logs.random, "random", lambda: 0.3)
+    assert sampler.filter(record("rows"))
+    assert not sampler.filter(record("never"))
+
+    monkeypatch.setattr(logs.random, "random", lambda: 0.7)
+    assert not sampler.filter(record("rows"))
+    # Rates are per logger.event: other events and loggers are always kept
+    assert sampler.filter(record("answer"))
+    assert sampler.filter(record("rows", logger="router"))
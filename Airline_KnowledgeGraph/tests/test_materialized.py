@@ -0,0 +1,57 @@
+from materialized import GROUP_KINDS, update_aggregates, recompute_statement, groups_statement
+
+
+class FakeTx:
+    """
+    Answers the group lookups with `current` (kind -> [(group, anchor)])
+    and records every other statement.
+    """
+
+    def __init__(self, current):
+        self.current = current
+        self.runs = []
+
+    def run(self, statement, **params):
+        for kind, rows in self.current.items():
+            if kind in GROUP_KINDS and statement == groups_statement(kind):
+                return [{"g": g, "anchor": anchor} for g, anchor in rows]
+        if "RETURN DISTINCT p.record_locator" in statement:
+            return [{"g": g, "anchor": g} for g in self.current.get("passenger", [])]
+        self.runs.append((statement, params))
+        return []
+
+
+def recomputes(tx, kind):
+    return [(statement, params) for statement, params in tx.runs if f"kind: '{kind}'" in statement]
+
+
+def test_stale_and_current_groups_are_recomputed():
+    tx = FakeTx({"class": [("Business", "Business")], "passenger": ["ABC123"]})
+
+    update_aggregates(tx, [1], stale={"class": {"Economy": "Economy"}, "generation": {"Millennials": "Millennials"}})
+
+    [(_, params)] = recomputes(tx, "class")
+    assert sorted(params["groups"]) == ["Business", "Economy"]
+    [(_, params)] = recomputes(tx, "generation")
+    assert params["groups"] == ["Millennials"]
+    assert any(params.get("groups") == ["ABC123"] for _, params in tx.runs)
+
+
+def test_null_group_is_recomputed_separately():
+    tx = FakeTx({"generation": [(None, None), ("Gen X", "Gen X")]})
+
+    update_aggregates(tx, [1])
+
+    statements = [statement for statement, _ in recomputes(tx, "generation")]
+    assert statements == [recompute_statement("generation", "groups"), recompute_statement("generation", "null")]
+
+
+def test_route_groups_are_anchored_on_the_origin():
+    tx = FakeTx({"route": [("LAX->IAX", "LAX"), ("LAX->DEX", "LAX")]})
+
+    update_aggregates(tx, [1])
+
+    [(statement, params)] = recomputes(tx, "route")
+    assert params["anchors"] == ["LAX"]
+    assert "o.station_code IN $anchors" in statement
+
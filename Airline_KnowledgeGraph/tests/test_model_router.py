@@ -0,0 +1,107 @@
+import random
+import pytest
+import model_router
+from model_router import MIN_SAMPLES, ModelRouter
+
+COSTS = {"gemma": 1, "llama": 4, "deepseek": 20}
+
+
+class FixedRandom(random.Random):
+    """
+    random() always returns `value`; choice() is the seeded one.
+    """
+
+    def __init__(self, value):
+        super().__init__(0)
+        self.value = value
+
+    def random(self):
+        return self.value
+
+
+def make_router(explore=0.99, objective="cost"):
+    return ModelRouter(COSTS, default_model="deepseek", threshold=0.8, objective=objective, rng=FixedRandom(explore))
+
+
+def record(router, model, intent, count=MIN_SAMPLES, latency=1.0, ok=True, faithfulness=0.9):
+    for _ in range(count):
+        router.record(model, intent, latency, ok=ok, faithfulness=faithfulness)
+
+
+def test_cold_start_simple_intents_go_to_the_cheapest_model():
+    assert make_router().choose("airport_delay") == ["gemma", "deepseek", "llama"]
+
+
+def test_cold_start_other_intents_stay_on_the_default():
+    assert make_router().choose("flight_search") == ["deepseek", "llama", "gemma"]
+
+
+def test_cheapest_model_above_the_quality_cutoff_wins():
+    router = make_router()
+    record(router, "gemma", "flight_search", faithfulness=0.7)
+    record(router, "llama", "flight_search", faithfulness=0.85)
+
+    assert router.choose("flight_search")[0] == "llama"
+
+
+def test_error_rate_disqualifies_a_model():
+    router = make_router()
+    record(router, "llama", "flight_search", faithfulness=0.95)
+    record(router, "llama", "flight_search", count=MIN_SAMPLES, ok=False)
+
+    assert router.choose("flight_search")[0] == "deepseek"
+
+
+def test_latency_objective_picks_the_fastest_qualifying_model():
+    router = make_router(objective="latency")
+    record(router, "llama", "flight_search", latency=2.0)
+    record(router, "deepseek", "flight_search", latency=0.5)
+
+    assert router.choose("flight_search")[0] == "deepseek"
+
+
+def test_fallbacks_are_the_other_models_most_capable_first():
+    router = make_router()
+    record(router, "gemma", "flight_search")
+
+    assert router.choose("flight_search") == ["gemma", "deepseek", "llama"]
+    assert router.choose("flight_search", override="llama") == ["llama", "deepseek", "gemma"]
+
+
+def test_default_model_is_the_last_resort():
+    router = make_router()
+    record(router, "deepseek", "flight_search", ok=False)
+
+    assert router.choose("flight_search") == ["deepseek", "llama", "gemma"]
+
+
+def test_exploration_tries_an_unsampled_model(monkeypatch):
+    monkeypatch.setattr(model_router, "EXPLORE_RATE", 0.5)
+
+    # Below the rate: explore one of the models without enough samples
+    first = make_router(explore=0.1).choose("flight_search")[0]
+    assert first in ("gemma", "llama")
+    # At or above the rate, and never for simple intents
+    assert make_router(explore=0.5).choose("flight_search")[0] == "deepseek"
+    assert make_router(explore=0.0).choose("airport_delay")[0] == "gemma"
+
+
+def test_exploration_is_reproducible_with_a_seed(monkeypatch):
+    monkeypatch.setattr(model_router, "EXPLORE_RATE", 0.3)
+
+    def picks(seed):
+        router = ModelRouter(COSTS, default_model="deepseek", rng=random.Random(seed))
+        return [router.choose("flight_search")[0] for _ in range(200)]
+
+    assert picks(7) == picks(7)
+    explored = sum(pick != "deepseek" for pick in picks(7))
+    assert explored == pytest.approx(0.3 * 200, abs=25)
+
+
+def test_explored_models_with_samples_are_not_explored_again(monkeypatch):
+    monkeypatch.setattr(model_router, "EXPLORE_RATE", 1.0)
+    router = make_router(explore=0.0)
+    record(router, "gemma", "flight_search", faithfulness=0.1)
+    record(router, "llama", "flight_search", faithfulness=0.1)
+
+    assert router.choose("flight_search")[0] == "deepseek"
@@ -0,0 +1,58 @@
+import json
+from nlu_cache import NLUCache, question_key
+
+VALUE = {"raw_intent": "airport_delay", "intent": "airport_delay", "entities": {"airports": ["LAX"]}}
+
+
+def test_key_folds_whitespace_but_keeps_case():
+    assert question_key("  Delays at   LAX ?") == "Delays at LAX"
+    assert question_key("Delays at LAX") != question_key("delays at lax")
+
+
+def test_case_variants_are_separate_entries():
+    cache = NLUCache()
+    cache.put("Delays at LAX", VALUE, graph_version=1)
+
+    assert cache.get("Delays at  LAX?", graph_version=1) == VALUE
+    assert cache.get("delays at lax", graph_version=1) is None
+
+
+def test_entries_are_keyed_on_the_graph_version():
+    cache = NLUCache()
+    cache.put("Delays at LAX", VALUE, graph_version=1)
+
+    assert cache.get("Delays at LAX", graph_version=2) is None
+    assert cache.get("Delays at LAX", graph_version=1) == VALUE
+
+
+def test_hits_are_copies():
+    cache = NLUCache()
+    cache.put("Delays at LAX", VALUE)
+    cache.get("Delays at LAX")["entities"]["airports"].append("IAX")
+
+    assert cache.get("Delays at LAX") == VALUE
+
+
+def test_expired_entries_miss():
+    cache = NLUCache(ttl=-1)
+    cache.put("Delays at LAX", VALUE)
+
+    assert cache.get("Delays at LAX") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_saved_entries_load_with_their_version(tmp_path):
+    path = str(tmp_path / "nlu.json")
+    cache = NLUCache(path=path)
+    cache.put("Delays at LAX", VALUE, graph_version=3)
+    cache.save()
+
+    # Files from before graph versions were keyed are ignored
+    with open(path) as f:
+        data = json.load(f) + [["delays at lax", 0, VALUE]]
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+    loaded = NLUCache(path=path)
+    assert loaded.get("Delays at LAX", graph_version=3) == VALUE
+    assert loaded.stats()["size"] == 1
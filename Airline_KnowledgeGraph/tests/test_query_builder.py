@@ -0,0 +1,138 @@
+import re
+import pytest
+from query_builder import (
+    SHAPES, compose, composed_text, entity_filters, is_composed, keyset_column, needs_composition, parse_key
+)
+
+VOCAB = {
+    "record_locators": ["BTXXE0", "NFXXJQ"],
+    "airports": ["LAX", "IAX"],
+    "generations": ["Silent", "Boomer", "Gen X"],
+    "loyalty_levels": ["premier gold"],
+    "classes": ["Economy", "Business"],
+    "flights": [2411],
+    "fleets": ["B737-800"],
+}
+
+
+def text(intent, filters):
+    return composed_text(compose(intent, filters)[0])
+
+
+def where_after_match(cypher, variable):
+    """
+    The WHERE clause right after the MATCH that binds `variable`.
+    """
+    lines = [line.strip() for line in cypher.strip().splitlines()]
+    for i, line in enumerate(lines):
+        if line.startswith("MATCH") and re.search(rf"\({variable}:", line):
+            clause = []
+            for following in lines[i + 1:]:
+                if not (following.startswith("WHERE") or following.startswith("AND")):
+                    break
+                clause.append(following)
+            return " ".join(clause)
+    return None
+
+
+# ------------------------------------------------
+#              ENTITIES → FILTERS
+# ------------------------------------------------
+@pytest.mark.parametrize("word, generation", [
+    ("silent", "Silent"),
+    ("Silent", "Silent"),
+    ("silent generation", "Silent"),
+    ("boomers", "Boomer"),
+    ("gen x", "Gen X"),
+])
+def test_generation_words_are_not_record_locators(word, generation):
+    filters = entity_filters({"passengers": [word]}, VOCAB)
+    assert filters == {"generation": generation}
+
+
+def test_locators_levels_and_routes():
+    filters = entity_filters({
+        "passengers": ["nfxxjq", "premier gold"],
+        "routes": {"origin": "lax", "destination": "iax"},
+    }, VOCAB)
+    assert filters == {"passenger": "NFXXJQ", "level": "premier gold", "origin": "LAX", "destination": "IAX"}
+
+
+def test_unknown_values_are_dropped():
+    filters = entity_filters({"passengers": ["zzzzzz"], "classes": ["Premium"], "airports": ["XYZ"]}, VOCAB)
+    assert filters == {}
+
+
+@pytest.mark.parametrize("word", ["economy", "business", "premium", "delays"])
+def test_plain_words_are_not_record_locators_without_a_vocabulary(word):
+    assert entity_filters({"passengers": [word], "airports": ["LAX"]}) == {"airport": "LAX"}
+
+
+def test_locators_and_levels_without_a_vocabulary():
+    filters = entity_filters({"passengers": ["btxxe0", "nbk"], "loyalty_levels": ["Premier Gold"]})
+    assert filters == {"passenger": "BTXXE0", "level": "premier gold"}
+    assert entity_filters({"passengers": ["NBK"]}) == {"level": "NBK"}
+
+
+def test_single_airport_is_a_departure_filter():
+    assert entity_filters({"airports": ["LAX"]}, VOCAB) == {"airport": "LAX"}
+
+
+# ------------------------------------------------
+#              COMPOSITION
+# ------------------------------------------------
+def test_fixed_queries_cover_their_own_filters():
+    assert not needs_composition("flight_search", {"origin": "LAX", "destination": "IAX"})
+    assert needs_composition("flight_search", {"origin": "LAX", "destination": "IAX", "class": "Economy"})
+    assert not needs_composition("unknown_intent", {"class": "Economy"})
+
+
+def test_key_is_stable_and_values_are_parameters():
+    key, params = compose("class_delay", {"origin": "LAX", "destination": "IAX", "generation": "Silent"})
+
+    assert key == "composed:class_delay:destination+generation+origin"
+    assert compose("class_delay", {"generation": "Gen X", "destination": "DEX", "origin": "SFO"})[0] == key
+    assert params == {"destination": "IAX", "generation": "Silent", "origin": "LAX"}
+    assert is_composed(key) and parse_key(key) == ("class_delay", ("destination", "generation", "origin"))
+
+    cypher = composed_text(key)
+    for name, value in params.items():
+        assert f"${name}" in cypher
+        assert value not in cypher
+
+
+def test_anchor_is_the_most_selective_filter():
+    cypher = text("delay_info", {"class": "Economy", "passenger": "BTXXE0"})
+    first = cypher.strip().splitlines()[0].strip()
+    assert first == "MATCH (p:Passenger)"
+
+
+@pytest.mark.parametrize("intent, filters", [
+    ("flight_search", {"origin": "LAX", "destination": "IAX", "class": "Economy"}),
+    ("flight_search", {"origin": "LAX", "destination": "IAX", "passenger": "BTXXE0"}),
+    ("class_search", {"class": "Economy", "fleet": "B737-800"}),
+    ("loyalty_miles", {"level": "premier gold", "generation": "Silent"}),
+])
+def test_keyset_condition_sits_with_its_variable(intent, filters):
+    column, variable, prop = SHAPES[intent]["keyset"]
+    cypher = text(intent, filters)
+
+    assert cypher.count("$after") == 2
+    assert f"($after IS NULL OR {variable}.{prop} > $after)" in where_after_match(cypher, variable)
+    # Filtered before any aggregation and paged in cursor order
+    assert cypher.index("$after") < cypher.index("RETURN")
+    assert f"ORDER BY {column}" in cypher
+    assert cypher.rstrip().endswith("LIMIT $limit")
+    assert keyset_column(compose(intent, filters)[0]) == column
+
+
+def test_unpaged_shapes_have_no_cursor():
+    key, _ = compose("airport_delay", {"generation": "Silent"})
+    assert "$after" not in composed_text(key)
+    assert keyset_column(key) is None
+    assert keyset_column("airport_delay") is None
+
+
+def test_unknown_intent_or_filter_has_no_text():
+    assert composed_text("composed:nope:class") is None
+    assert composed_text("composed:class_delay:weather") is None
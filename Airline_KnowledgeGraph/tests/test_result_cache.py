@@ -0,0 +1,62 @@
+from result_cache import ResultCache, rows_size
+
+ROWS = [{"airport": "LAX", "avg_delay": 12.5}, {"airport": "IAX", "avg_delay": 3.0}]
+
+
+def test_hit_returns_a_copy():
+    cache = ResultCache()
+    cache.put("airport_delay", 1, ROWS)
+
+    rows = cache.get("airport_delay", 1)
+    rows[0]["airport"] = "changed"
+
+    assert cache.get("airport_delay", 1) == ROWS
+    assert cache.stats()["hits"] == 2
+
+
+def test_new_graph_version_invalidates_everything():
+    cache = ResultCache()
+    cache.put("airport_delay", 1, ROWS)
+    cache.put("class_delay", 1, ROWS)
+
+    assert cache.get("airport_delay", 2) is None
+    assert cache.get("class_delay", 1) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_rows_read_at_an_older_version_are_not_stored():
+    cache = ResultCache()
+    cache.put("airport_delay", 2, ROWS)
+    cache.put("class_delay", 1, ROWS)
+
+    assert cache.get("class_delay", 2) is None
+    assert cache.get("airport_delay", 2) == ROWS
+
+
+def test_unknown_version_is_never_cached():
+    cache = ResultCache()
+    cache.put("airport_delay", None, ROWS)
+    cache.put("airport_delay", 1, ROWS)
+
+    assert cache.get("airport_delay", None) is None
+    assert cache.stats()["size"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_within_the_budget():
+    size = rows_size(ROWS)
+    cache = ResultCache(max_bytes=2 * size)
+    cache.put("a", 1, ROWS)
+    cache.put("b", 1, ROWS)
+    cache.get("a", 1)
+    cache.put("c", 1, ROWS)
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == ROWS and cache.get("c", 1) == ROWS
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    assert cache.stats()["evictions"] == 1
+
+
+def test_results_larger_than_the_budget_are_skipped():
+    cache = ResultCache(max_bytes=rows_size(ROWS) - 1)
+    cache.put("airport_delay", 1, ROWS)
+    assert cache.stats()["size"] == 0
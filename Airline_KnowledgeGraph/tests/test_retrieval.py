@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+from queries import QUERIES, MATERIALIZED_QUERIES, KEYSET_COLUMNS
+from retrieval import MAX_PAGE_SIZE, PAGE_SIZE, Retriever, query_params
+
+JOURNEYS = [{"journey": f"F_{i:03d}", "delay": i} for i in range(1, 12)]
+
+
+class InMemoryRetriever(Retriever):
+    """
+    Serves flight_search from JOURNEYS, applying $after and $limit the
+    way the Cypher does.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def vocabulary(self):
+        return None
+
+    def stream_query(self, query_key, params=None, timeout=None, fetch_size=None):
+        params = query_params(params)
+        self.calls.append(params)
+        rows = [row for row in JOURNEYS if params["after"] is None or row["journey"] > params["after"]]
+        yield from rows[:params["limit"]]
+
+
+@pytest.fixture
+def retriever():
+    return InMemoryRetriever()
+
+
+def test_query_params_fill_and_clamp_the_page():
+    assert query_params({"origin": "LAX"}) == {"origin": "LAX", "limit": PAGE_SIZE, "after": None}
+    assert query_params({"limit": 10 ** 6})["limit"] == MAX_PAGE_SIZE
+    assert query_params({"limit": 0})["limit"] == 1
+
+
+@pytest.mark.parametrize("queries", [QUERIES, MATERIALIZED_QUERIES])
+def test_keyset_queries_filter_and_order_by_their_column(queries):
+    for query_key, column in KEYSET_COLUMNS.items():
+        if query_key not in queries:
+            continue
+        text = queries[query_key]
+        assert "$after IS NULL OR" in text
+        assert f"ORDER BY {column}" in text
+        assert text.index("$after") < text.index("RETURN")
+
+
+def test_every_query_takes_the_page_limit():
+    for query_key, text in {**QUERIES, **MATERIALIZED_QUERIES}.items():
+        assert "LIMIT $limit" in text, query_key
+
+
+def test_cursor_only_after_a_full_keyset_page(retriever):
+    params = {"origin": "LAX", "destination": "IAX", "limit": 4}
+    last = {"journey": "F_004"}
+
+    assert retriever.next_cursor("flight_search", params, 4, last) == "F_004"
+    assert retriever.next_cursor("flight_search", params, 3, last) is None
+    assert retriever.next_cursor("airport_delay", params, 4, last) is None
+    assert retriever.page("flight_search", params, []) is None
+
+
+def test_route_sets_after_only_for_keyset_queries(retriever):
+    entities = {"routes": {"origin": "LAX", "destination": "IAX"}}
+
+    assert retriever.route("flight_search", entities, after="F_004", limit=5) == (
+        "flight_search", {"origin": "LAX", "destination": "IAX", "after": "F_004", "limit": 5}
+    )
+    assert retriever.route("airport_delay", {}, after="F_004") == ("airport_delay", {})
+
+
+def test_pages_cover_every_row_once(retriever):
+    params = {"origin": "LAX", "destination": "IAX", "limit": 4}
+    first = list(retriever.stream_query("flight_search", params))
+    page = retriever.page("flight_search", params, first)
+
+    rows = list(first)
+    while page and page["next_after"] is not None:
+        rows.extend(retriever.stream_page(page))
+
+    assert rows == JOURNEYS
+    assert [call["after"] for call in retriever.calls] == [None, "F_004", "F_008"]
+    # Filters and page size carry over to every page
+    assert {call["limit"] for call in retriever.calls} == {4}
+    assert {call["origin"] for call in retriever.calls} == {"LAX"}
+
+
+def test_page_ending_exactly_at_the_last_row(retriever):
+    params = {"origin": "LAX", "destination": "IAX", "limit": len(JOURNEYS)}
+    page = retriever.page("flight_search", params, list(retriever.stream_query("flight_search", params)))
+
+    assert list(retriever.stream_page(page)) == []
+    assert page["next_after"] is None
+
+
+def test_coalesced_callers_get_their_own_rows(retriever, monkeypatch):
+    shared_rows = [{"airport": "LAX", "avg_delay": 12.5}]
+    monkeypatch.setattr(retriever, "graph_version", lambda: None)
+    monkeypatch.setattr(retriever.inflight, "do", lambda key, fn, *args: (shared_rows, True))
+
+    rows = retriever.run_query("airport_delay")
+    rows[0]["airport"] = "changed"
+
+    assert rows is not shared_rows
+    assert shared_rows == [{"airport": "LAX", "avg_delay": 12.5}]
+
+
+def test_async_coalesced_callers_get_their_own_rows(retriever, monkeypatch):
+    shared_rows = [{"airport": "LAX", "avg_delay": 12.5}]
+    monkeypatch.setattr(retriever, "result_cache", None)
+
+    async def do(key, fn, *args):
+        return shared_rows, True
+
+    monkeypatch.setattr(retriever.async_inflight, "do", do)
+
+    rows = asyncio.run(retriever.run_query_async("airport_delay"))
+    rows[0]["airport"] = "changed"
+
+    assert shared_rows == [{"airport": "LAX", "avg_delay": 12.5}]
+
+
+def test_embedding_branch_has_its_own_timeout(retriever, monkeypatch):
+    timeouts = []
+
+    def search_embeddings(query_text, embedding_model, timeout=None):
+        timeouts.append(timeout)
+        return []
+
+    monkeypatch.setattr(retriever, "embedding_query_text", lambda *args: "delays at LAX")
+    monkeypatch.setattr(retriever, "search_embeddings", search_embeddings)
+
+    retriever.retrieve("airport_delay", {}, "minilm", retrieval_mode="embeddings only", timeout=15, embedding_timeout=3)
+    retriever.retrieve("airport_delay", {}, "minilm", retrieval_mode="embeddings only", timeout=15)
+
+    assert timeouts == [3, 15]
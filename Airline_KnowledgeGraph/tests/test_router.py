@@ -0,0 +1,230 @@
+import asyncio
+import threading
+import pytest
+import intent_classifier
+import router
+from queries import QUERIES
+
+
+class Interrupted(Exception):
+    pass
+
+
+def streaming(tokens, fail=False):
+    def stream_llm(name, prompt, on_token, max_tokens=500, timeout=None):
+        for token in tokens:
+            on_token(token)
+        if fail:
+            raise Interrupted("connection reset")
+        answer = "".join(tokens)
+        return {"model": name, "answer": answer, "latency_seconds": 0.1, "answer_length": len(answer)}
+
+    return stream_llm
+
+
+@pytest.fixture
+def models(monkeypatch):
+    monkeypatch.setattr(router.model_router, "choose", lambda intent, model: ["first", "second"])
+    monkeypatch.setattr(router, "record_answer_quality", lambda *args: None)
+    monkeypatch.setattr(router.model_router, "record", lambda *args, **kwargs: None)
+
+
+def answer(on_token):
+    degraded = []
+    result = router.answer_with_models(
+        "delay_info", "prompt", {}, None, router.Deadline.coerce(None), False, degraded, on_token
+    )
+    return result, degraded
+
+
+def test_interrupted_stream_keeps_the_emitted_text(models, monkeypatch):
+    monkeypatch.setattr(router, "stream_llm", streaming(["The delay ", "is 5"], fail=True))
+    tokens = []
+
+    result, degraded = answer(tokens.append)
+
+    assert result["answer"] == "The delay is 5" == "".join(tokens)
+    assert result["model"] == "first" and result["degraded"]
+    assert degraded == ["interrupted"]
+
+
+def test_failure_before_any_token_falls_back(models, monkeypatch):
+    calls = []
+
+    def stream_llm(name, prompt, on_token, max_tokens=500, timeout=None):
+        calls.append(name)
+        if name == "first":
+            raise Interrupted("refused")
+        return streaming(["ok"])(name, prompt, on_token)
+
+    monkeypatch.setattr(router, "stream_llm", stream_llm)
+
+    result, degraded = answer(lambda token: None)
+
+    assert calls == ["first", "second"]
+    assert result["answer"] == "ok" and degraded == []
+
+
+def test_interrupted_answer_has_no_accuracy(models, monkeypatch):
+    monkeypatch.setattr(router, "stream_llm", streaming(["partial"], fail=True))
+    result, degraded = answer(lambda token: None)
+
+    response = router.build_response("delay_info", {}, {"baseline": [{"delay": 5}]}, "prompt", result, False, degraded)
+
+    assert response["final_answer"] == "partial"
+    assert response["accuracy"] is None and response["degraded"] == ["interrupted"]
+
+
+def test_timed_out_query_gives_a_degraded_uncached_answer(models, monkeypatch):
+    def timed_out(query_key, params=None, timeout=None, fetch_size=None):
+        raise TimeoutError("transaction timed out")
+        yield
+
+    stored = []
+    monkeypatch.setattr(router, "lookup_cached_answer", lambda *args: (None, 1))
+    monkeypatch.setattr(router, "store_cached_answer", lambda *args: stored.append(args))
+    monkeypatch.setattr(router, "start_speculative_retrieval", lambda *args: {})
+    monkeypatch.setattr(router, "understand_question", lambda *args: ("airport_delay", "airport_delay", {}, False, []))
+    monkeypatch.setattr(router.retriever, "graph_version", lambda: 1)
+    monkeypatch.setattr(router.retriever, "query_text", QUERIES.get)
+    monkeypatch.setattr(router.retriever, "stream_query", timed_out)
+    monkeypatch.setattr(router, "stream_llm", streaming(["no data"]))
+
+    response = router.compute_answer("Which airport has the worst delays?", "baseline only")
+
+    assert "baseline" in response["degraded"]
+    assert response["accuracy"] is None
+    assert stored == []
+
+
+def test_questions_coalesce_only_with_the_same_deadline_and_hedging():
+    key = router.inflight_key("Worst delays?", "hybrid", "minilm", None, router.Deadline(30), False)
+
+    assert router.inflight_key("worst delays", "hybrid", "minilm", None, router.Deadline(29.5), False) == key
+    assert router.inflight_key("Worst delays?", "hybrid", "minilm", None, router.Deadline(30), True) != key
+    assert router.inflight_key("Worst delays?", "hybrid", "minilm", None, router.Deadline(3), False) != key
+    assert router.inflight_key("Worst delays?", "hybrid", "minilm", None, None, False) != key
+
+
+def test_templated_answers_are_scored_like_any_other():
+    rows = [{"airport": "LAX", "avg_delay": 12.0, "journey_count": 4}]
+    answer = "LAX: 12 minutes over 40 journeys."
+    result = {
+        "model": "template", "answer": answer, "latency_seconds": 0.0, "answer_length": len(answer), "templated": True
+    }
+
+    response = router.build_response("airport_delay", {}, {"baseline": rows}, "prompt", result, False, [])
+
+    assert response["accuracy"] == 50.0
+
+
+# ------------------------------------------------
+#              ASYNC PIPELINE
+# ------------------------------------------------
+ROWS = [{"airport": "LAX", "avg_delay": 12.0, "journey_count": 4}]
+
+
+@pytest.fixture
+def async_pipeline(models, monkeypatch):
+    calls = {"queries": [], "threads": []}
+
+    async def run_query_async(query_key, params=None, timeout=None):
+        calls["queries"].append(query_key)
+        if query_key != "airport_delay":
+            await asyncio.sleep(10)
+        return list(ROWS)
+
+    def predict_candidate_intents(user_question):
+        calls["threads"].append(threading.get_ident())
+        return ["airport_delay", "class_delay"]
+
+    async def understand_question_async(user_question, deadline=None):
+        return "airport_delay", "airport_delay", {}, False, []
+
+    monkeypatch.setattr(router, "SPECULATIVE_RETRIEVAL", True)
+    monkeypatch.setattr(router, "predict_candidate_intents", predict_candidate_intents)
+    monkeypatch.setattr(router, "understand_question_async", understand_question_async)
+    monkeypatch.setattr(router.retriever, "run_query_async", run_query_async)
+    monkeypatch.setattr(router.retriever, "query_text", QUERIES.get)
+    monkeypatch.setattr(router.retriever, "vocabulary", lambda: None)
+    return calls
+
+
+def test_async_pipeline_answers_from_the_speculative_query(async_pipeline):
+    async def run():
+        response = await router.answer_question_uncached_async("Which airport has the worst delays?", "baseline only")
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        return response, pending
+
+    response, pending = asyncio.run(run())
+
+    assert response["final_answer"].startswith("LAX has the worst average delay")
+    assert response["degraded"] == []
+    # One query per candidate, none re-run for the final intent; the
+    # unused candidate was cancelled
+    assert sorted(async_pipeline["queries"]) == ["airport_delay", "class_delay"]
+    assert pending == []
+
+
+def test_async_pipeline_predicts_candidates_off_the_event_loop(async_pipeline):
+    async def run():
+        await router.answer_question_uncached_async("Which airport has the worst delays?", "baseline only")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert async_pipeline["threads"] and loop_thread not in async_pipeline["threads"]
+
+
+def test_async_intent_runs_the_local_classifier_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def classify_intent_local(text):
+        threads.append(threading.get_ident())
+        return "airport_delay"
+
+    monkeypatch.setattr(intent_classifier, "classify_intent_rules", lambda text: None)
+    monkeypatch.setattr(intent_classifier, "classify_intent_local", classify_intent_local)
+
+    async def run():
+        intent = await intent_classifier.classify_intent_llm_async("hmm")
+        return intent, threading.get_ident()
+
+    intent, loop_thread = asyncio.run(run())
+    assert intent == "airport_delay" and threads and loop_thread not in threads
+
+
+# ------------------------------------------------
+#              FAN-OUT
+# ------------------------------------------------
+def test_fan_out_gives_up_on_each_model_at_its_own_timeout(models, monkeypatch):
+    release = threading.Event()
+
+    def run_llm(name, prompt, timeout=None):
+        if name == "slow":
+            release.wait(5)
+        if name == "broken":
+            raise Interrupted("model overloaded")
+        return {"model": name, "answer": "LAX", "latency_seconds": 0.01, "answer_length": 3}
+
+    def record_answer_quality(intent, llm_result, retrieval_result):
+        llm_result["faithfulness"] = 1.0
+
+    monkeypatch.setattr(router, "run_llm", run_llm)
+    monkeypatch.setattr(router, "record_answer_quality", record_answer_quality)
+    monkeypatch.setattr(router, "model_timeout", lambda name, deadline: 0.2 if name == "slow" else 5)
+    arrived = []
+
+    try:
+        results = router.fan_out_answers(
+            "airport_delay", "prompt", {}, ["slow", "broken", "fast"], router.Deadline.coerce(None), arrived.append
+        )
+    finally:
+        release.set()
+
+    entries = {entry["model"]: entry for entry in results}
+    assert arrived == results and len(results) == 3
+    # The slow model is dropped last, after the others have answered
+    assert results[-1]["model"] == "slow" and entries["slow"]["error"] == "timeout"
+    assert entries["slow"]["answer"] is None and entries["slow"]["latency_seconds"] < 5
+    assert entries["broken"]["answer"] is None and entries["broken"]["error"] == "model overloaded"
+    assert entries["fast"]["answer"] == "LAX" and entries["fast"]["accuracy"] == 100.0
@@ -0,0 +1,168 @@
+import json
+import asyncio
+import pytest
+from server import AnswerServer, INTERNAL_ERROR, stub_backend
+
+
+def request(app, path, body, method="POST"):
+    """
+    Drives the ASGI app with one request; returns (status, messages sent).
+    """
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await app({"type": "http", "method": method, "path": path}, receive, send)
+
+    asyncio.run(run())
+    return sent[0]["status"], sent[1:]
+
+
+def json_body(messages):
+    return json.loads(messages[0]["body"])
+
+
+def events(messages):
+    parsed = []
+    for message in messages:
+        chunk = message["body"].decode()
+        if chunk.startswith("event: "):
+            event, data = chunk.strip().split("\n")
+            parsed.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return parsed
+
+
+def failing_backend():
+    async def answer(*args, on_token=None):
+        raise RuntimeError("bolt://neo4j:secret@db failed")
+
+    return answer, lambda: {}
+
+
+@pytest.fixture
+def app():
+    return AnswerServer(backend=lambda: stub_backend(latency=0))
+
+
+@pytest.mark.parametrize("body", [
+    {},
+    {"question": "  "},
+    {"question": "q", "deadline": 0},
+    {"question": "q", "deadline": -1},
+    {"question": "q", "deadline": "5"},
+    {"question": "q", "deadline": True},
+    {"question": "q", "compare_models": "llama"},
+    {"question": "q", "compare_models": []},
+    {"question": "q", "compare_models": ["llama", "gpt-9"]},
+    {"question": "q", "compare_models": ["llama", "llama"]},
+    {"question": "q", "compare_models": [{"name": "llama"}]},
+    {"question": "q", "model": ["llama"]},
+    {"question": "q", "retrieval_mode": 3},
+])
+@pytest.mark.parametrize("path", ["/answer", "/answer/stream"])
+def test_invalid_body_is_400(app, path, body):
+    status, messages = request(app, path, body)
+    assert status == 400
+    assert "error" in json_body(messages)
+
+
+def test_valid_body_is_answered(app):
+    status, messages = request(app, "/answer", {
+        "question": "q", "deadline": 2.5, "model": "llama", "compare_models": ["llama", "gemma"]
+    })
+    assert status == 200
+    assert json_body(messages)["final_answer"] == "Stub answer to: q"
+
+
+def test_saturated_server_is_429(app):
+    app.max_concurrency, app.max_queue = 1, 0
+    app.active = 1
+    for path in ("/answer", "/answer/stream"):
+        status, messages = request(app, path, {"question": "q"})
+        assert status == 429
+    assert app.rejected == 2
+
+
+def test_queued_requests_wait_for_a_slot():
+    app = AnswerServer(backend=lambda: stub_backend(latency=0.05), max_concurrency=1, max_queue=1)
+
+    async def run():
+        return await asyncio.gather(
+            app.answer({"question": "a"}), app.answer({"question": "b"}), app.answer({"question": "c"}),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert [type(r).__name__ for r in results] == ["dict", "dict", "Saturated"]
+
+
+def test_errors_do_not_leak_details():
+    app = AnswerServer(backend=failing_backend)
+
+    status, messages = request(app, "/answer", {"question": "q"})
+    assert status == 500
+    assert json_body(messages) == {"error": INTERNAL_ERROR}
+
+    status, messages = request(app, "/answer/stream", {"question": "q"})
+    assert status == 200
+    assert ("error", {"error": INTERNAL_ERROR}) in events(messages)
+
+
+def test_stream_sends_tokens_before_the_answer(app):
+    status, messages = request(app, "/answer/stream", {"question": "where to"})
+    names = [name for name, _ in events(messages)]
+
+    assert status == 200
+    assert names[0] == "accepted" and names[-2:] == ["answer", "done"]
+    tokens = [data["text"] for name, data in events(messages) if name == "token"]
+    assert "".join(tokens).strip() == "Stub answer to: where to"
+
+
+def test_tokens_from_worker_threads_are_streamed():
+    def threaded_backend():
+        async def answer(question, *args, on_token=None):
+            await asyncio.to_thread(lambda: [on_token(t) for t in ("a", "b", "c")])
+            return {"final_answer": "abc"}
+
+        return answer, lambda: {}
+
+    status, messages = request(AnswerServer(backend=threaded_backend), "/answer/stream", {"question": "q"})
+    tokens = [data["text"] for name, data in events(messages) if name == "token"]
+    assert tokens == ["a", "b", "c"]
+
+
+def test_disconnected_stream_cancels_the_answer():
+    cancelled = asyncio.Event()
+
+    def slow_backend():
+        async def answer(question, *args, on_token=None):
+            on_token("first ")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        return answer, lambda: {}
+
+    app = AnswerServer(backend=slow_backend)
+
+    async def receive():
+        return {"type": "http.request", "body": json.dumps({"question": "q"}).encode(), "more_body": False}
+
+    async def send(message):
+        if b"event: token" in message.get("body", b""):
+            raise OSError("client disconnected")
+
+    async def run():
+        with pytest.raises(OSError):
+            await app({"type": "http", "method": "POST", "path": "/answer/stream"}, receive, send)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return app.active
+
+    assert asyncio.run(run()) == 0
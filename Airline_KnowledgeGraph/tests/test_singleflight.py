@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import pytest
+from singleflight import SingleFlight, AsyncSingleFlight
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait()
+        return {"rows": 3}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("q", compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["coalesced"] < 4:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == {"rows": 3} for result, _ in results)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait()
+        raise ValueError("cypher error")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("q", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["coalesced"] < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert flight.do("q", lambda: "retried") == ("retried", False)
+
+
+def test_async_callers_share_one_computation():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def run():
+        return await asyncio.gather(*(flight.do("q", compute, 21) for _ in range(3)), flight.do("other", compute, 1))
+
+    results = asyncio.run(run())
+
+    assert results == [(42, False), (42, True), (42, True), (2, False)]
+    assert calls == [21, 1]
+    assert flight.stats() == {"in_flight": 0, "leaders": 2, "coalesced": 2}
+
+
+def test_async_errors_reach_every_waiter():
+    flight = AsyncSingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("timeout")
+
+    async def run():
+        return await asyncio.gather(flight.do("q", fail), flight.do("q", fail), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+def test_cancelled_leader_hands_over_to_a_waiter():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("q", slow, 1))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(flight.do("q", slow, 1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+
+    # One waiter re-runs the call, the other joins it
+    assert sorted(results) == [(1, False), (1, True)]
+    assert calls == [1, 1]
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,72 @@
+import os
+import sys
+import subprocess
+import pytest
+
+# ------------------------------------------------------------------
+# Import-time budget
+# ------------------------------------------------------------------
+# Imports each module in a fresh interpreter with the Neo4j / HF
+# credentials removed and fails if the import raises or takes longer than
+# STARTUP_BUDGET seconds. The driver and model packages are replaced by
+# stand-ins that raise when used, so nothing may connect or load a model
+# at import time (and their own import cost is not counted).
+
+MODULES = [
+    "router",
+    "batch",
+    "server",
+    "retrieval",
+    "intent_classifier",
+    "entity_extraction",
+    "llm_models",
+    "inference",
+    "embeddings.embedding_retreival",
+]
+
+HEAVY_MODULES = ["neo4j", "huggingface_hub", "sentence_transformers"]
+
+CREDENTIALS = ["NEO4J_URI", "USER_NAME", "PASSWORD", "HF_TOKEN"]
+
+BUDGET = float(os.environ.get("STARTUP_BUDGET", "1.0"))  # seconds
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TIMER = """
+import sys, time, types
+
+class Unavailable:
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        raise RuntimeError(f"{self.name} used at import time")
+
+    def __getattr__(self, attribute):
+        raise RuntimeError(f"{self.name}.{attribute} used at import time")
+
+for package in %r:
+    stub = types.ModuleType(package)
+    stub.__getattr__ = lambda attribute, package=package: Unavailable(f"{package}.{attribute}")
+    sys.modules[package] = stub
+
+start = time.perf_counter()
+import %s
+print(time.perf_counter() - start)
+"""
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_is_fast_and_offline(module):
+    env = {key: value for key, value in os.environ.items() if key not in CREDENTIALS}
+    result = subprocess.run(
+        [sys.executable, "-c", TIMER % (HEAVY_MODULES, module)],
+        cwd=PACKAGE_DIR,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+
+    assert result.returncode == 0, result.stderr.strip().splitlines()[-1]
+    seconds = float(result.stdout.strip().splitlines()[-1])
+    assert seconds <= BUDGET, f"importing {module} took {seconds:.3f}s (budget {BUDGET}s)"
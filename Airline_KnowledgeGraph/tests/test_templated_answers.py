@@ -0,0 +1,83 @@
+import pytest
+import templated_answers
+from templated_answers import TABLE_ROWS, render_templated_answer
+
+
+def airports(count):
+    return [
+        {"airport": f"A{i:02d}", "avg_delay": 60.0 - i, "journey_count": 10 + i}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(autouse=True)
+def all_templates(monkeypatch):
+    monkeypatch.setattr(templated_answers, "TEMPLATED_INTENTS", set(templated_answers.TEMPLATES))
+
+
+def test_headline_and_bottom_line_from_the_rows():
+    answer = render_templated_answer("airport_delay", airports(3), limit=50)
+
+    lines = answer.splitlines()
+    assert lines[0] == "A00 has the worst average delay: 60.0 minutes over 10 journeys."
+    assert lines[1] == "A02 has the lowest average delay: 58.0 minutes over 12 journeys."
+
+
+@pytest.mark.parametrize("question", ["Which airport is least delayed?", "Best airports for on-time arrival"])
+def test_question_asking_for_the_other_end_leads_with_it(question):
+    answer = render_templated_answer("airport_delay", airports(3), limit=50, question=question)
+
+    lines = answer.splitlines()
+    assert lines[0] == "A02 has the lowest average delay: 58.0 minutes over 12 journeys."
+    assert lines[1] == "A00 has the worst average delay: 60.0 minutes over 10 journeys."
+    table = [line for line in lines if line.startswith("| A") and not line.startswith("| Airport")]
+    assert [line.split()[1] for line in table] == ["A02", "A01", "A00"]
+
+
+def test_question_in_the_query_order_keeps_it():
+    question = "Which airport has the most delays?"
+    answer = render_templated_answer("airport_delay", airports(3), limit=50, question=question)
+    assert answer.startswith("A00 has the worst average delay")
+
+
+@pytest.mark.parametrize("intent, rows, limit", [
+    ("airport_delay", airports(3), 3),
+    ("frequent_flyers", [{"passenger": "BTXXE0", "journey_count": 2}, {"passenger": "NFXXJQ", "journey_count": 1}], 50),
+])
+def test_other_end_it_cannot_show_falls_back_to_the_llm(intent, rows, limit):
+    question = "Which airport has the least delay?" if intent == "airport_delay" else "Who has the fewest journeys?"
+    assert render_templated_answer(intent, rows, limit=limit, question=question) is None
+
+
+@pytest.mark.parametrize("limit", [3, None])
+def test_no_bottom_line_when_the_query_may_be_truncated(limit):
+    # With limit=3, 3 rows may be a cut-off page: the last one is not the minimum
+    answer = render_templated_answer("airport_delay", airports(3), limit=limit)
+    assert "has the lowest" not in answer
+
+
+def test_bottom_line_follows_the_requested_limit():
+    # 60 rows under a 100-row limit are the whole result, whatever PAGE_SIZE is
+    answer = render_templated_answer("airport_delay", airports(60), limit=100)
+    assert "A59 has the lowest" in answer
+
+
+def test_long_results_show_the_top_rows():
+    answer = render_templated_answer("airport_delay", airports(TABLE_ROWS + 5), limit=50)
+
+    assert f"Top {TABLE_ROWS} of {TABLE_ROWS + 5}:" in answer
+    table = [line for line in answer.splitlines() if line.startswith("| A") and not line.startswith("| Airport")]
+    assert len(table) == TABLE_ROWS
+
+
+def test_missing_values_render_as_na():
+    answer = render_templated_answer("class_delay", [{"passenger_class": None, "avg_delay": None, "journey_count": 3}])
+    assert answer.splitlines()[0] == "n/a has the highest average arrival delay: n/a minutes over 3 journeys."
+
+
+def test_only_templated_intents_with_rows_render(monkeypatch):
+    assert render_templated_answer("flight_search", airports(2), limit=50) is None
+    assert render_templated_answer("airport_delay", [], limit=50) is None
+
+    monkeypatch.setattr(templated_answers, "TEMPLATED_INTENTS", set())
+    assert render_templated_answer("airport_delay", airports(2), limit=50) is None